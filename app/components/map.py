@@ -1,18 +1,23 @@
 # app/components/map.py
 
 import flet as ft
-from app.config import GOOGLE_MAPS_API_KEY
+from app.config import GOOGLE_MAPS_API_KEY, MAP_SINGLE_POINT_ZOOM
 from app.components.buttons import PrimaryPillButton
+from app.services.normalize import Vehicle
+from app.state.snapshot import FleetSnapshot
+from app.geo.clustering import clusters_for
+from app.geo.static_maps import StaticMapBuilder, static_map_size
+from app.geo.viewport import fit_bounds
 
-def create_map_with_markers(vehicles_data: list, width: int = None, height: int = 600, page: ft.Page = None):
+def create_map_with_markers(snapshot: FleetSnapshot, width: int = None, height: int = 600, page: ft.Page = None):
     """
     Crea un mapa embebido interactivo con Google Maps mostrando las posiciones de los vehículos.
     Usa Google Maps Embed API para mostrar un mapa interactivo embebido.
     
-    vehicles_data: Lista de vehículos con campos latitud y longitud
+    snapshot: FleetSnapshot de la flota (app/state/snapshot.py)
     page: Página de Flet para usar launch_url (opcional)
     """
-    if not vehicles_data:
+    if not len(snapshot):
         return ft.Container(
             content=ft.Text("No hay vehículos disponibles", size=16),
             alignment=ft.alignment.center,
@@ -20,53 +25,11 @@ def create_map_with_markers(vehicles_data: list, width: int = None, height: int
             height=height,
         )
     
-    # Extraer coordenadas y preparar marcadores
-    markers_data = []
-    lats = []
-    lons = []
-    
-    for idx, vehicle in enumerate(vehicles_data):
-        # Buscar coordenadas
-        lat = (
-            vehicle.get("latitud") or vehicle.get("Latitud") or 
-            vehicle.get("lat") or vehicle.get("latitude") or
-            vehicle.get("Latitude") or vehicle.get("y") or 0
-        )
-        lon = (
-            vehicle.get("longitud") or vehicle.get("Longitud") or 
-            vehicle.get("lon") or vehicle.get("lng") or vehicle.get("longitude") or
-            vehicle.get("Longitude") or vehicle.get("x") or 0
-        )
-        
-        # Si no hay coordenadas directas, buscar en objeto anidado
-        if not lat or not lon:
-            ubicacion = vehicle.get("ubicacion") or vehicle.get("Ubicacion") or vehicle.get("location") or vehicle.get("Location") or {}
-            lat = lat or ubicacion.get("latitud") or ubicacion.get("Latitud") or ubicacion.get("lat") or ubicacion.get("latitude") or 0
-            lon = lon or ubicacion.get("longitud") or ubicacion.get("Longitud") or ubicacion.get("lon") or ubicacion.get("lng") or ubicacion.get("longitude") or 0
-        
-        if lat and lon and float(lat) != 0 and float(lon) != 0:
-            lats.append(float(lat))
-            lons.append(float(lon))
-            
-            # Obtener información del vehículo para el marcador
-            nombre = (
-                vehicle.get("placas") or vehicle.get("Placas") or
-                vehicle.get("economico") or vehicle.get("Economico") or
-                vehicle.get("descripcion") or vehicle.get("Descripcion") or
-                vehicle.get("nombre") or vehicle.get("Nombre") or 
-                vehicle.get("placa") or vehicle.get("Placa") or 
-                vehicle.get("PlacaVehiculo") or 
-                f"Vehículo {idx + 1}"
-            )
-            
-            markers_data.append({
-                "lat": float(lat),
-                "lon": float(lon),
-                "info": nombre
-            })
+    # Vehículos con coordenadas válidas (máscara de la foto columnar)
+    marker_count = snapshot.valid_count
     
     # Si no hay coordenadas válidas, mostrar mensaje
-    if not markers_data:
+    if not marker_count:
         return ft.Container(
             content=ft.Column(
                 [
@@ -94,30 +57,38 @@ def create_map_with_markers(vehicles_data: list, width: int = None, height: int
             padding=20,
         )
     
-    # Calcular centro del mapa
-    center_lat = sum(lats) / len(lats) if lats else 19.4326  # Default: Ciudad de México
-    center_lon = sum(lons) / len(lons) if lons else -99.1332
+    # Primeros 10 puntos para el enlace de Google Maps (paradas de la ruta)
+    markers_data = [
+        {"lat": lat, "lon": lon, "info": name}
+        for lat, lon, name in snapshot.points(limit=10)
+    ]
     
     # Calcular tamaño del mapa
     map_width = width or 800
     map_height = (height - 80) if height else 520  # Dejar espacio para botón y texto
+    # Tamaño que de verdad sirve la API estática (máx. 640 por lado, con
+    # scale=2 si la vista es mayor); la imagen se estira a map_width x map_height
+    image_width, image_height, image_scale = static_map_size(map_width, map_height)
+    
+    # Centro y zoom que encuadran a toda la flota en el tamaño real de la imagen
+    center_lat, center_lon, zoom = fit_bounds(snapshot.bbox(), image_width, image_height)
     
     # Crear URL para Google Maps Embed API (permite iframe interactivo)
     # Para múltiples marcadores, necesitamos usar una URL diferente
-    if len(markers_data) <= 1:
+    if marker_count <= 1:
         # Un solo marcador - usar Embed API
-        embed_url = f"https://www.google.com/maps/embed/v1/place?key={GOOGLE_MAPS_API_KEY}&q={center_lat},{center_lon}&zoom=13"
+        embed_url = f"https://www.google.com/maps/embed/v1/place?key={GOOGLE_MAPS_API_KEY}&q={center_lat},{center_lon}&zoom={zoom}"
     else:
         # Múltiples marcadores - usar formato de dirección
         # Para Embed API con múltiples puntos, usamos el centro y agregamos marcadores
-        embed_url = f"https://www.google.com/maps/embed/v1/view?key={GOOGLE_MAPS_API_KEY}&center={center_lat},{center_lon}&zoom=11"
+        embed_url = f"https://www.google.com/maps/embed/v1/view?key={GOOGLE_MAPS_API_KEY}&center={center_lat},{center_lon}&zoom={zoom}"
     
     # URL para abrir en Google Maps completo (para obtener direcciones)
-    if len(markers_data) == 1:
+    if marker_count == 1:
         full_map_url = f"https://www.google.com/maps?q={markers_data[0]['lat']},{markers_data[0]['lon']}"
     else:
         # Para múltiples marcadores, usar formato de dirección
-        coords = "|".join([f"{m['lat']},{m['lon']}" for m in markers_data[:10]])
+        coords = "|".join([f"{m['lat']},{m['lon']}" for m in markers_data])
         full_map_url = f"https://www.google.com/maps/dir/{coords}"
     
     # Crear HTML con iframe para el mapa embebido
@@ -168,54 +139,61 @@ def create_map_with_markers(vehicles_data: list, width: int = None, height: int
     # que abra el mapa en una nueva ventana, pero con un preview mejorado
     # Alternativa: mostrar imagen estática con botón para mapa interactivo embebido
     
-    # Crear URL para imagen estática como preview
-    # Calcular zoom adecuado basado en el área cubierta
-    if len(markers_data) > 1:
-        # Calcular el rango de coordenadas
-        lat_range = max(lats) - min(lats)
-        lon_range = max(lons) - min(lons)
-        max_range = max(lat_range, lon_range)
-        
-        # Ajustar zoom según el rango (mayor rango = menor zoom)
-        if max_range > 0.1:
-            zoom = 10
-        elif max_range > 0.05:
-            zoom = 11
-        elif max_range > 0.02:
-            zoom = 12
-        else:
-            zoom = 13
-    else:
-        zoom = 15
+    # Grupos por zoom (una vez por foto de la flota): cada vehículo aparece
+    # como marcador o dentro de una burbuja de grupo. Con página, el primer
+    # mapa solo calcula su zoom y el resto se completa después (fill_async)
+    levels = clusters_for(snapshot, eager=page is None)
+    zoom = levels.clamp(zoom)
     
-    # Crear marcadores con etiquetas numeradas (máximo 10 para la API estática)
-    markers_str = "&".join([f"markers=color:red|label:{i+1}|{m['lat']},{m['lon']}" for i, m in enumerate(markers_data[:10])])
+    def static_preview(zoom_level: int):
+        visible = levels.visible(zoom_level, center_lat, center_lon, image_width, image_height)
+        builder = StaticMapBuilder(
+            (center_lat, center_lon), zoom_level, (image_width, image_height), GOOGLE_MAPS_API_KEY,
+            scale=image_scale,
+        )
+        _add_cluster_markers(builder, visible)
+        result = builder.build()
+        return result.url, (visible, result)
     
-    # Si hay más de 10 vehículos, agregar un marcador adicional en el centro
-    if len(markers_data) > 10:
-        markers_str += f"&markers=color:blue|label:C|{center_lat},{center_lon}"
+    static_preview_url, preview_info = static_preview(zoom)
+    if page:
+        page.run_task(levels.fill_async)
     
-    static_preview_url = (
-        f"https://maps.googleapis.com/maps/api/staticmap?"
-        f"center={center_lat},{center_lon}&"
-        f"zoom={zoom}&"
-        f"size={map_width}x{map_height}&"
-        f"{markers_str}&"
-        f"key={GOOGLE_MAPS_API_KEY}"
+    preview_image = ft.Image(
+        src=static_preview_url,
+        fit=ft.ImageFit.COVER,
+        width=map_width,
+        height=map_height,
+    )
+    info_text = ft.Text(
+        _get_map_info_text(marker_count, *preview_info),
+        size=12,
+        color="#757575",
+        text_align=ft.TextAlign.CENTER,
     )
     
+    def change_zoom(delta: int):
+        # Solo se lee otro nivel ya calculado y se cambia la URL de la imagen
+        nonlocal zoom
+        new_zoom = levels.clamp(zoom + delta)
+        if new_zoom == zoom:
+            return
+        zoom = new_zoom
+        preview_image.src, shown = static_preview(zoom)
+        info_text.value = _get_map_info_text(marker_count, *shown)
+        try:
+            preview_image.update()
+            info_text.update()
+        except AssertionError:
+            pass  # El mapa ya no está en la página
+    
     # Crear componente con preview y botón para mapa interactivo
     return ft.Container(
         content=ft.Column(
             [
                 # Preview del mapa (imagen estática)
                 ft.Container(
-                    content=ft.Image(
-                        src=static_preview_url,
-                        fit=ft.ImageFit.COVER,
-                        width=map_width,
-                        height=map_height,
-                    ),
+                    content=preview_image,
                     width=map_width,
                     height=map_height,
                     border_radius=8,
@@ -223,19 +201,21 @@ def create_map_with_markers(vehicles_data: list, width: int = None, height: int
                     border=ft.border.all(1, "#E0E0E0"),
                     on_click=open_full_map,  # Click en la imagen abre el mapa completo
                 ),
-                # Botón para abrir mapa interactivo completo
-                PrimaryPillButton(
-                    "Abrir mapa interactivo completo",
-                    on_click=open_full_map,
-                    width=map_width if map_width else 320,
+                ft.Row(
+                    [
+                        ft.IconButton(icon="zoom_out", tooltip="Alejar", on_click=lambda e: change_zoom(-1)),
+                        # Botón para abrir mapa interactivo completo
+                        PrimaryPillButton(
+                            "Abrir mapa interactivo completo",
+                            on_click=open_full_map,
+                            width=320,
+                        ),
+                        ft.IconButton(icon="zoom_in", tooltip="Acercar", on_click=lambda e: change_zoom(1)),
+                    ],
+                    alignment=ft.MainAxisAlignment.CENTER,
                 ),
                 # Información de vehículos
-                ft.Text(
-                    _get_map_info_text(len(markers_data)),
-                    size=12,
-                    color="#757575",
-                    text_align=ft.TextAlign.CENTER,
-                ),
+                info_text,
             ],
             spacing=10,
             horizontal_alignment=ft.CrossAxisAlignment.CENTER,
@@ -246,20 +226,20 @@ def create_map_with_markers(vehicles_data: list, width: int = None, height: int
     )
 
 
-def create_vehicle_map_modal(page: ft.Page, vehicle: dict, lat: float, lon: float, vehicle_name: str = ""):
+def create_vehicle_map_modal(page: ft.Page, vehicle: Vehicle, lat: float, lon: float, vehicle_name: str = ""):
     """
     Crea un diálogo modal con un mapa interactivo del vehículo individual.
     Permite ver el mapa, hacer zoom, mover y obtener direcciones.
     
     Args:
         page: Página de Flet
-        vehicle: Diccionario con datos del vehículo
+        vehicle: Vehicle con los datos del vehículo
         lat: Latitud del vehículo
         lon: Longitud del vehículo
         vehicle_name: Nombre del vehículo para mostrar
     """
-    # URL para Google Maps Embed API del vehículo
-    embed_url = f"https://www.google.com/maps/embed/v1/place?key={GOOGLE_MAPS_API_KEY}&q={lat},{lon}&zoom=15"
+    # URL para Google Maps Embed API del vehículo (mismo zoom que un solo punto en el mapa de la flota)
+    embed_url = f"https://www.google.com/maps/embed/v1/place?key={GOOGLE_MAPS_API_KEY}&q={lat},{lon}&zoom={MAP_SINGLE_POINT_ZOOM}"
     
     # URL para abrir en Google Maps completo (para direcciones)
     full_map_url = f"https://www.google.com/maps?q={lat},{lon}"
@@ -274,10 +254,10 @@ def create_vehicle_map_modal(page: ft.Page, vehicle: dict, lat: float, lon: floa
         page.launch_url(full_map_url, web_window_name="_blank")
     
     # Información del vehículo
-    placas = vehicle.get("placas") or vehicle.get("Placas") or vehicle_name or "Vehículo"
-    economico = vehicle.get("economico") or vehicle.get("Economico") or ""
-    marca = vehicle.get("marca") or vehicle.get("Marca") or ""
-    modelo = vehicle.get("modelo") or vehicle.get("Modelo") or ""
+    placas = vehicle.placas or vehicle_name or "Vehículo"
+    economico = vehicle.economico
+    marca = vehicle.marca
+    modelo = vehicle.modelo
     
     title_text = placas
     if economico:
@@ -343,14 +323,37 @@ def create_vehicle_map_modal(page: ft.Page, vehicle: dict, lat: float, lon: floa
     return dialog
 
 
-def _get_map_info_text(num_vehicles: int) -> str:
+def _add_cluster_markers(builder: StaticMapBuilder, clusters: list):
+    """
+    Un estilo de marcador por tamaño de grupo: vehículo suelto en rojo,
+    grupos de 2-9 en azul con la cantidad, decenas ("D") en naranja y
+    centenas o más ("C") en morado. Los grupos grandes van primero para que
+    sean lo último en omitirse si la URL no alcanza.
+    """
+    for cluster in sorted(clusters, key=lambda c: -c.count):
+        if cluster.count == 1:
+            style = "size:small|color:red"
+        elif cluster.count < 10:
+            style = f"color:blue|label:{cluster.count}"
+        elif cluster.count < 100:
+            style = "color:orange|label:D"
+        else:
+            style = "color:purple|label:C"
+        builder.add_markers(style, [(cluster.lat, cluster.lon)])
+
+
+def _get_map_info_text(num_vehicles: int, clusters: list = (), static_map=None) -> str:
     """Genera el texto informativo para el mapa"""
     info_text = f"📍 {num_vehicles} vehículo(s) en el mapa"
-    if num_vehicles > 10:
-        info_text += f" (mostrando primeros 10 marcadores)"
+    groups = [c.count for c in clusters if c.count > 1]
+    if groups:
+        info_text += f" ({len(groups)} grupo(s): azul = 2-9, D = 10-99, C = 100 o más)"
+    if static_map is not None and static_map.omitted:
+        info_text += f" - {static_map.omitted} marcador(es) no caben en la vista previa"
     info_text += " - Haz clic en el mapa o usa el botón para verlo interactivo con zoom y desplazamiento"
     return info_text
 
+
 def _open_url(url: str):
     """Función auxiliar para abrir URLs en el navegador (fallback cuando no hay page)"""
     import webbrowser
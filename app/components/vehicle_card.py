@@ -2,58 +2,51 @@
 
 import flet as ft
 from app.components.map import create_vehicle_map_modal
+from app.config import THUMBNAIL_CARD_SCALE
+from app.services.normalize import Vehicle
+from app.services.thumbnails import fetch_thumbnail_async, thumbnail_src
 
-def create_vehicle_card(vehicle: dict, on_click=None, page: ft.Page = None):
+def _info_row(icon: str) -> tuple:
+    """Fila de información (ícono + texto); devuelve (fila, texto)."""
+    text = ft.Text("", size=12, color="#616161")
+    row = ft.Row(
+        [
+            ft.Icon(icon, size=16, color="#757575"),
+            text,
+        ],
+        spacing=4,
+        visible=False,
+    )
+    return row, text
+
+
+class VehicleCard(ft.Container):
     """
-    Crea una tarjeta personalizada para mostrar información de un vehículo.
-    
-    Args:
-        vehicle: Diccionario con datos del vehículo
-        on_click: Función callback cuando se hace clic en la tarjeta
-        page: Página de Flet para mostrar el mapa modal (opcional)
+    Tarjeta de un vehículo que es dueña de sus controles. bind(vehicle)
+    solo cambia textos, la fuente de la imagen y banderas de visibilidad,
+    así que una tarjeta ya en pantalla se reutiliza para otro vehículo (o
+    para el mismo con datos nuevos) y Flet envía únicamente esos atributos.
+
+    data es el Vehicle actual: si solo cambia la posición, la vista
+    reemplaza data sin redibujar (data no se envía al cliente).
     """
-    # Extraer información del vehículo
-    placas = vehicle.get("placas") or vehicle.get("Placas") or "N/A"
-    economico = vehicle.get("economico") or vehicle.get("Economico") or ""
-    marca = vehicle.get("marca") or vehicle.get("Marca") or ""
-    modelo = vehicle.get("modelo") or vehicle.get("Modelo") or ""
-    anio = vehicle.get("anio") or vehicle.get("Anio") or ""
-    color = vehicle.get("color") or vehicle.get("Color") or ""
-    imagen = vehicle.get("imagen") or vehicle.get("Imagen") or ""
-    cliente = vehicle.get("cliente") or vehicle.get("Cliente") or ""
-    km = vehicle.get("km") or vehicle.get("Km") or 0
-    imei = vehicle.get("imei") or vehicle.get("IMEI") or ""
-    
-    # Construir información de la tarjeta
-    title = f"{placas}"
-    if economico:
-        title += f" - {economico}"
-    
-    subtitle = f"{marca} {modelo}".strip()
-    if anio:
-        subtitle += f" ({anio})"
-    
-    # Imagen del vehículo
-    image_content = None
-    if imagen:
-        try:
-            image_content = ft.Image(
-                src=imagen,
-                fit=ft.ImageFit.COVER,
-                width=200,
-                height=150,
-                border_radius=8,
-            )
-        except:
-            image_content = None
-    
-    if not image_content:
-        # Placeholder si no hay imagen
-        image_content = ft.Container(
+
+    def __init__(self, on_click=None, page: ft.Page = None):
+        # Imagen del vehículo y placeholder si no hay imagen (se alterna visible)
+        self._image = ft.Image(
+            src="",
+            fit=ft.ImageFit.COVER,
+            width=200,
+            height=150,
+            border_radius=8,
+            visible=False,
+        )
+        self._placeholder_text = ft.Text("Sin imagen", size=12, color="#9E9E9E")
+        self._placeholder = ft.Container(
             content=ft.Column(
                 [
                     ft.Icon("directions_car", size=48, color="#9E9E9E"),
-                    ft.Text("Sin imagen", size=12, color="#9E9E9E"),
+                    self._placeholder_text,
                 ],
                 alignment=ft.MainAxisAlignment.CENTER,
                 horizontal_alignment=ft.CrossAxisAlignment.CENTER,
@@ -64,167 +57,155 @@ def create_vehicle_card(vehicle: dict, on_click=None, page: ft.Page = None):
             border_radius=8,
             alignment=ft.alignment.center,
         )
-    
-    # Información adicional
-    info_items = []
-    
-    if color:
-        info_items.append(
-            ft.Row(
-                [
-                    ft.Icon("palette", size=16, color="#757575"),
-                    ft.Text(f"Color: {color}", size=12, color="#616161"),
-                ],
-                spacing=4,
-            )
-        )
-    
-    if cliente:
-        info_items.append(
-            ft.Row(
-                [
-                    ft.Icon("person", size=16, color="#757575"),
-                    ft.Text(f"Cliente: {cliente[:30]}...", size=12, color="#616161"),
-                ],
-                spacing=4,
-            )
-        )
-    
-    if km:
-        info_items.append(
-            ft.Row(
-                [
-                    ft.Icon("speed", size=16, color="#757575"),
-                    ft.Text(f"KM: {km:,.0f}", size=12, color="#616161"),
-                ],
-                spacing=4,
-            )
-        )
-    
-    if imei:
-        info_items.append(
-            ft.Row(
+        self._title = ft.Text("", size=18, weight=ft.FontWeight.BOLD, color="#212121")
+        self._subtitle = ft.Text("", size=14, color="#757575")
+        
+        # Información adicional (cada fila se oculta si el dato no existe)
+        self._color_row, self._color = _info_row("palette")
+        self._cliente_row, self._cliente = _info_row("person")
+        self._km_row, self._km = _info_row("speed")
+        self._imei_row, self._imei = _info_row("gps_fixed")
+        
+        self._app_page = page  # Para pedir la miniatura en segundo plano
+        
+        super().__init__(
+            content=ft.Row(
                 [
-                    ft.Icon("gps_fixed", size=16, color="#757575"),
-                    ft.Text(f"IMEI: {imei}", size=12, color="#616161"),
-                ],
-                spacing=4,
-            )
-        )
-    
-    # Contenido principal de la tarjeta
-    card_content = ft.Container(
-        content=ft.Row(
-            [
-                # Imagen
-                image_content,
-                
-                # Información
-                ft.Container(
-                    content=ft.Column(
-                        [
-                            ft.Text(
-                                title,
-                                size=18,
-                                weight=ft.FontWeight.BOLD,
-                                color="#212121",
-                            ),
-                            ft.Text(
-                                subtitle,
-                                size=14,
-                                color="#757575",
-                            ),
-                            ft.Divider(height=10, color="transparent"),
-                            ft.Column(
-                                info_items,
-                                spacing=6,
-                                tight=True,
-                            ),
-                            # Botón para ver mapa del vehículo
-                            ft.Row(
-                                [
-                                    ft.ElevatedButton(
-                                        "Ver en mapa",
-                                        icon="map",
-                                        on_click=lambda e, v=vehicle: _show_vehicle_map(v, page),
-                                        style=ft.ButtonStyle(
-                                            color="#FFFFFF",
-                                            bgcolor="#0D2571",
+                    # Imagen
+                    self._image,
+                    self._placeholder,
+                    
+                    # Información
+                    ft.Container(
+                        content=ft.Column(
+                            [
+                                self._title,
+                                self._subtitle,
+                                ft.Divider(height=10, color="transparent"),
+                                ft.Column(
+                                    [self._color_row, self._cliente_row, self._km_row, self._imei_row],
+                                    spacing=6,
+                                    tight=True,
+                                ),
+                                # Botón para ver mapa del vehículo
+                                ft.Row(
+                                    [
+                                        ft.ElevatedButton(
+                                            "Ver en mapa",
+                                            icon="map",
+                                            on_click=lambda e: _show_vehicle_map(self.data, page),
+                                            style=ft.ButtonStyle(
+                                                color="#FFFFFF",
+                                                bgcolor="#0D2571",
+                                            ),
+                                            height=36,
                                         ),
-                                        height=36,
-                                    ),
-                                ],
-                                spacing=8,
-                            ) if page else ft.Container(),
-                        ],
-                        spacing=8,
+                                    ],
+                                    spacing=8,
+                                ) if page else ft.Container(),
+                            ],
+                            spacing=8,
+                            expand=True,
+                            alignment=ft.MainAxisAlignment.START,
+                        ),
                         expand=True,
-                        alignment=ft.MainAxisAlignment.START,
+                        padding=ft.padding.only(left=16),
                     ),
-                    expand=True,
-                    padding=ft.padding.only(left=16),
-                ),
-            ],
-            spacing=16,
-            vertical_alignment=ft.CrossAxisAlignment.START,
-        ),
-        padding=16,
-        bgcolor="#FFFFFF",
-        border_radius=12,
-        border=ft.border.all(1, "#E0E0E0"),
-        shadow=ft.BoxShadow(
-            spread_radius=1,
-            blur_radius=8,
-            color="#00000015",
-            offset=ft.Offset(0, 2),
-        ),
-    )
-    
-    # Si hay un callback, hacer la tarjeta clickeable
-    if on_click:
-        card_content.on_click = lambda e: on_click(vehicle)
-        # Nota: ft.Cursor no está disponible en Flet 0.28.3
+                ],
+                spacing=16,
+                vertical_alignment=ft.CrossAxisAlignment.START,
+            ),
+            padding=16,
+            bgcolor="#FFFFFF",
+            border_radius=12,
+            border=ft.border.all(1, "#E0E0E0"),
+            shadow=ft.BoxShadow(
+                spread_radius=1,
+                blur_radius=8,
+                color="#00000015",
+                offset=ft.Offset(0, 2),
+            ),
+        )
+        
+        # Si hay un callback, hacer la tarjeta clickeable
+        if on_click:
+            self.on_click = lambda e: on_click(self.data)
+            # Nota: ft.Cursor no está disponible en Flet 0.28.3
+    
+    def bind(self, vehicle: Vehicle) -> "VehicleCard":
+        """Muestra otro vehículo en esta tarjeta (sin crear controles)."""
+        self.data = vehicle
+        
+        # Construir información de la tarjeta
+        title = f"{vehicle.placas or 'N/A'}"
+        if vehicle.economico:
+            title += f" - {vehicle.economico}"
+        subtitle = f"{vehicle.marca} {vehicle.modelo}".strip()
+        if vehicle.anio:
+            subtitle += f" ({vehicle.anio})"
+        self._title.value = title
+        self._subtitle.value = subtitle
+        
+        # Miniatura del tamaño de la tarjeta; si aún no existe se pide y
+        # mientras tanto se muestra el placeholder
+        imagen = vehicle.imagen
+        src = thumbnail_src(imagen, THUMBNAIL_CARD_SCALE)
+        if imagen and src is None:
+            if self._app_page is not None:
+                self._app_page.run_task(self._load_thumbnail, imagen)
+            else:
+                src = imagen  # Sin page no hay cómo pedirla: foto original
+        self._show_image(src, loading=bool(imagen))
+        
+        color, cliente, km, imei = vehicle.color, vehicle.cliente, vehicle.km, vehicle.imei
+        self._color.value = f"Color: {color}" if color else ""
+        self._color_row.visible = bool(color)
+        self._cliente.value = f"Cliente: {cliente[:30]}..." if cliente else ""
+        self._cliente_row.visible = bool(cliente)
+        self._km.value = f"KM: {km:,.0f}" if km else ""
+        self._km_row.visible = bool(km)
+        self._imei.value = f"IMEI: {imei}" if imei else ""
+        self._imei_row.visible = bool(imei)
+        return self
+    
+    def _show_image(self, src, loading: bool = False):
+        self._image.src = src or ""
+        self._image.visible = bool(src)
+        self._placeholder.visible = not src
+        self._placeholder_text.value = "Cargando..." if loading and not src else "Sin imagen"
+    
+    async def _load_thumbnail(self, url: str):
+        src = await fetch_thumbnail_async(url, THUMBNAIL_CARD_SCALE)
+        # La tarjeta pudo reasignarse a otro vehículo mientras tanto
+        if self.data is None or self.data.imagen != url:
+            return
+        self._show_image(src)
+        try:
+            self.update()
+        except AssertionError:
+            pass  # La tarjeta no está en la página
+
+
+def create_vehicle_card(vehicle: Vehicle, on_click=None, page: ft.Page = None):
+    """
+    Crea una tarjeta personalizada para mostrar información de un vehículo.
     
-    return card_content
+    Args:
+        vehicle: Vehicle con los datos del vehículo (ya normalizado)
+        on_click: Función callback cuando se hace clic en la tarjeta
+        page: Página de Flet para mostrar el mapa modal (opcional)
+    """
+    return VehicleCard(on_click=on_click, page=page).bind(vehicle)
 
 
-def _show_vehicle_map(vehicle: dict, page: ft.Page):
+def _show_vehicle_map(vehicle: Vehicle, page: ft.Page):
     """Muestra el mapa modal del vehículo"""
     if not page:
         return
     
-    # Buscar coordenadas del vehículo
-    lat = (
-        vehicle.get("latitud") or vehicle.get("Latitud") or 
-        vehicle.get("lat") or vehicle.get("latitude") or
-        vehicle.get("Latitude") or vehicle.get("y") or 0
-    )
-    lon = (
-        vehicle.get("longitud") or vehicle.get("Longitud") or 
-        vehicle.get("lon") or vehicle.get("lng") or vehicle.get("longitude") or
-        vehicle.get("Longitude") or vehicle.get("x") or 0
-    )
-    
-    # Si no hay coordenadas directas, buscar en objeto anidado
-    if not lat or not lon:
-        ubicacion = vehicle.get("ubicacion") or vehicle.get("Ubicacion") or vehicle.get("location") or vehicle.get("Location") or {}
-        lat = lat or ubicacion.get("latitud") or ubicacion.get("Latitud") or ubicacion.get("lat") or ubicacion.get("latitude") or 0
-        lon = lon or ubicacion.get("longitud") or ubicacion.get("Longitud") or ubicacion.get("lon") or ubicacion.get("lng") or ubicacion.get("longitude") or 0
-    
-    if lat and lon and float(lat) != 0 and float(lon) != 0:
-        # Obtener nombre del vehículo
-        nombre = (
-            vehicle.get("placas") or vehicle.get("Placas") or
-            vehicle.get("economico") or vehicle.get("Economico") or
-            vehicle.get("descripcion") or vehicle.get("Descripcion") or
-            vehicle.get("nombre") or vehicle.get("Nombre") or 
-            vehicle.get("placa") or vehicle.get("Placa") or 
-            vehicle.get("PlacaVehiculo") or 
-            "Vehículo"
-        )
-        
+    if vehicle.has_position:
         # Crear y mostrar el modal del mapa
-        map_dialog = create_vehicle_map_modal(page, vehicle, float(lat), float(lon), nombre)
+        map_dialog = create_vehicle_map_modal(page, vehicle, vehicle.lat, vehicle.lon, vehicle.name)
         page.dialog = map_dialog
         map_dialog.open = True
         page.update()
@@ -0,0 +1,147 @@
+# app/components/virtual_list.py
+
+import math
+import threading
+
+import flet as ft
+from app.config import (
+    VEHICLE_LIST_ITEM_EXTENT,
+    VEHICLE_LIST_SPACING,
+    VIRTUAL_LIST_OVERSCAN,
+    VIRTUAL_LIST_SCROLL_INTERVAL_MS,
+)
+
+
+class VirtualList:
+    """
+    Lista con scroll que solo materializa las filas cercanas a lo visible.
+    Cada fila mide `item_extent` píxeles (contenido + `spacing`), así que la
+    posición del scroll dice qué filas se ven sin medir nada. Dos
+    separadores vacíos (arriba y abajo) ocupan el alto de las filas que no
+    existen, para que la barra de scroll represente la lista completa.
+
+    Las filas son un grupo fijo de casillas reutilizables: la casilla i
+    muestra la clave start + i. Al hacer scroll o cambiar las claves, el
+    contenido de cada casilla se reasigna en su lugar con
+    bind_item(content, key), así que Flet solo envía los atributos que
+    cambiaron en lugar de tarjetas completas. make_item(key) solo se llama
+    cuando hace falta una casilla más (la ventana más grande vista hasta
+    ahora); las que sobran quedan guardadas para reutilizarse.
+
+    `control` es el ft.ListView a insertar en la vista.
+    """
+
+    def __init__(
+        self,
+        make_item,
+        bind_item,
+        item_extent: int = VEHICLE_LIST_ITEM_EXTENT,
+        spacing: int = VEHICLE_LIST_SPACING,
+        viewport_height: float = 800,
+        overscan: int = VIRTUAL_LIST_OVERSCAN,
+    ):
+        self.make_item = make_item
+        self.bind_item = bind_item
+        self.item_extent = item_extent
+        self.spacing = spacing
+        self.viewport_height = viewport_height
+        self.overscan = overscan
+        self.keys = []
+        self.rows = {}      # clave -> casilla (ft.Container) en pantalla
+        self.start = 0      # Ventana materializada: keys[start:end]
+        self.end = 0
+        self.offset = 0.0   # Último scroll conocido, en píxeles
+        self._slots = []    # Casillas creadas; data = clave que muestran
+        self._top = ft.Container(height=0)
+        self._bottom = ft.Container(height=0)
+        self._lock = threading.RLock()  # Scroll (hilo de eventos) y datos (event loop)
+        self.control = ft.ListView(
+            [self._top, self._bottom],
+            spacing=0,
+            expand=True,
+            on_scroll=self._on_scroll,
+            on_scroll_interval=VIRTUAL_LIST_SCROLL_INTERVAL_MS,
+        )
+
+    def __len__(self):
+        return len(self.keys)
+
+    def items(self):
+        """[(clave, contenido)] de las filas en pantalla."""
+        with self._lock:
+            return [(key, row.content) for key, row in self.rows.items()]
+
+    def set_keys(self, keys, reset: bool = False):
+        """
+        Cambia las filas de la lista (orden incluido). Con reset=True se
+        vuelven a asignar todas aunque la clave de la casilla sea la misma.
+        """
+        with self._lock:
+            self.keys = list(keys)
+            # Si la lista se acortó, el scroll del cliente termina en el final
+            limit = max(0.0, len(self.keys) * self.item_extent - self.viewport_height)
+            self.offset = min(self.offset, limit)
+            if reset:
+                for slot in self._slots:
+                    slot.data = _UNBOUND
+            self._render(force=True)
+
+    def invalidate(self, keys):
+        """Las filas de esas claves se vuelven a asignar en el próximo cuadro."""
+        with self._lock:
+            for key in keys:
+                row = self.rows.get(key)
+                if row is not None:
+                    row.data = _UNBOUND
+
+    def _on_scroll(self, e: ft.OnScrollEvent):
+        self.offset = e.pixels or 0.0
+        if e.viewport_dimension:
+            self.viewport_height = e.viewport_dimension
+        with self._lock:
+            changed = self._render()
+        if changed:
+            try:
+                self.control.update()
+            except AssertionError:
+                pass  # La lista ya no está en la página
+
+    def _visible(self) -> tuple:
+        """Rango [first, last) de filas que se ven con el scroll actual."""
+        first = int(self.offset // self.item_extent)
+        last = first + math.ceil(self.viewport_height / self.item_extent) + 1
+        return max(0, first), min(len(self.keys), last)
+
+    def _render(self, force: bool = False) -> bool:
+        first, last = self._visible()
+        # Mientras lo visible siga dentro de la ventana no hay nada que enviar
+        if not force and self.start <= first and last <= self.end:
+            return False
+        start = max(0, first - self.overscan)
+        end = max(start, min(len(self.keys), last + self.overscan))
+        window = self.keys[start:end]
+
+        while len(self._slots) < len(window):
+            key = window[len(self._slots)]
+            self._slots.append(ft.Container(
+                content=self.make_item(key),
+                height=self.item_extent,
+                padding=ft.padding.only(bottom=self.spacing),
+                data=key,
+            ))
+        rows = self._slots[:len(window)]
+        for slot, key in zip(rows, window):
+            if slot.data is _UNBOUND or slot.data != key:
+                self.bind_item(slot.content, key)
+                slot.data = key
+
+        self.rows = dict(zip(window, rows))
+        self.start, self.end = start, end
+        self._top.height = start * self.item_extent
+        self._bottom.height = (len(self.keys) - end) * self.item_extent
+        self.control.controls = [self._top, *rows, self._bottom]
+        return True
+
+
+# Marca de casilla que debe volver a asignarse aunque su clave no cambie
+_UNBOUND = object()
@@ -1,11 +1,134 @@
 # app/config.py
 
+import os
+
 # URLs de la API - Usar HTTPS para evitar Mixed Content en producción
 # Si el servidor no soporta HTTPS, el navegador bloqueará las peticiones desde HTTPS
-AUTH_URL = "https://springtelecom.mx/dev/devsionapi/api/Authentication/TokenApp"
-VEHICLES_URL = "https://springtelecom.mx/dev/devsionapi/api/Vehiculos"
-VEHICLES_LAST_POSITIONS_URL = "https://springtelecom.mx/dev/devsionapi/api/Vehiculo/ultimaVehiculos"
+API_BASE_URL = "https://springtelecom.mx/dev/devsionapi/api"
+AUTH_URL = f"{API_BASE_URL}/Authentication/TokenApp"
+VEHICLES_URL = f"{API_BASE_URL}/Vehiculos"
+VEHICLES_LAST_POSITIONS_URL = f"{API_BASE_URL}/Vehiculo/ultimaVehiculos"
 API_TIMEOUT_SECONDS = 15  # Aumentado para evitar timeouts con headers grandes
+# Zona horaria de las fechas de la API que llegan sin zona (ISO sin offset):
+# hora del centro de México, UTC-6 fijo (sin horario de verano desde 2022)
+API_UTC_OFFSET_HOURS = -6
+
+# Pool de conexiones keep-alive compartido por todos los servicios
+# (app/services/api.py). Evita un handshake TCP+TLS por cada petición.
+API_POOL_CONNECTIONS = 4   # Hosts distintos que se mantienen en el pool
+API_POOL_MAXSIZE = 10      # Conexiones simultáneas reutilizables por host
+
+# Decodificación en streaming de listas grandes (api.stream_json)
+STREAM_CHUNK_SIZE = 64 * 1024   # Bytes leídos por trozo
+STREAM_BATCH_SIZE = 200         # Registros entregados por lote a la vista
+
+# Normalización de vehículos (app/services/normalize.py): registros de la
+# muestra con la que se detecta qué variante de cada clave usa el payload
+SCHEMA_SAMPLE_RECORDS = 5
+
+# Tamaño de respuestas (app/services/metrics.py). Un cuerpo descomprimido
+# mayor a este límite se marca como "oversized" para detectar regresiones.
+PAYLOAD_WARN_BYTES = {
+    "Vehiculos": 5 * 1024 * 1024,
+    "Vehiculo/ultimaVehiculos": 5 * 1024 * 1024,
+}
+PAYLOAD_DEFAULT_WARN_BYTES = 1024 * 1024
+
+# Ciclo de vida del token (app/services/tokens.py)
+TOKEN_REFRESH_MARGIN_SECONDS = 60   # Re-autenticar este tiempo antes del "exp" del JWT
+TOKEN_REFRESH_RETRY_SECONDS = 30    # Espera tras un re-login fallido antes de reintentar
+
+# Directorio de datos persistentes de la app (cachés locales).
+# Flet define FLET_APP_STORAGE_DATA en las apps empaquetadas.
+APP_DATA_DIR = os.getenv("FLET_APP_STORAGE_DATA") or os.path.join(os.path.expanduser("~"), ".nextapp")
+
+# Descubrimiento de endpoints de ubicación (app/services/endpoints.py)
+ENDPOINT_CACHE_FILE = os.path.join(APP_DATA_DIR, "endpoints.json")
+ENDPOINT_FAILURE_THRESHOLD = 3        # Fallos seguidos antes de descartar un endpoint
+ENDPOINT_NEGATIVE_TTL_SECONDS = 600   # Tiempo que un endpoint descartado no se vuelve a probar
+ENDPOINT_MISS_THRESHOLD = 10          # Vehículos distintos con 404 seguidos para dar la ruta por mala
+
+# Consulta masiva de ubicaciones (get_all_vehicles_locations)
+LOCATIONS_CONCURRENCY = 8                # Peticiones simultáneas como máximo
+LOCATIONS_BATCH_DEADLINE_SECONDS = 60    # Tiempo máximo para todo el lote
+LOCATIONS_MAP_REFRESH_SECONDS = 1.0      # Cada cuánto se redibuja el mapa mientras llegan
+
+# Caché de respuestas en memoria (app/services/cache.py), TTL por endpoint.
+# Vencido el TTL se sirve el dato viejo y se revalida en segundo plano.
+CACHE_TTL_SECONDS = {
+    "vehicles": 300,   # Catálogo de vehículos: cambia poco
+    "positions": 15,   # Últimas posiciones
+}
+CACHE_DEFAULT_TTL_SECONDS = 30
+
+# Refrescos de la flota (app/state/diff.py): un vehículo cuenta como "movido"
+# solo si se desplazó más que esto entre dos fotos consecutivas
+DIFF_MOVE_THRESHOLD_METERS = 25
+
+# Índice de la flota (app/state/fleet_index.py): si un refresco cambia más
+# de esta fracción de vehículos, se reconstruye en lugar de aplicar diferencias
+FLEET_INDEX_REBUILD_RATIO = 0.25
+# Al reconstruirlo en segundo plano (rebuild_async) se cede el event loop
+# cada tantos vehículos, para que la interfaz siga respondiendo
+FLEET_INDEX_CHUNK_SIZE = 2000
+
+# Índice espacial de posiciones (app/geo/spatial.py): tamaño de celda de la
+# malla, en grados (0.01° ≈ 1.1 km de latitud)
+GEO_GRID_CELL_DEGREES = 0.01
+
+# Agrupación de marcadores (app/geo/clustering.py): radio de agrupación en
+# píxeles de pantalla y rango de zoom precalculado para cada foto de la flota
+CLUSTER_RADIUS_PX = 40
+CLUSTER_MIN_ZOOM = 3
+CLUSTER_MAX_ZOOM = 18
+# Los zooms que el primer mapa no necesita se calculan después, cediendo el
+# event loop cada tantos grupos (ClusterLevels.fill_async)
+CLUSTER_CHUNK_SIZE = 5000
+
+# URL de la vista previa estática (app/geo/static_maps.py). Google limita la
+# URL de la API estática a 16384 caracteres. Con ENCODED_MARKERS las
+# ubicaciones de cada estilo pueden ir como polilínea codificada ("enc:").
+# Google documenta "enc:" solo para path=, no para markers=: activarlo solo
+# después de comprobarlo contra la API real.
+STATIC_MAPS_MAX_URL_LENGTH = 16384
+# Lado máximo de la imagen que sirve la API (640 px; hasta 1280 con scale=2)
+STATIC_MAPS_MAX_SIZE_PX = 640
+STATIC_MAPS_ENCODED_MARKERS = False
+
+# Encuadre de mapas (app/geo/viewport.py)
+MAP_FIT_PADDING_PX = 40       # Margen libre en cada borde de la imagen
+MAP_MIN_ZOOM = 3
+MAP_MAX_FIT_ZOOM = 17         # Vehículos muy juntos no se acercan más que esto
+MAP_SINGLE_POINT_ZOOM = 15    # Un solo vehículo (o todos en el mismo punto)
+
+# Historial de posiciones (app/state/history.py): muestras por vehículo,
+# memoria máxima de todos los historiales y tiempo sin reportes nuevos tras
+# el cual se descarta el historial de un vehículo
+HISTORY_CAPACITY = 64
+HISTORY_MAX_BYTES = 32 * 1024 * 1024
+HISTORY_IDLE_SECONDS = 6 * 60 * 60
+
+# Lista virtualizada de vehículos (app/components/virtual_list.py): alto fijo
+# de cada fila (tarjeta + separación), filas extra que se materializan arriba
+# y abajo de lo visible, y cada cuántos ms llega el evento de scroll
+VEHICLE_LIST_ITEM_EXTENT = 256
+VEHICLE_LIST_SPACING = 16
+VIRTUAL_LIST_OVERSCAN = 4
+VIRTUAL_LIST_SCROLL_INTERVAL_MS = 50
+
+# Miniaturas de fotos de vehículos (app/services/thumbnails.py). Se guardan
+# dentro de assets/ para que Flet las sirva en /thumbs/; sin Pillow (o en
+# Pyodide, donde assets/ no se puede escribir) se usa la URL original
+ASSETS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "assets")
+THUMBNAIL_DIR = os.path.join(ASSETS_DIR, "thumbs")
+THUMBNAIL_SIZE = (200, 150)          # Tamaño de la foto en la tarjeta (1x)
+THUMBNAIL_SCALES = (1, 2)            # Variantes que se generan
+THUMBNAIL_CARD_SCALE = 1             # Variante que usa la tarjeta
+THUMBNAIL_JPEG_QUALITY = 80
+THUMBNAIL_CACHE_MAX_BYTES = 64 * 1024 * 1024
+THUMBNAIL_CONCURRENCY = 4            # Descargas de fotos simultáneas
+THUMBNAIL_TOUCH_INTERVAL_SECONDS = 3600  # Cada cuánto se actualiza en disco la fecha de uso
+THUMBNAIL_RETRY_SECONDS = 300        # Tras un error de red, usar la URL original este tiempo
 
 # Fallback a HTTP si HTTPS no está disponible (solo para desarrollo local)
 # En producción, el servidor debe soportar HTTPS
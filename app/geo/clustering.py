@@ -0,0 +1,206 @@
+# app/geo/clustering.py
+
+import asyncio
+import threading
+
+from app.config import CLUSTER_CHUNK_SIZE, CLUSTER_MAX_ZOOM, CLUSTER_MIN_ZOOM, CLUSTER_RADIUS_PX
+from app.geo.geometry import mercator_lat, mercator_lon, mercator_x, mercator_y, world_pixels
+from app.state.diff import vehicle_keys
+from app.state.snapshot import FleetSnapshot
+
+
+class Cluster:
+    """
+    Grupo de vehículos en un zoom. x/y en Web Mercator normalizado (0..1),
+    centro ponderado por cantidad. `key` es la clave del vehículo si count == 1.
+    """
+
+    __slots__ = ("x", "y", "count", "key")
+
+    def __init__(self, x: float, y: float, count: int, key=None):
+        self.x = x
+        self.y = y
+        self.count = count
+        self.key = key
+
+    @property
+    def lat(self) -> float:
+        return mercator_lat(self.y)
+
+    @property
+    def lon(self) -> float:
+        return mercator_lon(self.x)
+
+    def __repr__(self):
+        return f"Cluster(count={self.count}, lat={self.lat:.5f}, lon={self.lon:.5f})"
+
+
+class ClusterLevels:
+    """
+    Grupos de la flota para todos los zooms de CLUSTER_MIN_ZOOM a
+    CLUSTER_MAX_ZOOM, calculados una sola vez por foto. Cada nivel se arma
+    con los grupos del nivel siguiente (más cercano) juntando los que caen en
+    la misma celda de CLUSTER_RADIUS_PX píxeles, así que el costo total es
+    O(n) por nivel sobre cada vez menos elementos. Cambiar de zoom solo lee
+    un nivel ya calculado.
+
+    Las celdas de un zoom son exactamente 2x2 celdas del siguiente, así que
+    un nivel da los mismos grupos si se arma desde los vehículos o desde
+    cualquier nivel más cercano. Con eager=False los niveles se calculan al
+    pedirlos (el primer mapa solo espera por su zoom) y fill_async() completa
+    el resto sin bloquear el event loop.
+
+    Cada nivel se guarda en columnas (xs, ys, counts, keys); los Cluster se
+    crean solo para lo que se consulta.
+    """
+
+    def __init__(
+        self,
+        snapshot: FleetSnapshot,
+        radius_px: int = CLUSTER_RADIUS_PX,
+        min_zoom: int = CLUSTER_MIN_ZOOM,
+        max_zoom: int = CLUSTER_MAX_ZOOM,
+        eager: bool = True,
+    ):
+        self.radius_px = radius_px
+        self.min_zoom = min_zoom
+        self.max_zoom = max_zoom
+        self.levels = {}
+
+        xs, ys, keys = [], [], []
+        for key, vehicle in zip(vehicle_keys(snapshot), snapshot.vehicles):
+            if vehicle.has_position:
+                xs.append(mercator_x(vehicle.lon))
+                ys.append(mercator_y(vehicle.lat))
+                keys.append(key)
+        self._points = (xs, ys, [1] * len(xs), keys)
+        if eager:
+            for zoom in range(max_zoom, min_zoom - 1, -1):
+                self.level(zoom)
+
+    def clamp(self, zoom: int) -> int:
+        return max(self.min_zoom, min(self.max_zoom, zoom))
+
+    def level(self, zoom: int) -> tuple:
+        """Columnas del zoom (acotado al rango); se calcula si aún no existe."""
+        zoom = self.clamp(zoom)
+        level = self.levels.get(zoom)
+        if level is None:
+            level = self.levels[zoom] = _merge(self._source(zoom), world_pixels(zoom) / self.radius_px)
+        return level
+
+    async def fill_async(self, chunk_size: int = CLUSTER_CHUNK_SIZE):
+        """
+        Calcula los niveles que faltan, cediendo el event loop cada
+        `chunk_size` grupos procesados.
+        """
+        for zoom in range(self.max_zoom, self.min_zoom - 1, -1):
+            if zoom in self.levels:
+                continue
+            steps = _merge_steps(self._source(zoom), world_pixels(zoom) / self.radius_px, chunk_size)
+            while True:
+                await asyncio.sleep(0)
+                try:
+                    next(steps)
+                except StopIteration as done:
+                    # level() pudo calcularlo mientras tanto (cambio de zoom)
+                    self.levels.setdefault(zoom, done.value)
+                    break
+
+    def _source(self, zoom: int) -> tuple:
+        # El nivel más cercano ya calculado, o los vehículos
+        for z in range(zoom + 1, self.max_zoom + 1):
+            if z in self.levels:
+                return self.levels[z]
+        return self._points
+
+    def count(self, zoom: int) -> int:
+        """Cantidad de marcadores/grupos en ese zoom."""
+        return len(self.level(zoom)[2])
+
+    def at(self, zoom: int) -> list:
+        """Grupos del zoom (acotado al rango precalculado)."""
+        return [Cluster(*row) for row in zip(*self.level(zoom))]
+
+    def visible(self, zoom: int, center_lat: float, center_lon: float, width: int, height: int) -> list:
+        """Grupos dentro de una imagen de width x height px centrada en (lat, lon)."""
+        zoom = self.clamp(zoom)
+        scale = world_pixels(zoom)
+        cx, cy = mercator_x(center_lon), mercator_y(center_lat)
+        half_w, half_h = width / 2 / scale, height / 2 / scale
+        return [
+            Cluster(x, y, count, key)
+            for x, y, count, key in zip(*self.level(zoom))
+            if abs(x - cx) <= half_w and abs(y - cy) <= half_h
+        ]
+
+
+def _merge(level: tuple, cells_per_unit: float) -> tuple:
+    """Nivel con los grupos de `level` juntados en celdas de 1/cells_per_unit."""
+    steps = _merge_steps(level, cells_per_unit, len(level[2]) or 1)
+    while True:
+        try:
+            next(steps)
+        except StopIteration as done:
+            return done.value
+
+
+def _merge_steps(level: tuple, cells_per_unit: float, chunk_size: int):
+    """
+    Junta los grupos que caen en la misma celda (centro ponderado por
+    cantidad). x/y están en 0..1, así que int() equivale a floor().
+    Generador: se detiene cada `chunk_size` grupos y devuelve el nivel
+    (StopIteration.value) al terminar.
+    """
+    xs, ys, counts, keys = level
+    row_size = int(cells_per_unit) + 1
+    index = {}
+    sum_x, sum_y, merged_counts, merged_keys = [], [], [], []
+    for start in range(0, len(counts), chunk_size):
+        if start:
+            yield
+        stop = start + chunk_size
+        for x, y, count, key in zip(xs[start:stop], ys[start:stop], counts[start:stop], keys[start:stop]):
+            cell = int(x * cells_per_unit) * row_size + int(y * cells_per_unit)
+            i = index.get(cell)
+            if i is None:
+                index[cell] = len(merged_counts)
+                sum_x.append(x * count)
+                sum_y.append(y * count)
+                merged_counts.append(count)
+                merged_keys.append(key)
+            else:
+                sum_x[i] += x * count
+                sum_y[i] += y * count
+                merged_counts[i] += count
+                merged_keys[i] = None
+    if len(merged_counts) == len(counts):
+        return level  # Nada se juntó: el nivel es idéntico al anterior
+    return (
+        [sx / n for sx, n in zip(sum_x, merged_counts)],
+        [sy / n for sy, n in zip(sum_y, merged_counts)],
+        merged_counts,
+        merged_keys,
+    )
+
+
+# Niveles ya calculados, por identidad de la foto (una vez por foto)
+_MEMO_SIZE = 4
+_memo = []  # [(snapshot, levels)]
+_lock = threading.Lock()
+
+
+def clusters_for(snapshot: FleetSnapshot, eager: bool = True) -> ClusterLevels:
+    """
+    ClusterLevels de una foto de la flota, calculados una sola vez. Con
+    eager=False los niveles se calculan al pedirlos (ver fill_async).
+    """
+    with _lock:
+        for source, levels in _memo:
+            if source is snapshot:
+                return levels
+    levels = ClusterLevels(snapshot, eager=eager)
+    with _lock:
+        _memo[:] = _memo[-(_MEMO_SIZE - 1):]
+        _memo.append((snapshot, levels))
+    return levels
@@ -0,0 +1,62 @@
+# app/geo/geometry.py
+
+import math
+
+EARTH_RADIUS_METERS = 6371008.8
+METERS_PER_DEGREE = 2 * math.pi * EARTH_RADIUS_METERS / 360  # Un grado de latitud
+
+
+def haversine_meters(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Distancia sobre la esfera terrestre, en metros."""
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_METERS * math.asin(math.sqrt(min(a, 1.0)))
+
+
+def haversine_many(lat1, lon1, lat2, lon2, np=None) -> list:
+    """Distancias haversine (metros) entre pares de puntos en listas paralelas."""
+    if np is not None:
+        lat1, lon1, lat2, lon2 = (np.radians(np.asarray(c, dtype=np.float64)) for c in (lat1, lon1, lat2, lon2))
+        a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+        return (2 * EARTH_RADIUS_METERS * np.arcsin(np.sqrt(np.minimum(a, 1.0)))).tolist()
+    return [haversine_meters(*pair) for pair in zip(lat1, lon1, lat2, lon2)]
+
+
+def meters_to_degrees(meters: float, lat: float) -> tuple:
+    """
+    (grados de latitud, grados de longitud) que abarcan `meters` alrededor de
+    esa latitud. La longitud se calcula en el borde más cercano al polo, para
+    que el rectángulo siempre contenga el círculo.
+    """
+    dlat = meters / METERS_PER_DEGREE
+    cos_lat = math.cos(math.radians(min(abs(lat) + dlat, 89.9)))
+    return dlat, meters / (METERS_PER_DEGREE * cos_lat)
+
+
+# --- Web Mercator (la proyección de Google Maps), coordenadas normalizadas 0..1 ---
+
+TILE_SIZE = 256  # Píxeles del mundo completo en zoom 0
+MAX_MERCATOR_LAT = 85.05112878
+
+
+def mercator_x(lon: float) -> float:
+    return lon / 360.0 + 0.5
+
+
+def mercator_y(lat: float) -> float:
+    lat = max(-MAX_MERCATOR_LAT, min(MAX_MERCATOR_LAT, lat))
+    sin_lat = math.sin(math.radians(lat))
+    return 0.5 - math.log((1 + sin_lat) / (1 - sin_lat)) / (4 * math.pi)
+
+
+def mercator_lon(x: float) -> float:
+    return (x - 0.5) * 360.0
+
+
+def mercator_lat(y: float) -> float:
+    return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * y))))
+
+
+def world_pixels(zoom: int) -> int:
+    """Ancho del mundo en píxeles a ese zoom."""
+    return TILE_SIZE << zoom
@@ -0,0 +1,177 @@
+# app/geo/spatial.py
+
+import heapq
+import math
+import threading
+
+from app.config import GEO_GRID_CELL_DEGREES
+from app.geo.geometry import METERS_PER_DEGREE, haversine_meters, meters_to_degrees
+from app.state.diff import diff_snapshots, vehicle_keys
+from app.state.snapshot import FleetSnapshot
+
+
+class GridIndex:
+    """
+    Índice espacial de malla uniforme (celdas de GEO_GRID_CELL_DEGREES).
+    Cada vehículo vive en la celda de su posición; mover uno es O(1) (sale
+    de una celda y entra a otra) y las consultas solo revisan las celdas que
+    tocan el área buscada.
+
+    Consultas: within_bbox (rectángulo), within_radius (círculo en metros)
+    y nearest (k vecinos más cercanos, expandiendo anillos de celdas).
+    """
+
+    def __init__(self, cell_degrees: float = GEO_GRID_CELL_DEGREES):
+        self.cell = cell_degrees
+        self.cells = {}    # (fila, columna) -> {clave: (lat, lon)}
+        self.points = {}   # clave -> (lat, lon, celda)
+        self.snapshot = None
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.points)
+
+    def _cell_of(self, lat: float, lon: float) -> tuple:
+        return math.floor(lat / self.cell), math.floor(lon / self.cell)
+
+    # --- Actualización ---
+
+    def insert(self, key, lat: float, lon: float):
+        """Agrega o mueve un vehículo."""
+        cell = self._cell_of(lat, lon)
+        previous = self.points.get(key)
+        if previous is not None and previous[2] != cell:
+            self._discard(key, previous[2])
+        self.cells.setdefault(cell, {})[key] = (lat, lon)
+        self.points[key] = (lat, lon, cell)
+
+    move = insert
+
+    def remove(self, key):
+        previous = self.points.pop(key, None)
+        if previous is not None:
+            self._discard(key, previous[2])
+
+    def _discard(self, key, cell):
+        bucket = self.cells.get(cell)
+        if bucket is not None:
+            bucket.pop(key, None)
+            if not bucket:
+                del self.cells[cell]
+
+    def refresh(self, snapshot: FleetSnapshot):
+        """
+        Pone el índice al día con una foto de posiciones. Con una foto previa
+        solo se mueven/agregan/quitan los vehículos que cambiaron. El diff usa
+        umbral 0: cualquier cambio de coordenadas se aplica, para no acumular
+        desplazamientos pequeños.
+        """
+        with self._lock:
+            if snapshot is self.snapshot:
+                return
+            if self.snapshot is None:
+                self.cells.clear()
+                self.points.clear()
+                for key, vehicle in zip(vehicle_keys(snapshot), snapshot.vehicles):
+                    if vehicle.has_position:
+                        self.insert(key, vehicle.lat, vehicle.lon)
+            else:
+                diff = diff_snapshots(self.snapshot, snapshot, threshold=0)
+                for key in diff.removed:
+                    self.remove(key)
+                for key in diff.added | diff.moved:
+                    vehicle = diff.by_key[key]
+                    if vehicle.has_position:
+                        self.insert(key, vehicle.lat, vehicle.lon)
+                    else:
+                        self.remove(key)
+            self.snapshot = snapshot
+
+    # --- Consultas ---
+
+    def within_bbox(self, min_lat: float, min_lon: float, max_lat: float, max_lon: float) -> list:
+        """Claves dentro del rectángulo (bordes incluidos)."""
+        row0, col0 = self._cell_of(min_lat, min_lon)
+        row1, col1 = self._cell_of(max_lat, max_lon)
+        if (row1 - row0 + 1) * (col1 - col0 + 1) > len(self.cells):
+            # Rectángulo más grande que la malla ocupada: recorrer las celdas existentes
+            cells = self.cells.values()
+        else:
+            cells = [
+                self.cells[(row, col)]
+                for row in range(row0, row1 + 1)
+                for col in range(col0, col1 + 1)
+                if (row, col) in self.cells
+            ]
+        return [
+            key
+            for bucket in cells
+            for key, (lat, lon) in bucket.items()
+            if min_lat <= lat <= max_lat and min_lon <= lon <= max_lon
+        ]
+
+    def within_radius(self, lat: float, lon: float, meters: float) -> list:
+        """[(metros, clave)] a no más de `meters` del punto, del más cercano al más lejano."""
+        dlat, dlon = meters_to_degrees(meters, lat)
+        found = []
+        for key in self.within_bbox(lat - dlat, lon - dlon, lat + dlat, lon + dlon):
+            plat, plon, _ = self.points[key]
+            distance = haversine_meters(lat, lon, plat, plon)
+            if distance <= meters:
+                found.append((distance, key))
+        found.sort(key=lambda item: item[0])
+        return found
+
+    def nearest(self, lat: float, lon: float, k: int = 1) -> list:
+        """[(metros, clave)] de los k vehículos más cercanos al punto."""
+        if k <= 0 or not self.points:
+            return []
+        center_row, center_col = self._cell_of(lat, lon)
+        rows = [cell[0] for cell in self.cells]
+        cols = [cell[1] for cell in self.cells]
+        # Anillos necesarios para cubrir toda la malla ocupada
+        max_ring = max(
+            abs(center_row - min(rows)), abs(center_row - max(rows)),
+            abs(center_col - min(cols)), abs(center_col - max(cols)),
+        )
+        best = []  # Montículo de máximos (-distancia, orden, clave) con los k mejores
+        order = 0  # Desempate: las claves pueden ser de tipos no comparables
+        for ring in range(max_ring + 1):
+            for cell in _ring_cells(center_row, center_col, ring):
+                bucket = self.cells.get(cell)
+                if not bucket:
+                    continue
+                for key, (plat, plon) in bucket.items():
+                    distance = haversine_meters(lat, lon, plat, plon)
+                    order += 1
+                    if len(best) < k:
+                        heapq.heappush(best, (-distance, order, key))
+                    elif distance < -best[0][0]:
+                        heapq.heapreplace(best, (-distance, order, key))
+            # Todo punto fuera de los anillos revisados está al menos a esta distancia
+            if len(best) == k and -best[0][0] <= self._covered_meters(lat, ring):
+                break
+        return sorted(((-d, key) for d, _, key in best), key=lambda item: item[0])
+
+    def _covered_meters(self, lat: float, ring: int) -> float:
+        """Distancia mínima garantizada desde el punto hasta fuera del anillo `ring`."""
+        degrees = ring * self.cell  # Margen desde el borde de la celda central
+        far_lat = min(abs(lat) + degrees + self.cell, 89.9)
+        return degrees * METERS_PER_DEGREE * math.cos(math.radians(far_lat))
+
+
+def _ring_cells(row: int, col: int, ring: int):
+    """Celdas en el borde del cuadrado de radio `ring` alrededor de (row, col)."""
+    if ring == 0:
+        yield row, col
+        return
+    for c in range(col - ring, col + ring + 1):
+        yield row - ring, c
+        yield row + ring, c
+    for r in range(row - ring + 1, row + ring):
+        yield r, col - ring
+        yield r, col + ring
+
+
+# Índice de las últimas posiciones de la flota, compartido por las vistas
+position_index = GridIndex()
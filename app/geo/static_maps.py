@@ -0,0 +1,162 @@
+# app/geo/static_maps.py
+
+import math
+from urllib.parse import quote
+
+from app.config import STATIC_MAPS_ENCODED_MARKERS, STATIC_MAPS_MAX_SIZE_PX, STATIC_MAPS_MAX_URL_LENGTH
+from app.geo.geometry import world_pixels
+
+STATIC_MAPS_BASE_URL = "https://maps.googleapis.com/maps/api/staticmap"
+
+
+def encode_polyline(points: list, precision: int = 5) -> str:
+    """Algoritmo de polilínea codificada de Google para [(lat, lon), ...]."""
+    factor = 10 ** precision
+    result = []
+    prev_lat = prev_lon = 0
+    for lat, lon in points:
+        lat_i, lon_i = round(lat * factor), round(lon * factor)
+        for delta in (lat_i - prev_lat, lon_i - prev_lon):
+            value = ~(delta << 1) if delta < 0 else delta << 1
+            while value >= 0x20:
+                result.append(chr((0x20 | (value & 0x1F)) + 63))
+                value >>= 5
+            result.append(chr(value + 63))
+        prev_lat, prev_lon = lat_i, lon_i
+    return "".join(result)
+
+
+def decimals_for_zoom(zoom: int) -> int:
+    """Decimales necesarios para ubicar un punto con error menor a 1 píxel."""
+    pixels_per_degree = world_pixels(zoom) / 360
+    return max(1, min(6, math.ceil(math.log10(pixels_per_degree))))
+
+
+def static_map_size(width: int, height: int, max_side: int = STATIC_MAPS_MAX_SIZE_PX) -> tuple:
+    """
+    (ancho, alto, scale) a pedir para mostrar el mapa en width x height.
+    La API no sirve más de max_side por lado: si la vista es mayor se reduce
+    manteniendo la proporción y se pide scale=2 (el doble de píxeles para la
+    misma zona). El encuadre (fit_bounds, grupos) debe usar este tamaño.
+    """
+    factor = min(1.0, max_side / width, max_side / height)
+    if factor == 1.0:
+        return width, height, 1
+    return max(1, int(width * factor)), max(1, int(height * factor)), 2
+
+
+class StaticMapResult:
+    """URL final y cómo se usó el presupuesto de largo."""
+
+    __slots__ = ("url", "length", "budget", "markers", "omitted")
+
+    def __init__(self, url: str, budget: int, markers: int, omitted: int):
+        self.url = url
+        self.length = len(url)
+        self.budget = budget
+        self.markers = markers   # Ubicaciones incluidas
+        self.omitted = omitted   # Ubicaciones que no cupieron
+
+    def as_dict(self) -> dict:
+        return {
+            "length": self.length,
+            "budget": self.budget,
+            "markers": self.markers,
+            "omitted": self.omitted,
+        }
+
+
+class StaticMapBuilder:
+    """
+    Arma la URL de la API estática de Google Maps dentro de un presupuesto
+    de largo (STATIC_MAPS_MAX_URL_LENGTH):
+      - un solo parámetro markers= por estilo, con todas sus ubicaciones;
+      - coordenadas redondeadas a los decimales que pide el zoom;
+      - si STATIC_MAPS_ENCODED_MARKERS, ubicaciones como polilínea codificada
+        ("enc:...") cuando eso resulta más corto que la lista de lat,lon.
+    Los grupos se agregan por prioridad; lo que no cabe se omite y se reporta.
+    """
+
+    def __init__(
+        self,
+        center: tuple,
+        zoom: int,
+        size: tuple,
+        key: str,
+        budget: int = STATIC_MAPS_MAX_URL_LENGTH,
+        encoded: bool = STATIC_MAPS_ENCODED_MARKERS,
+        scale: int = 1,
+    ):
+        self.center = center
+        self.zoom = zoom
+        self.size = size
+        self.scale = scale
+        self.key = key
+        self.budget = budget
+        self.encoded = encoded
+        self.decimals = decimals_for_zoom(zoom)
+        self._groups = []  # [(estilo, [(lat, lon)])] en orden de prioridad
+
+    def add_markers(self, style: str, points: list):
+        """Agrega ubicaciones con un estilo (p. ej. "size:small|color:red")."""
+        for group_style, group_points in self._groups:
+            if group_style == style:
+                group_points.extend(points)
+                return
+        self._groups.append((style, list(points)))
+
+    def _locations(self, points: list) -> str:
+        d = self.decimals
+        plain = "|".join(f"{lat:.{d}f},{lon:.{d}f}" for lat, lon in points)
+        if not self.encoded or len(points) < 2:
+            return plain
+        # Ordenar por latitud acorta los saltos entre puntos consecutivos
+        encoded = "enc:" + quote(encode_polyline(sorted(points)), safe="")
+        return encoded if len(encoded) < len(plain) else plain
+
+    def _param(self, style: str, points: list) -> str:
+        return f"markers={style}|{self._locations(points)}"
+
+    def build(self) -> StaticMapResult:
+        lat, lon = self.center
+        d = self.decimals
+        base = (
+            f"{STATIC_MAPS_BASE_URL}?center={lat:.{d}f},{lon:.{d}f}"
+            f"&zoom={self.zoom}&size={self.size[0]}x{self.size[1]}"
+        )
+        if self.scale != 1:
+            base += f"&scale={self.scale}"
+        tail = f"&key={self.key}"
+        remaining = self.budget - len(base) - len(tail)
+        params = []
+        included = omitted = 0
+
+        for style, points in self._groups:
+            if omitted:
+                omitted += len(points)  # Ya no cupo un grupo de mayor prioridad
+                continue
+            fit = self._fit(style, points, remaining - 1)  # 1 = "&"
+            if fit:
+                param = self._param(style, points[:fit])
+                params.append(param)
+                remaining -= len(param) + 1
+                included += fit
+            omitted += len(points) - fit
+
+        url = base + "".join("&" + p for p in params) + tail
+        return StaticMapResult(url, self.budget, included, omitted)
+
+    def _fit(self, style: str, points: list, room: int) -> int:
+        """Cuántos puntos del grupo caben en `room` caracteres (búsqueda binaria)."""
+        if room <= 0:
+            return 0
+        if len(self._param(style, points)) <= room:
+            return len(points)
+        low, high = 0, len(points)
+        while low < high:
+            mid = (low + high + 1) // 2
+            if len(self._param(style, points[:mid])) <= room:
+                low = mid
+            else:
+                high = mid - 1
+        return low
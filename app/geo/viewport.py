@@ -0,0 +1,45 @@
+# app/geo/viewport.py
+
+import math
+
+from app.config import MAP_FIT_PADDING_PX, MAP_MAX_FIT_ZOOM, MAP_MIN_ZOOM, MAP_SINGLE_POINT_ZOOM
+from app.geo.geometry import TILE_SIZE, mercator_lat, mercator_lon, mercator_x, mercator_y
+
+
+def fit_bounds(
+    bbox: tuple,
+    width: int,
+    height: int,
+    padding: int = MAP_FIT_PADDING_PX,
+    min_zoom: int = MAP_MIN_ZOOM,
+    max_zoom: int = MAP_MAX_FIT_ZOOM,
+    single_point_zoom: int = MAP_SINGLE_POINT_ZOOM,
+) -> tuple:
+    """
+    Centro y zoom entero más cercano que muestran todo el rectángulo
+    (min_lat, min_lon, max_lat, max_lon) en una imagen de width x height
+    píxeles, dejando `padding` píxeles libres en cada borde.
+
+    Se calcula en Web Mercator (la proyección de Google Maps), así que toma
+    en cuenta que un grado de latitud ocupa más píxeles lejos del ecuador.
+    Devuelve (center_lat, center_lon, zoom).
+    """
+    min_lat, min_lon, max_lat, max_lon = bbox
+    x0, x1 = mercator_x(min_lon), mercator_x(max_lon)
+    y0, y1 = mercator_y(max_lat), mercator_y(min_lat)  # y crece hacia el sur
+    center_lat = mercator_lat((y0 + y1) / 2)
+    center_lon = mercator_lon((x0 + x1) / 2)
+
+    span_x, span_y = x1 - x0, y1 - y0
+    if span_x <= 0 and span_y <= 0:
+        return center_lat, center_lon, single_point_zoom
+
+    usable_w = max(width - 2 * padding, 1)
+    usable_h = max(height - 2 * padding, 1)
+    # Ancho del mundo (px) que hace caber el rectángulo: TILE_SIZE * 2^zoom
+    world = min(
+        usable_w / span_x if span_x > 0 else math.inf,
+        usable_h / span_y if span_y > 0 else math.inf,
+    )
+    zoom = math.floor(math.log2(world / TILE_SIZE))
+    return center_lat, center_lon, max(min_zoom, min(max_zoom, zoom))
@@ -1,7 +1,817 @@
+# app/services/api.py
+
+import asyncio
+import contextlib
+import json
+import threading
+from urllib.parse import urlencode
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+from app.services.metrics import payload_metrics
+from app.services.singleflight import SingleFlight
+from app.services.streaming import JsonArrayStream
+from app.services import tokens
+
+# Transporte async: httpx fuera de Pyodide (dependencia de flet), fetch del
+# navegador en Pyodide. Si no hay ninguno se usa el cliente síncrono en un hilo.
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+try:
+    from pyodide.http import pyfetch
+except ImportError:
+    pyfetch = None
+
+from app.config import (
+    API_BASE_URL,
+    API_TIMEOUT_SECONDS,
+    API_POOL_CONNECTIONS,
+    API_POOL_MAXSIZE,
+    STREAM_BATCH_SIZE,
+    STREAM_CHUNK_SIZE,
+    USE_HTTPS,
+    DISABLE_SSL_VERIFY,
+)
+
+TIMEOUT_ERROR = "Tiempo de espera agotado. El servidor tardó demasiado en responder."
+
+# Desactivar advertencias SSL para Pyodide (web)
+# Se hace una sola vez al importar el módulo, no en cada petición
+if DISABLE_SSL_VERIFY:
+    try:
+        import urllib3
+        urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+    except ImportError:
+        pass  # urllib3 no disponible (no es Pyodide)
+
+
+def _accept_encoding() -> str:
+    """Codificaciones que el cliente puede descomprimir (br solo con brotli instalado)."""
+    encodings = ["gzip", "deflate"]
+    for module in ("brotli", "brotlicffi"):
+        try:
+            __import__(module)
+        except ImportError:
+            continue
+        encodings.append("br")
+        break
+    return ", ".join(encodings)
+
+
+# Las posiciones son JSON muy repetitivo: pedir siempre compresión.
+# En Pyodide no aplica: el navegador negocia Accept-Encoding por su cuenta.
+ACCEPT_ENCODING = _accept_encoding()
+
+
+def record_payload(url: str, resp, body_bytes: int = None):
+    """Registra en payload_metrics los bytes en la red y descomprimidos de una respuesta."""
+    if body_bytes is None:
+        body_bytes = len(resp.content or b"")
+    payload_metrics.record(
+        url,
+        resp.status_code,
+        _wire_bytes(resp, body_bytes),
+        body_bytes,
+        resp.headers.get("Content-Encoding"),
+    )
+
+
+def _wire_bytes(resp, body_bytes: int) -> int:
+    raw = getattr(resp, "raw", None)
+    if raw is not None and hasattr(raw, "tell"):
+        return raw.tell()  # requests/urllib3: bytes leídos del socket
+    downloaded = getattr(resp, "num_bytes_downloaded", None)
+    if downloaded is not None:
+        return downloaded  # httpx
+    length = resp.headers.get("Content-Length")
+    if length and length.isdigit():
+        return int(length)
+    return body_bytes  # fetch sin Content-Length expuesto: sin dato comprimido
+
+
+def apply_protocol(url: str) -> str:
+    """Aplica USE_HTTPS: si HTTPS no está disponible, usar HTTP (solo desarrollo)."""
+    if not USE_HTTPS and url.startswith("https://"):
+        return "http://" + url[len("https://"):]
+    return url
+
+
+def auth_headers(token: str = None) -> dict:
+    """Headers comunes para la API, con Bearer Token si se proporciona."""
+    headers = {"Content-Type": "application/json"}
+    if token:
+        headers["Authorization"] = f"Bearer {token}"
+    return headers
+
+
+def sent_token(resp, token: str = None):
+    """Token con el que se obtuvo la respuesta: el renovado si hubo reintento por 401."""
+    return getattr(resp, "sent_token", token)
+
+
+def _renewed(token: str):
+    """Tras un 401: token renovado por la sesión dueña de `token` (o None)."""
+    manager = tokens.manager_for(token)
+    return manager.refresh_after(token) if manager else None
+
+
+async def _renewed_async(token: str):
+    """Versión async de _renewed()."""
+    manager = tokens.manager_for(token)
+    return await manager.refresh_after_async(token) if manager else None
+
+
+def _retry_headers(headers: dict, new_token: str):
+    # Los validadores (ETag) eran del token rechazado: el reintento va sin ellos
+    headers["Authorization"] = f"Bearer {new_token}"
+    headers.pop("If-None-Match", None)
+    headers.pop("If-Modified-Since", None)
+
+
+def request_error(ex: Exception) -> dict:
+    """Resultado de error para una excepción de transporte (requests.RequestException)."""
+    if isinstance(ex, requests.Timeout):
+        return {"ok": False, "error": TIMEOUT_ERROR}
+    return {"ok": False, "error": f"Sin conexión ({ex})"}
+
+
+def json_result(resp, empty=None) -> dict:
+    """
+    Interpreta una respuesta JSON de la API.
+    Devuelve:
+      { "ok": True, "data": <json> } en éxito (200/201)
+      { "ok": False, "error": "mensaje" } en error
+    """
+    # Éxito típico .NET: 200/201
+    if resp.status_code in (200, 201):
+        try:
+            data = resp.json() if resp.content else empty
+            return {"ok": True, "data": data}
+        except Exception as ex:
+            return {"ok": False, "error": f"Error al procesar respuesta: {ex}"}
+
+    # Error con cuerpo JSON
+    return {"ok": False, "error": error_message(resp)}
+
+
+def error_message(resp) -> str:
+    """Extrae el mensaje de error de una respuesta (.NET usa varias claves)."""
+    try:
+        err = resp.json()
+        return (
+            err.get("message")
+            or err.get("Message")
+            or err.get("error")
+            or err.get("Error")
+            or str(err)
+        )
+    except Exception:
+        return f"HTTP {resp.status_code}"
+
+
 class ApiClient:
-    def __init__(self, base_url: str = ""):
-        self.base_url = base_url
+    """
+    Cliente HTTP compartido por todos los servicios de app.services.
+    Mantiene una sola sesión keep-alive con pool de conexiones, de modo que
+    las peticiones consecutivas a springtelecom.mx reutilizan la conexión
+    TCP+TLS en lugar de abrir una nueva cada vez.
+    """
+
+    def __init__(
+        self,
+        base_url: str = API_BASE_URL,
+        timeout: float = API_TIMEOUT_SECONDS,
+        verify: bool = not DISABLE_SSL_VERIFY,
+        pool_connections: int = API_POOL_CONNECTIONS,
+        pool_maxsize: int = API_POOL_MAXSIZE,
+    ):
+        self.base_url = apply_protocol(base_url).rstrip("/")
+        self.timeout = timeout
+        self.verify = verify  # Desactivar verificación SSL en Pyodide
+
+        self.session = requests.Session()
+        self.session.headers["Accept-Encoding"] = ACCEPT_ENCODING
+        adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def url(self, path: str) -> str:
+        """Resuelve una ruta relativa contra base_url; las URLs absolutas se respetan."""
+        if path.startswith(("http://", "https://")):
+            return apply_protocol(path)
+        return f"{self.base_url}/{path.lstrip('/')}"
+
+    def request(self, method: str, path: str, token: str = None, **kwargs) -> requests.Response:
+        """
+        Ejecuta una petición usando la sesión compartida.
+        Propaga requests.Timeout / requests.RequestException al llamador.
+        """
+        headers = auth_headers(token)
+        headers.update(kwargs.pop("headers", None) or {})
+        kwargs.setdefault("timeout", self.timeout)
+        # Se pasa por petición: Session.verify lo pisan REQUESTS_CA_BUNDLE/CURL_CA_BUNDLE
+        kwargs.setdefault("verify", self.verify)
+        url = self.url(path)
+        resp = self._send(method, url, headers, kwargs)
+
+        if resp.status_code == 401 and token:
+            # Token rechazado: renovar (o tomar el ya renovado) y reintentar una vez
+            new_token = _renewed(token)
+            if new_token:
+                resp.close()
+                _retry_headers(headers, new_token)
+                resp = self._send(method, url, headers, kwargs)
+                resp.sent_token = new_token
+        return resp
+
+    def _send(self, method: str, url: str, headers: dict, kwargs: dict) -> requests.Response:
+        resp = self.session.request(method, url, headers=headers, **kwargs)
+        if not kwargs.get("stream"):
+            # En streaming el cuerpo aún no se leyó: lo registra quien lo consume
+            record_payload(url, resp)
+        return resp
+
+    def get(self, path: str, token: str = None, **kwargs) -> requests.Response:
+        return self.request("GET", path, token=token, **kwargs)
+
+    def post(self, path: str, token: str = None, **kwargs) -> requests.Response:
+        return self.request("POST", path, token=token, **kwargs)
 
     def ping(self) -> bool:
-        # Implementación futura
-        return True
+        """Comprueba que el servidor responde (cualquier código HTTP cuenta)."""
+        try:
+            self.session.head(self.base_url, timeout=self.timeout, verify=self.verify)
+            return True
+        except requests.RequestException:
+            return False
+
+    def close(self):
+        self.session.close()
+
+
+class FetchResponse:
+    """Respuesta mínima compatible con requests.Response para el transporte fetch."""
+
+    def __init__(self, status_code: int, content: bytes, headers: dict, url: str = ""):
+        self.status_code = status_code
+        self.content = content
+        self.headers = CaseInsensitiveDict(headers)
+        self.url = url
+
+    @property
+    def text(self) -> str:
+        return self.content.decode("utf-8", errors="replace")
+
+    def json(self):
+        return json.loads(self.content)
+
+    # Interfaz de respuesta en streaming (como httpx.Response), ya en memoria
+    async def aread(self) -> bytes:
+        return self.content
+
+    async def aiter_bytes(self):
+        if self.content:
+            yield self.content
+
+
+class AsyncApiClient:
+    """
+    Versión async de ApiClient que corre directamente en el event loop de Flet,
+    sin ocupar hilos del executor. Las peticiones se pueden combinar con
+    asyncio.gather y se cancelan al cancelar la tarea que las espera.
+
+    Para que los servicios manejen un solo tipo de error, los fallos de
+    transporte se traducen a requests.Timeout / requests.RequestException.
+    """
+
+    def __init__(
+        self,
+        base_url: str = API_BASE_URL,
+        timeout: float = API_TIMEOUT_SECONDS,
+        verify: bool = not DISABLE_SSL_VERIFY,
+        pool_maxsize: int = API_POOL_MAXSIZE,
+    ):
+        self.base_url = apply_protocol(base_url).rstrip("/")
+        self.timeout = timeout
+        self.verify = verify
+        self.pool_maxsize = pool_maxsize
+        self._session = None
+        self._session_loop = None
+
+    def url(self, path: str) -> str:
+        """Resuelve una ruta relativa contra base_url; las URLs absolutas se respetan."""
+        if path.startswith(("http://", "https://")):
+            return apply_protocol(path)
+        return f"{self.base_url}/{path.lstrip('/')}"
+
+    def _httpx_session(self):
+        # httpx.AsyncClient queda ligado al loop que lo creó
+        loop = asyncio.get_running_loop()
+        if self._session is None or self._session_loop is not loop:
+            self._session = httpx.AsyncClient(
+                verify=self.verify,
+                headers={"Accept-Encoding": ACCEPT_ENCODING},
+                timeout=self.timeout,
+                follow_redirects=True,
+                limits=httpx.Limits(
+                    max_connections=self.pool_maxsize,
+                    max_keepalive_connections=self.pool_maxsize,
+                ),
+            )
+            self._session_loop = loop
+        return self._session
+
+    async def request(self, method: str, path: str, token: str = None, **kwargs):
+        """
+        Ejecuta una petición async. Acepta los mismos kwargs que ApiClient
+        (headers, json, data, params, timeout).
+        """
+        url = self.url(path)
+        headers = auth_headers(token)
+        headers.update(kwargs.pop("headers", None) or {})
+        timeout = kwargs.pop("timeout", self.timeout)
+        resp = await self._send(method, url, headers, timeout, kwargs)
+
+        if resp.status_code == 401 and token:
+            # Token rechazado: renovar (o tomar el ya renovado) y reintentar una vez
+            new_token = await _renewed_async(token)
+            if new_token:
+                _retry_headers(headers, new_token)
+                resp = await self._send(method, url, headers, timeout, kwargs)
+                resp.sent_token = new_token
+        return resp
+
+    async def _send(self, method: str, url: str, headers: dict, timeout: float, kwargs: dict):
+        if httpx is not None:
+            try:
+                resp = await self._httpx_session().request(
+                    method, url, headers=headers, timeout=timeout, **kwargs
+                )
+                record_payload(url, resp)
+                return resp
+            except httpx.TimeoutException as ex:
+                raise requests.Timeout(str(ex)) from ex
+            except httpx.HTTPError as ex:
+                raise requests.ConnectionError(str(ex)) from ex
+
+        if pyfetch is not None:
+            return await self._fetch(method, url, headers, timeout, **kwargs)
+
+        # Sin transporte async disponible: usar el cliente síncrono en un hilo
+        # (sin token: el reintento por 401 lo hace request())
+        return await asyncio.to_thread(
+            get_client().request, method, url, headers=headers, timeout=timeout, **kwargs
+        )
+
+    async def _fetch(self, method, url, headers, timeout, **kwargs):
+        params = kwargs.get("params")
+        if params:
+            url += ("&" if "?" in url else "?") + urlencode(params)
+        body = kwargs.get("data")
+        if kwargs.get("json") is not None:
+            body = json.dumps(kwargs["json"])
+        try:
+            resp = await asyncio.wait_for(
+                pyfetch(url, method=method, headers=headers, body=body), timeout
+            )
+            content = await resp.bytes()
+        except asyncio.TimeoutError as ex:
+            raise requests.Timeout(TIMEOUT_ERROR) from ex
+        except Exception as ex:  # CancelledError no hereda de Exception
+            raise requests.ConnectionError(str(ex)) from ex
+        fetch_resp = FetchResponse(resp.status, content, dict(resp.headers), url=url)
+        record_payload(url, fetch_resp)
+        return fetch_resp
+
+    @contextlib.asynccontextmanager
+    async def stream(self, method: str, path: str, token: str = None, **kwargs):
+        """
+        Petición cuyo cuerpo se lee por trozos con `resp.aiter_bytes()`.
+        Solo httpx permite streaming real; con los demás transportes la
+        respuesta llega completa y se entrega como un único trozo.
+        """
+        if httpx is None:
+            # self.request() ya registra el tamaño en payload_metrics
+            resp = await self.request(method, path, token=token, **kwargs)
+            if not isinstance(resp, FetchResponse):
+                used = sent_token(resp, token)
+                resp = FetchResponse(resp.status_code, resp.content, resp.headers, url=resp.url)
+                resp.sent_token = used
+            yield resp
+            return
+
+        url = self.url(path)
+        headers = auth_headers(token)
+        headers.update(kwargs.pop("headers", None) or {})
+        timeout = kwargs.pop("timeout", self.timeout)
+        session = self._httpx_session()
+        try:
+            async with session.stream(method, url, headers=headers, timeout=timeout, **kwargs) as resp:
+                new_token = None
+                if resp.status_code == 401 and token:
+                    new_token = await _renewed_async(token)
+                if not new_token:
+                    yield resp
+                    return
+
+            # Token renovado tras un 401: reintentar una vez
+            _retry_headers(headers, new_token)
+            async with session.stream(method, url, headers=headers, timeout=timeout, **kwargs) as resp:
+                resp.sent_token = new_token
+                yield resp
+        except httpx.TimeoutException as ex:
+            raise requests.Timeout(str(ex)) from ex
+        except httpx.HTTPError as ex:
+            raise requests.ConnectionError(str(ex)) from ex
+
+    async def get(self, path: str, token: str = None, **kwargs):
+        return await self.request("GET", path, token=token, **kwargs)
+
+    async def post(self, path: str, token: str = None, **kwargs):
+        return await self.request("POST", path, token=token, **kwargs)
+
+    async def aclose(self):
+        if self._session is not None:
+            await self._session.aclose()
+            self._session = None
+
+
+class ValidatorStore:
+    """
+    Validadores HTTP (ETag / Last-Modified) y datos ya decodificados por
+    (token, url). Permite pedir con If-None-Match / If-Modified-Since y, ante
+    un 304, devolver el objeto guardado sin volver a decodificar el JSON.
+
+    El token es el que se usó en la petición (sent_token). Los de un token
+    reemplazado se borran al renovarse (tokens.on_token_replaced) y
+    una respuesta tardía con ese token ya no se guarda.
+    """
+
+    def __init__(self):
+        self._entries = {}  # (token, url) -> (etag, last_modified, data)
+        self._lock = threading.Lock()
+
+    def request_headers(self, url: str, token: str = None) -> dict:
+        with self._lock:
+            entry = self._entries.get((token, url))
+        if not entry:
+            return {}
+        etag, last_modified, _ = entry
+        headers = {}
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+        return headers
+
+    def result(self, resp, url: str, token: str = None, empty=None) -> dict:
+        """Como json_result(), añadiendo "from_cache" y usando los datos guardados en 304."""
+        if resp.status_code == 304:
+            cached = self.cached(url, token)
+            if cached is not None:
+                return cached
+
+        result = json_result(resp, empty=empty)
+        if not result.get("ok"):
+            return result
+
+        result["from_cache"] = False
+        self.store(url, token, resp.headers, result["data"])
+        return result
+
+    def cached(self, url: str, token: str = None):
+        """Resultado con los datos guardados para (token, url), o None."""
+        with self._lock:
+            entry = self._entries.get((token, url))
+        if not entry:
+            return None
+        return {"ok": True, "data": entry[2], "from_cache": True}
+
+    def store(self, url: str, token: str, headers, data):
+        """Guarda los validadores de la respuesta junto con sus datos decodificados."""
+        if not tokens.is_current(token):
+            return  # Token ya reemplazado: nadie volverá a pedir con él
+        etag = headers.get("ETag")
+        last_modified = headers.get("Last-Modified")
+        with self._lock:
+            if etag or last_modified:
+                self._entries[(token, url)] = (etag, last_modified, data)
+            else:
+                self._entries.pop((token, url), None)
+
+    def clear(self, token: str = None):
+        """Olvida los validadores (todos, o solo los de un token)."""
+        with self._lock:
+            if token is None:
+                self._entries.clear()
+            else:
+                for key in [k for k in self._entries if k[0] == token]:
+                    del self._entries[key]
+
+
+validators = ValidatorStore()
+tokens.on_token_replaced(validators.clear)
+
+# Coalescencia de GETs idénticos en vuelo; inflight.stats() expone el ahorro
+inflight = SingleFlight()
+
+
+def fetch_json(url: str, token: str = None, empty=None) -> dict:
+    """
+    GET JSON con el cliente compartido, GET condicional y coalescencia de
+    peticiones idénticas en vuelo (mismo url y token, también con una
+    descarga de stream_json en curso: se espera su resultado final).
+    Devuelve:
+      { "ok": True, "data": <json>, "from_cache": bool, "token": <token usado> } en éxito
+      { "ok": False, "error": "mensaje" } en error
+    "token" es el token con el que se obtuvieron los datos (el renovado si
+    hubo reintento por 401), para guardarlos bajo ese token.
+    """
+    def fetch(fanout):
+        try:
+            resp = get_client().get(url, token=token, headers=validators.request_headers(url, token))
+        except requests.RequestException as ex:
+            return request_error(ex)
+        return _with_token(validators.result(resp, url, sent_token(resp, token), empty=empty), resp, token)
+
+    # Peticiones idénticas en vuelo comparten una sola llamada upstream
+    return _coalesced(url, token, None, fetch, streamed=False)
+
+
+async def fetch_json_async(url: str, token: str = None, empty=None) -> dict:
+    """Versión async de fetch_json()."""
+    async def fetch(fanout):
+        try:
+            resp = await get_async_client().get(
+                url, token=token, headers=validators.request_headers(url, token)
+            )
+        except requests.RequestException as ex:
+            return request_error(ex)
+        return _with_token(validators.result(resp, url, sent_token(resp, token), empty=empty), resp, token)
+
+    return await _coalesced_async(url, token, None, fetch, streamed=False)
+
+
+def stream_json(url: str, token: str = None, on_batch=None, batch_size: int = STREAM_BATCH_SIZE) -> dict:
+    """
+    GET de un arreglo JSON decodificado por trozos mientras se descarga.
+    on_batch(items) recibe los elementos nuevos cada vez que se juntan al
+    menos `batch_size` (el último lote puede ser menor),
+    así la vista puede pintar los primeros antes de que termine la descarga.
+    Devuelve el mismo resultado que fetch_json() con la lista completa.
+    Comparte la petición en vuelo con fetch_json() y otros stream_json()
+    (inflight): quien se une a media descarga recibe primero los lotes ya
+    entregados; unido a un fetch_json() recibe la lista completa en un lote.
+    """
+    return _coalesced(
+        url, token, on_batch, lambda fanout: _stream_json(url, token, fanout.emit, batch_size)
+    )
+
+
+async def stream_json_async(
+    url: str, token: str = None, on_batch=None, batch_size: int = STREAM_BATCH_SIZE
+) -> dict:
+    """Versión async de stream_json(); cede el event loop entre trozos."""
+    return await _coalesced_async(
+        url, token, on_batch, lambda fanout: _stream_json_async(url, token, fanout.emit, batch_size)
+    )
+
+
+def _coalesced(url: str, token: str, on_batch, run, streamed: bool = True) -> dict:
+    """
+    Una sola petición upstream por (url, token) en vuelo, sea en streaming o
+    no. run(fanout) la hace quien llega primero; los demás esperan su
+    resultado y, con on_batch, reciben sus lotes.
+    """
+    key = ("GET", url, token)
+    fanout = _sync_streams.join(key, on_batch)
+
+    def fetch():
+        if fanout.closed:
+            # Se unió justo cuando terminaba la petición anterior: ya recibió sus lotes
+            return fanout.outcome()
+        result = None
+        try:
+            result = run(fanout)
+        finally:
+            _sync_streams.finish(key, fanout, result, streamed)
+        return result
+
+    try:
+        return dict(inflight.do_sync(key, fetch))
+    finally:
+        fanout.unsubscribe(on_batch)
+
+
+async def _coalesced_async(url: str, token: str, on_batch, run, streamed: bool = True) -> dict:
+    """Versión async de _coalesced(); run(fanout) devuelve una corrutina."""
+    key = ("GET", url, token)
+    fanout = _async_streams.join(key, on_batch)
+
+    async def fetch():
+        if fanout.closed:
+            return fanout.outcome()
+        result = None
+        try:
+            result = await run(fanout)
+        finally:
+            _async_streams.finish(key, fanout, result, streamed)
+        return result
+
+    try:
+        return dict(await inflight.do(key, fetch))
+    finally:
+        fanout.unsubscribe(on_batch)
+
+
+def _stream_json(url: str, token: str, on_batch, batch_size: int) -> dict:
+    headers = validators.request_headers(url, token)
+    try:
+        resp = get_client().get(url, token=token, headers=headers, stream=True)
+    except requests.RequestException as ex:
+        return request_error(ex)
+
+    used = sent_token(resp, token)
+    with resp:
+        if resp.status_code not in (200, 201):
+            result = validators.result(resp, url, used, empty=[])
+            record_payload(url, resp)
+            return _with_token(result, resp, token)
+        batcher = _Batcher(on_batch, batch_size)
+        try:
+            for chunk in resp.iter_content(chunk_size=STREAM_CHUNK_SIZE):
+                batcher.feed(chunk)
+            data = batcher.close()
+        except requests.RequestException as ex:
+            return request_error(ex)
+        except ValueError as ex:
+            return {"ok": False, "error": f"Error al procesar respuesta: {ex}"}
+        record_payload(url, resp, body_bytes=batcher.body_bytes)
+
+    validators.store(url, used, resp.headers, data)
+    return {"ok": True, "data": data, "from_cache": False, "token": used}
+
+
+async def _stream_json_async(url: str, token: str, on_batch, batch_size: int) -> dict:
+    headers = validators.request_headers(url, token)
+    try:
+        async with get_async_client().stream("GET", url, token=token, headers=headers) as resp:
+            # FetchResponse ya llega registrada por AsyncApiClient.request()
+            record = not isinstance(resp, FetchResponse)
+            used = sent_token(resp, token)
+            if resp.status_code not in (200, 201):
+                await resp.aread()
+                if record:
+                    record_payload(url, resp)
+                return _with_token(validators.result(resp, url, used, empty=[]), resp, token)
+            batcher = _Batcher(on_batch, batch_size)
+            async for chunk in resp.aiter_bytes():
+                batcher.feed(chunk)
+            data = batcher.close()
+            if record:
+                record_payload(url, resp, body_bytes=batcher.body_bytes)
+            resp_headers = resp.headers
+    except requests.RequestException as ex:
+        return request_error(ex)
+    except ValueError as ex:
+        return {"ok": False, "error": f"Error al procesar respuesta: {ex}"}
+
+    validators.store(url, used, resp_headers, data)
+    return {"ok": True, "data": data, "from_cache": False, "token": used}
+
+
+def _with_token(result: dict, resp, token: str = None) -> dict:
+    """Agrega "token" (el usado en la petición) a un resultado exitoso."""
+    if result.get("ok"):
+        result = dict(result)
+        result["token"] = sent_token(resp, token)
+    return result
+
+
+class _BatchFanout:
+    """Reparte los lotes de una descarga en streaming entre quienes la comparten."""
+
+    def __init__(self):
+        self.batches = []
+        self.result = None
+        self.closed = False
+        self._subscribers = []
+        self._lock = threading.Lock()
+
+    def outcome(self) -> dict:
+        """Resultado de la descarga ya terminada, o un error si se interrumpió."""
+        if self.result is None:
+            return {"ok": False, "error": "La descarga compartida se interrumpió"}
+        return self.result
+
+    def subscribe(self, on_batch):
+        # Los lotes ya entregados se repiten primero, en orden
+        with self._lock:
+            for items in self.batches:
+                on_batch(items)
+            self._subscribers.append(on_batch)
+
+    def unsubscribe(self, on_batch):
+        with self._lock:
+            if on_batch in self._subscribers:
+                self._subscribers.remove(on_batch)
+
+    def emit(self, items):
+        with self._lock:
+            self.batches.append(items)
+            for on_batch in list(self._subscribers):
+                on_batch(items)
+
+
+class _StreamFlights:
+    """GETs en vuelo por clave (en streaming o no), con su reparto de lotes."""
+
+    def __init__(self):
+        self._fanouts = {}  # clave -> _BatchFanout
+        self._lock = threading.Lock()
+
+    def join(self, key, on_batch) -> _BatchFanout:
+        with self._lock:
+            fanout = self._fanouts.get(key)
+            if fanout is None:
+                fanout = self._fanouts[key] = _BatchFanout()
+        if on_batch:
+            fanout.subscribe(on_batch)
+        return fanout
+
+    def finish(self, key, fanout: _BatchFanout, result, streamed: bool = True):
+        data = result.get("data") if result and result.get("ok") else None
+        if not streamed and isinstance(data, list) and data:
+            # Petición sin streaming: quien se unió con on_batch recibe todo en un lote
+            fanout.emit(data)
+        with self._lock:
+            fanout.result = result
+            fanout.closed = True
+            if self._fanouts.get(key) is fanout:
+                del self._fanouts[key]
+
+
+# sync y async van por separado, igual que inflight.do_sync / inflight.do
+_sync_streams = _StreamFlights()
+_async_streams = _StreamFlights()
+
+
+class _Batcher:
+    """Junta los elementos de JsonArrayStream en lotes para on_batch."""
+
+    def __init__(self, on_batch, batch_size: int):
+        self.parser = JsonArrayStream()
+        self.on_batch = on_batch
+        self.batch_size = max(1, batch_size)
+        self.data = []
+        self.body_bytes = 0
+        self._flushed = 0
+
+    def feed(self, chunk: bytes):
+        self.body_bytes += len(chunk)
+        self.data.extend(self.parser.feed(chunk))
+        if len(self.data) - self._flushed >= self.batch_size:
+            self._flush()
+
+    def close(self):
+        rest = self.parser.close()
+        if not isinstance(rest, list):
+            return rest  # El documento no era un arreglo
+        self.data.extend(rest)
+        self._flush()
+        return self.data
+
+    def _flush(self):
+        if self.on_batch and len(self.data) > self._flushed:
+            self.on_batch(self.data[self._flushed:])
+        self._flushed = len(self.data)
+
+
+_client = None
+_async_client = None
+_client_lock = threading.Lock()
+
+
+def get_client() -> ApiClient:
+    """Devuelve el ApiClient compartido del proceso (se crea en el primer uso)."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = ApiClient()
+    return _client
+
+
+def get_async_client() -> AsyncApiClient:
+    """Devuelve el AsyncApiClient compartido del proceso (se crea en el primer uso)."""
+    global _async_client
+    if _async_client is None:
+        with _client_lock:
+            if _async_client is None:
+                _async_client = AsyncApiClient()
+    return _async_client
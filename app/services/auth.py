@@ -1,20 +1,8 @@
 # app/services/auth.py
 
 import requests
-from app.config import AUTH_URL, API_TIMEOUT_SECONDS, USE_HTTPS, DISABLE_SSL_VERIFY
-
-# Desactivar advertencias SSL para Pyodide (web)
-# Pyodide no puede validar certificados SSL correctamente
-if DISABLE_SSL_VERIFY:
-    try:
-        import urllib3
-        urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
-    except ImportError:
-        pass  # urllib3 no disponible (no es Pyodide)
-
-# Si HTTPS no está disponible, usar HTTP como fallback (solo desarrollo)
-if not USE_HTTPS:
-    AUTH_URL = AUTH_URL.replace("https://", "http://")
+from app.config import AUTH_URL
+from app.services.api import get_client, get_async_client, error_message, request_error
 
 def login(user_name: str, password: str):
     """
@@ -23,20 +11,24 @@ def login(user_name: str, password: str):
       { "ok": True, "token": "...", "data": <json> } en éxito
       { "ok": False, "error": "mensaje" } en error
     """
-    payload = {"username": user_name, "password": password}
+    try:
+        resp = get_client().post(AUTH_URL, json=_payload(user_name, password))
+    except requests.RequestException as ex:
+        return request_error(ex)
+    return _login_result(resp)
 
+async def login_async(user_name: str, password: str):
+    """Versión async de login() que corre en el event loop de Flet."""
     try:
-        resp = requests.post(
-            AUTH_URL, 
-            json=payload, 
-            timeout=API_TIMEOUT_SECONDS,
-            verify=not DISABLE_SSL_VERIFY  # Desactivar verificación SSL en Pyodide
-        )
-    except requests.Timeout:
-        return {"ok": False, "error": "Tiempo de espera agotado. El servidor tardó demasiado en responder."}
+        resp = await get_async_client().post(AUTH_URL, json=_payload(user_name, password))
     except requests.RequestException as ex:
-        return {"ok": False, "error": f"Sin conexión ({ex})"}
+        return request_error(ex)
+    return _login_result(resp)
+
+def _payload(user_name: str, password: str) -> dict:
+    return {"username": user_name, "password": password}
 
+def _login_result(resp):
     # Éxito típico .NET: 200/201
     if resp.status_code in (200, 201):
         try:
@@ -56,16 +48,4 @@ def login(user_name: str, password: str):
         return {"ok": True, "token": token, "data": jd}
 
     # Error con cuerpo JSON
-    try:
-        err = resp.json()
-        msg = (
-            err.get("message")
-            or err.get("Message")
-            or err.get("error")
-            or err.get("Error")
-            or str(err)
-        )
-    except Exception:
-        msg = f"HTTP {resp.status_code}"
-
-    return {"ok": False, "error": msg}
+    return {"ok": False, "error": error_message(resp)}
@@ -0,0 +1,174 @@
+# app/services/cache.py
+
+import asyncio
+import threading
+import time
+
+from app.config import CACHE_TTL_SECONDS, CACHE_DEFAULT_TTL_SECONDS
+from app.services.api import fetch_json, fetch_json_async, stream_json, stream_json_async
+from app.services import tokens
+
+
+class CacheEntry:
+    __slots__ = ("result", "stored_at", "ttl")
+
+    def __init__(self, result: dict, ttl: float):
+        self.result = result
+        self.stored_at = time.monotonic()
+        self.ttl = ttl
+
+    @property
+    def fresh(self) -> bool:
+        return time.monotonic() - self.stored_at < self.ttl
+
+
+class ResponseCache:
+    """
+    Caché de resultados de la API por (token, endpoint), con TTL por endpoint.
+    Solo guarda resultados exitosos. Al vencer el TTL la entrada no se borra:
+    se sirve como "stale" mientras se revalida en segundo plano.
+
+    El token de la clave es el que de verdad se usó en la petición (el
+    resultado trae "token" si se renovó tras un 401). Al reemplazarse un
+    token se borran sus entradas, y no se guardan resultados de un token
+    que ya no es el vigente.
+    """
+
+    def __init__(self, ttls: dict = None, default_ttl: float = CACHE_DEFAULT_TTL_SECONDS):
+        self.ttls = dict(CACHE_TTL_SECONDS if ttls is None else ttls)
+        self.default_ttl = default_ttl
+        self._entries = {}       # (token, endpoint) -> CacheEntry
+        self._revalidating = set()
+        self._lock = threading.Lock()
+
+    def get(self, endpoint: str, token: str = None):
+        with self._lock:
+            return self._entries.get((token, endpoint))
+
+    def put(self, endpoint: str, token: str, result: dict):
+        if not result.get("ok"):
+            return
+        token = result.pop("token", token)
+        if not tokens.is_current(token):
+            return
+        entry = CacheEntry(result, self.ttls.get(endpoint, self.default_ttl))
+        with self._lock:
+            self._entries[(token, endpoint)] = entry
+
+    def invalidate(self, endpoint: str = None, token: str = None):
+        """
+        Invalida entradas. Sin argumentos vacía la caché; con endpoint y/o
+        token solo las que coincidan (p. ej. al cerrar sesión).
+        """
+        with self._lock:
+            for key in list(self._entries):
+                entry_token, entry_endpoint = key
+                if endpoint is not None and entry_endpoint != endpoint:
+                    continue
+                if token is not None and entry_token != token:
+                    continue
+                del self._entries[key]
+
+    def _claim_revalidation(self, key) -> bool:
+        # Solo una revalidación en vuelo por clave
+        with self._lock:
+            if key in self._revalidating:
+                return False
+            self._revalidating.add(key)
+            return True
+
+    def _release_revalidation(self, key):
+        with self._lock:
+            self._revalidating.discard(key)
+
+
+response_cache = ResponseCache()
+tokens.on_token_replaced(lambda old: response_cache.invalidate(token=old))
+_background_tasks = set()
+
+
+def invalidate(endpoint: str = None, token: str = None):
+    """Invalida la caché de respuestas compartida."""
+    response_cache.invalidate(endpoint=endpoint, token=token)
+
+
+def is_fresh(endpoint: str, token: str = None) -> bool:
+    """True si hay un resultado en caché para (token, endpoint) y no ha vencido."""
+    entry = response_cache.get(endpoint, token)
+    return entry is not None and entry.fresh
+
+
+def _served(entry: CacheEntry) -> dict:
+    result = dict(entry.result)
+    result["from_cache"] = True
+    if not entry.fresh:
+        result["stale"] = True
+    return result
+
+
+def cached_fetch_json(
+    endpoint: str, url: str, token: str = None, empty=None, on_revalidated=None, on_batch=None
+) -> dict:
+    """
+    fetch_json() con caché TTL y stale-while-revalidate.
+    - Entrada fresca: se devuelve sin red ("from_cache": True).
+    - Entrada vencida: se devuelve al instante ("stale": True) y se revalida
+      en un hilo; on_revalidated(result) recibe el resultado nuevo.
+    - Sin entrada: petición normal, o en streaming si se pasa on_batch
+      (on_batch(items) recibe los registros según se decodifican).
+    """
+    key = (token, endpoint)
+    entry = response_cache.get(endpoint, token)
+    if entry is None:
+        if on_batch:
+            result = stream_json(url, token, on_batch=on_batch)
+        else:
+            result = fetch_json(url, token, empty=empty)
+        response_cache.put(endpoint, token, result)
+        return result
+
+    if not entry.fresh and response_cache._claim_revalidation(key):
+        def revalidate():
+            try:
+                result = fetch_json(url, token, empty=empty)
+                response_cache.put(endpoint, token, result)
+            finally:
+                response_cache._release_revalidation(key)
+            if on_revalidated:
+                on_revalidated(result)
+
+        threading.Thread(target=revalidate, daemon=True).start()
+
+    return _served(entry)
+
+
+async def cached_fetch_json_async(
+    endpoint: str, url: str, token: str = None, empty=None, on_revalidated=None, on_batch=None
+) -> dict:
+    """Versión async de cached_fetch_json(); revalida en una tarea del event loop."""
+    key = (token, endpoint)
+    entry = response_cache.get(endpoint, token)
+    if entry is None:
+        if on_batch:
+            result = await stream_json_async(url, token, on_batch=on_batch)
+        else:
+            result = await fetch_json_async(url, token, empty=empty)
+        response_cache.put(endpoint, token, result)
+        return result
+
+    if not entry.fresh and response_cache._claim_revalidation(key):
+        async def revalidate():
+            try:
+                result = await fetch_json_async(url, token, empty=empty)
+                response_cache.put(endpoint, token, result)
+            finally:
+                response_cache._release_revalidation(key)
+            if on_revalidated:
+                on_revalidated(result)
+
+        task = asyncio.ensure_future(revalidate())
+        # Mantener referencia para que la tarea no se recolecte a medias
+        _background_tasks.add(task)
+        task.add_done_callback(_background_tasks.discard)
+
+    return _served(entry)
@@ -0,0 +1,161 @@
+# app/services/endpoints.py
+
+import json
+import os
+import threading
+import time
+
+from app.config import (
+    ENDPOINT_CACHE_FILE,
+    ENDPOINT_FAILURE_THRESHOLD,
+    ENDPOINT_MISS_THRESHOLD,
+    ENDPOINT_NEGATIVE_TTL_SECONDS,
+)
+
+
+class EndpointRegistry:
+    """
+    Memoria de descubrimiento de endpoints.
+
+    - Recuerda, por tipo de búsqueda ("vehicle_id" / "imei"), qué plantilla de
+      endpoint respondió bien, para ir directo a ella en las siguientes llamadas.
+    - Cuenta fallos seguidos por plantilla (errores de red, 405); al llegar a
+      `failure_threshold` la plantilla se descarta durante `negative_ttl`
+      segundos.
+    - Un 404 de un vehículo puede ser solo que ese vehículo no tiene
+      ubicación: no cuenta como fallo. Solo si `miss_threshold` vehículos
+      distintos dan 404 seguidos (sin ningún éxito en medio) la ruta se
+      descarta como si hubiera fallado.
+    - Se persiste en un JSON para que el descubrimiento sobreviva al proceso.
+    Las marcas de tiempo son epoch (time.time) para que sigan siendo válidas
+    al recargar el archivo.
+    """
+
+    def __init__(
+        self,
+        path: str = ENDPOINT_CACHE_FILE,
+        failure_threshold: int = ENDPOINT_FAILURE_THRESHOLD,
+        negative_ttl: float = ENDPOINT_NEGATIVE_TTL_SECONDS,
+        miss_threshold: int = ENDPOINT_MISS_THRESHOLD,
+    ):
+        self.path = path
+        self.failure_threshold = failure_threshold
+        self.negative_ttl = negative_ttl
+        self.miss_threshold = miss_threshold
+        self._preferred = {}      # tipo -> plantilla
+        self._failures = {}       # plantilla -> fallos seguidos
+        self._misses = {}         # plantilla -> registros distintos con 404 seguidos
+        self._blocked_until = {}  # plantilla -> epoch
+        self._lock = threading.Lock()
+        self._load()
+
+    def preferred(self, kind: str):
+        """Plantilla que funcionó la última vez para este tipo (o None)."""
+        with self._lock:
+            template = self._preferred.get(kind)
+        if template and self.is_blocked(template):
+            return None
+        return template
+
+    def is_blocked(self, template: str) -> bool:
+        with self._lock:
+            until = self._blocked_until.get(template)
+            if until is None:
+                return False
+            if until <= time.time():
+                # TTL vencido: se le da otra oportunidad
+                self._blocked_until.pop(template, None)
+                self._failures.pop(template, None)
+                self._misses.pop(template, None)
+                return False
+            return True
+
+    def record_success(self, kind: str, template: str):
+        with self._lock:
+            changed = self._preferred.get(kind) != template
+            self._preferred[kind] = template
+            self._failures.pop(template, None)
+            self._misses.pop(template, None)
+            self._blocked_until.pop(template, None)
+        if changed:
+            self._save()
+
+    def record_miss(self, kind: str, template: str, record: str):
+        """
+        404 para un registro (`record`, p. ej. la ruta con su clave). Solo en
+        memoria; la plantilla sigue siendo la preferida mientras no acumule
+        miss_threshold registros distintos sin éxito.
+        """
+        with self._lock:
+            misses = self._misses.setdefault(template, set())
+            misses.add(record)
+            if len(misses) < self.miss_threshold:
+                return
+            del self._misses[template]
+        self.record_failure(kind, template, count=self.failure_threshold)
+
+    def record_failure(self, kind: str, template: str, count: int = 1):
+        changed = False
+        with self._lock:
+            failures = self._failures.get(template, 0) + count
+            self._failures[template] = failures
+            if failures >= self.failure_threshold:
+                self._blocked_until[template] = time.time() + self.negative_ttl
+                changed = True
+            if self._preferred.get(kind) == template:
+                # Si la preferida falla, volver a descubrir en la siguiente llamada
+                del self._preferred[kind]
+                changed = True
+        if changed:
+            self._save()
+
+    def clear(self):
+        with self._lock:
+            self._preferred.clear()
+            self._failures.clear()
+            self._misses.clear()
+            self._blocked_until.clear()
+        self._save()
+
+    def _load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return  # Sin caché previa o archivo corrupto: se descubre de nuevo
+        now = time.time()
+        self._preferred = dict(data.get("preferred") or {})
+        self._blocked_until = {
+            template: until
+            for template, until in (data.get("blocked_until") or {}).items()
+            if until > now
+        }
+
+    def _save(self):
+        with self._lock:
+            data = {
+                "preferred": dict(self._preferred),
+                "blocked_until": dict(self._blocked_until),
+            }
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self.path)
+        except OSError:
+            pass  # Sin disco escribible: la caché queda solo en memoria
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_endpoint_registry() -> EndpointRegistry:
+    """Devuelve el EndpointRegistry compartido del proceso (se carga en el primer uso)."""
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = EndpointRegistry()
+    return _registry
@@ -1,154 +1,490 @@
 # app/services/locations.py
 
+import asyncio
+import time
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+
 import requests
-from app.config import API_TIMEOUT_SECONDS, VEHICLES_LAST_POSITIONS_URL, USE_HTTPS, DISABLE_SSL_VERIFY
+from app.config import (
+    VEHICLES_LAST_POSITIONS_URL,
+    LOCATIONS_CONCURRENCY,
+    LOCATIONS_BATCH_DEADLINE_SECONDS,
+)
+from app.services.api import get_client, get_async_client
+from app.services.cache import cached_fetch_json, cached_fetch_json_async
+from app.services.endpoints import get_endpoint_registry
+from app.services.normalize import Vehicle, normalize_vehicle, normalizing_callbacks, with_vehicles
+from app.state.history import position_history
+from app.state.snapshot import POSITIONS, snapshot_for
+
+NO_LOCATION_ENDPOINT_ERROR = "No se encontró endpoint de ubicaciones disponible"
+NO_LOCATION_ERROR = "El vehículo no tiene ubicación registrada"
+
+# Resultado de probar un endpoint para un vehículo
+FOUND = "found"    # Respondió con la ubicación
+MISS = "miss"      # 404: ese vehículo no tiene ubicación (o la ruta no existe)
+FAILED = "failed"  # Error de red, 405 o respuesta ilegible: falla la ruta
 
 def get_vehicle_location(token: str, vehicle_id: int = None, imei: int = None):
     """
     Obtiene la ubicación actual de un vehículo.
     Puede buscar por vehicle_id o por imei.
     
+    Si ya se conoce el endpoint que funciona (EndpointRegistry) se usa directo;
+    si no, se prueban los candidatos en paralelo y gana el primero que responda.
+    Un 404 del endpoint conocido significa que ese vehículo no tiene
+    ubicación: no se vuelve a descubrir ni cuenta como fallo del endpoint.
+    
     Devuelve:
       { "ok": True, "data": { "lat": float, "lon": float, ... } } en éxito
       { "ok": False, "error": "mensaje" } en error
     """
-    headers = {
-        "Authorization": f"Bearer {token}",
-        "Content-Type": "application/json"
-    }
+    return _locate(token, vehicle_id, imei, _probe_in_pool)
+
+async def get_vehicle_location_async(token: str, vehicle_id: int = None, imei: int = None):
+    """Versión async de get_vehicle_location() que corre en el event loop de Flet."""
+    return await _locate_async(token, vehicle_id, imei)
+
+def _locate(token: str, vehicle_id, imei, probe_pending):
+    """
+    get_vehicle_location con la estrategia de descubrimiento como parámetro:
+    probe_pending(client, token, registry, pending) prueba los candidatos
+    que faltan y devuelve el primer resultado (o None).
+    """
+    client = get_client()
+    registry = get_endpoint_registry()
+    candidates = _candidate_endpoints(vehicle_id, imei)
     
-    # Intentar diferentes endpoints posibles
-    # Usar HTTPS para evitar Mixed Content
-    from app.config import USE_HTTPS, DISABLE_SSL_VERIFY
+    # 1. Endpoint ya descubierto: una sola petición
+    preferred = _preferred_candidates(candidates, registry)
+    missed = 0
+    for kind, template, path in preferred:
+        result, outcome = _probe(client, token, path)
+        _record_outcome(registry, kind, template, path, outcome)
+        if result:
+            return result
+        missed += outcome == MISS
+    if preferred and missed == len(preferred):
+        return {"ok": False, "error": NO_LOCATION_ERROR}
     
-    # Desactivar advertencias SSL para Pyodide (web)
-    if DISABLE_SSL_VERIFY:
-        try:
-            import urllib3
-            urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
-        except ImportError:
-            pass  # urllib3 no disponible (no es Pyodide)
-    
-    protocol = "https" if USE_HTTPS else "http"
-    base_url = f"{protocol}://springtelecom.mx/dev/devsionapi/api"
-    
-    endpoints_to_try = []
-    
-    if vehicle_id:
-        endpoints_to_try.extend([
-            f"{base_url}/Vehiculos/{vehicle_id}/Ubicacion",
-            f"{base_url}/Vehiculos/{vehicle_id}/Location",
-            f"{base_url}/Ubicaciones/{vehicle_id}",
-        ])
-    
-    if imei:
-        endpoints_to_try.extend([
-            f"{base_url}/Ubicaciones?imei={imei}",
-            f"{base_url}/Ubicaciones?IMEI={imei}",
-            f"{base_url}/Vehiculos/Ubicacion?imei={imei}",
-        ])
-    
-    # Intentar cada endpoint
-    for url in endpoints_to_try:
-        try:
-            resp = requests.get(
-                url, 
-                headers=headers, 
-                timeout=API_TIMEOUT_SECONDS,
-                verify=not DISABLE_SSL_VERIFY  # Desactivar verificación SSL en Pyodide
-            )
-            if resp.status_code in (200, 201):
-                try:
-                    data = resp.json() if resp.content else {}
-                    return {"ok": True, "data": data, "endpoint": url}
-                except Exception:
-                    continue
-        except requests.Timeout:
-            continue  # Continuar con el siguiente endpoint si hay timeout
-        except requests.RequestException:
-            continue
+    # 2. Descubrimiento: probar el resto
+    pending = _pending_candidates(candidates, preferred, registry)
+    if pending:
+        result = probe_pending(client, token, registry, pending)
+        if result:
+            return result
     
-    return {"ok": False, "error": "No se encontró endpoint de ubicaciones disponible"}
+    return {"ok": False, "error": NO_LOCATION_ENDPOINT_ERROR}
 
-def get_last_vehicles_positions(token: str):
+def _probe_in_pool(client, token: str, registry, pending: list, executor: ThreadPoolExecutor = None):
     """
-    Obtiene las últimas posiciones de todos los vehículos usando el endpoint específico.
-    Este endpoint es más eficiente que hacer llamadas individuales.
-    
-    Devuelve:
-      { "ok": True, "data": <lista de vehículos con posiciones> } en éxito
-      { "ok": False, "error": "mensaje" } en error
+    Prueba los candidatos en paralelo y gana el primero que responda. Sin
+    `executor` usa un pool propio (un hilo por candidato); con uno compartido
+    los hilos no pasan del tamaño de ese pool.
     """
-    headers = {
-        "Authorization": f"Bearer {token}",
-        "Content-Type": "application/json"
+    own = executor is None
+    if own:
+        executor = ThreadPoolExecutor(max_workers=len(pending))
+    futures = {
+        executor.submit(_probe, client, token, path): (kind, template, path)
+        for kind, template, path in pending
     }
+    try:
+        for future in as_completed(futures):
+            kind, template, path = futures[future]
+            result, outcome = future.result()
+            _record_outcome(registry, kind, template, path, outcome)
+            if result:
+                return result
+    finally:
+        # No esperar a los candidatos que siguen en vuelo
+        if own:
+            executor.shutdown(wait=False, cancel_futures=True)
+        else:
+            for future in futures:
+                future.cancel()
+    return None
+
+def _probe_in_turn(client, token: str, registry, pending: list):
+    """Prueba los candidatos uno tras otro en el hilo que llama."""
+    for kind, template, path in pending:
+        result, outcome = _probe(client, token, path)
+        _record_outcome(registry, kind, template, path, outcome)
+        if result:
+            return result
+    return None
+
+async def _locate_async(token: str, vehicle_id, imei, max_probes: int = None):
+    """
+    Versión async de _locate(); el descubrimiento lanza todos los candidatos
+    a la vez, o como máximo `max_probes` simultáneos.
+    """
+    client = get_async_client()
+    registry = get_endpoint_registry()
+    candidates = _candidate_endpoints(vehicle_id, imei)
     
-    # Desactivar advertencias SSL para Pyodide (web)
-    if DISABLE_SSL_VERIFY:
-        try:
-            import urllib3
-            urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
-        except ImportError:
-            pass  # urllib3 no disponible (no es Pyodide)
+    preferred = _preferred_candidates(candidates, registry)
+    missed = 0
+    for kind, template, path in preferred:
+        result, outcome = await _probe_async(client, token, path)
+        _record_outcome(registry, kind, template, path, outcome)
+        if result:
+            return result
+        missed += outcome == MISS
+    if preferred and missed == len(preferred):
+        return {"ok": False, "error": NO_LOCATION_ERROR}
+    
+    pending = _pending_candidates(candidates, preferred, registry)
+    slots = asyncio.Semaphore(max_probes or len(pending) or 1)
     
-    # Si HTTPS no está disponible, usar HTTP como fallback (solo desarrollo)
-    url = VEHICLES_LAST_POSITIONS_URL
-    if not USE_HTTPS:
-        url = url.replace("https://", "http://")
+    async def probe(path):
+        async with slots:
+            return await _probe_async(client, token, path)
     
+    tasks = {
+        asyncio.ensure_future(probe(path)): (kind, template, path)
+        for kind, template, path in pending
+    }
+    try:
+        while tasks:
+            done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                kind, template, path = tasks.pop(task)
+                result, outcome = task.result()
+                _record_outcome(registry, kind, template, path, outcome)
+                if result:
+                    return result
+    finally:
+        # Cancelar los candidatos restantes (también si cancelan esta tarea)
+        for task in tasks:
+            task.cancel()
+    
+    return {"ok": False, "error": NO_LOCATION_ENDPOINT_ERROR}
+
+# Plantillas de endpoints posibles de ubicación, relativas a API_BASE_URL
+LOCATION_ENDPOINT_TEMPLATES = {
+    "vehicle_id": [
+        "Vehiculos/{key}/Ubicacion",
+        "Vehiculos/{key}/Location",
+        "Ubicaciones/{key}",
+    ],
+    "imei": [
+        "Ubicaciones?imei={key}",
+        "Ubicaciones?IMEI={key}",
+        "Vehiculos/Ubicacion?imei={key}",
+    ],
+}
+
+def _candidate_endpoints(vehicle_id: int = None, imei: int = None) -> list:
+    """Lista de (tipo, plantilla, ruta) a probar, en orden de preferencia."""
+    candidates = []
+    for kind, key in (("vehicle_id", vehicle_id), ("imei", imei)):
+        if key:
+            for template in LOCATION_ENDPOINT_TEMPLATES[kind]:
+                candidates.append((kind, template, template.format(key=key)))
+    return candidates
+
+def _preferred_candidates(candidates: list, registry) -> list:
+    preferred = {registry.preferred(kind) for kind in LOCATION_ENDPOINT_TEMPLATES}
+    return [c for c in candidates if c[1] in preferred]
+
+def _pending_candidates(candidates: list, tried: list, registry) -> list:
+    return [c for c in candidates if c not in tried and not registry.is_blocked(c[1])]
+
+def _probe(client, token: str, path: str) -> tuple:
+    """(resultado o None, FOUND / MISS / FAILED / None) de un candidato."""
+    url = client.url(path)
     try:
-        resp = requests.get(
-            url, 
-            headers=headers, 
-            timeout=API_TIMEOUT_SECONDS,
-            verify=not DISABLE_SSL_VERIFY  # Desactivar verificación SSL en Pyodide
-        )
-    except requests.Timeout:
-        return {"ok": False, "error": "Tiempo de espera agotado. El servidor tardó demasiado en responder."}
-    except requests.RequestException as ex:
-        return {"ok": False, "error": f"Sin conexión ({ex})"}
-    
-    # Éxito típico .NET: 200/201
+        resp = client.get(url, token=token)
+    except requests.RequestException:
+        return None, FAILED  # Timeout o error de red: falla del candidato
+    return _location_result(resp, url)
+
+async def _probe_async(client, token: str, path: str) -> tuple:
+    url = client.url(path)
+    try:
+        resp = await client.get(url, token=token)
+    except requests.RequestException:
+        return None, FAILED
+    return _location_result(resp, url)
+
+def _location_result(resp, url: str) -> tuple:
+    """Resultado de éxito si la respuesta es válida; si no, None y por qué."""
     if resp.status_code in (200, 201):
         try:
-            data = resp.json() if resp.content else []
-            return {"ok": True, "data": data}
-        except Exception as ex:
-            return {"ok": False, "error": f"Error al procesar respuesta: {ex}"}
+            data = resp.json() if resp.content else {}
+            return {"ok": True, "data": data, "endpoint": url}, FOUND
+        except Exception:
+            return None, FAILED
+    if resp.status_code == 404:
+        return None, MISS
+    if resp.status_code == 405:
+        return None, FAILED
+    return None, None  # 401, 5xx...: no dice nada de la ruta
+
+def _record_outcome(registry, kind: str, template: str, path: str, outcome):
+    if outcome == FOUND:
+        registry.record_success(kind, template)
+    elif outcome == MISS:
+        registry.record_miss(kind, template, path)
+    elif outcome == FAILED:
+        registry.record_failure(kind, template)
+
+def get_last_vehicles_positions(token: str, on_revalidated=None, on_batch=None):
+    """
+    Obtiene las últimas posiciones de todos los vehículos usando el endpoint específico.
+    Este endpoint es más eficiente que hacer llamadas individuales.
+    Usa GET condicional: "from_cache" indica que no hubo cambios (304).
+    El resultado se guarda en caché (TTL "positions"); vencido el TTL se
+    devuelve el dato viejo y on_revalidated(result) recibe el nuevo.
+    Con on_batch, si no hay caché la lista se decodifica en streaming y
+    on_batch(vehicles) recibe los registros (Vehicle) según van llegando.
+    Cada resultado (también los revalidados) se agrega a position_history.
     
-    # Error con cuerpo JSON
-    try:
-        err = resp.json()
-        msg = (
-            err.get("message")
-            or err.get("Message")
-            or err.get("error")
-            or err.get("Error")
-            or str(err)
-        )
-    except Exception:
-        msg = f"HTTP {resp.status_code}"
-    
-    return {"ok": False, "error": msg}
-
-def get_all_vehicles_locations(token: str, vehicles: list):
-    """
-    Obtiene las ubicaciones de todos los vehículos.
-    Hace llamadas individuales para cada vehículo.
+    Devuelve:
+      { "ok": True, "data": <lista de vehículos con posiciones>, "vehicles": [Vehicle],
+        "from_cache": bool } en éxito
+      { "ok": False, "error": "mensaje" } en error
+    """
+    revalidated, streamed = normalizing_callbacks(_recording(on_revalidated), on_batch)
+    result = cached_fetch_json(
+        "positions", VEHICLES_LAST_POSITIONS_URL, token, empty=[],
+        on_revalidated=revalidated, on_batch=streamed,
+    )
+    return _record_history(with_vehicles(result, streamed))
+
+async def get_last_vehicles_positions_async(token: str, on_revalidated=None, on_batch=None):
+    """Versión async de get_last_vehicles_positions() que corre en el event loop de Flet."""
+    revalidated, streamed = normalizing_callbacks(_recording(on_revalidated), on_batch)
+    result = await cached_fetch_json_async(
+        "positions", VEHICLES_LAST_POSITIONS_URL, token, empty=[],
+        on_revalidated=revalidated, on_batch=streamed,
+    )
+    return _record_history(with_vehicles(result, streamed))
+
+def _record_history(result: dict) -> dict:
+    """Agrega las posiciones de un resultado exitoso al historial."""
+    if result.get("ok"):
+        position_history.record(snapshot_for(result.get("vehicles", []), POSITIONS))
+    return result
+
+def _recording(on_revalidated):
+    """Callback de revalidación que además alimenta el historial."""
+    def revalidated(result):
+        _record_history(result)
+        if on_revalidated:
+            on_revalidated(result)
+    return revalidated
+
+class BatchStats:
+    """Estadísticas agregadas de una consulta masiva de ubicaciones."""
+
+    def __init__(self):
+        self.total = 0
+        self.succeeded = 0
+        self.failed = 0
+        self.timed_out = 0  # Vehículos sin respuesta antes del deadline
+        self.elapsed = 0.0
+        self.latencies = []
+
+    def record(self, ok: bool, latency: float):
+        self.latencies.append(latency)
+        if ok:
+            self.succeeded += 1
+        else:
+            self.failed += 1
+
+    def as_dict(self) -> dict:
+        latencies = sorted(self.latencies)
+        count = len(latencies)
+        return {
+            "total": self.total,
+            "succeeded": self.succeeded,
+            "failed": self.failed,
+            "timed_out": self.timed_out,
+            "elapsed": round(self.elapsed, 3),
+            "avg_latency": round(sum(latencies) / count, 3) if count else 0.0,
+            "p95_latency": round(latencies[min(count - 1, int(count * 0.95))], 3) if count else 0.0,
+            "max_latency": round(latencies[-1], 3) if count else 0.0,
+        }
+
+def get_all_vehicles_locations(
+    token: str,
+    vehicles: list,
+    concurrency: int = LOCATIONS_CONCURRENCY,
+    deadline: float = LOCATIONS_BATCH_DEADLINE_SECONDS,
+    on_result=None,
+    stats: BatchStats = None,
+):
+    """
+    Obtiene las ubicaciones de todos los vehículos (Vehicle o dicts crudos).
+    Hace llamadas individuales para cada vehículo, con un límite de
+    `deadline` segundos para el lote. Todas las peticiones (también las del
+    descubrimiento del endpoint) corren en un solo pool de `concurrency`
+    hilos, así que nunca hay más que eso en vuelo.
+    on_result(key, data) se invoca con cada ubicación según van llegando.
     NOTA: Esta función está deprecada en favor de get_last_vehicles_positions()
     que es más eficiente.
     """
+    stats = stats if stats is not None else BatchStats()
     locations = {}
+    targets = _location_targets(vehicles)
+    stats.total = len(targets)
+    start = time.perf_counter()
+    executor = ThreadPoolExecutor(max_workers=max(1, concurrency))
     
-    for vehicle in vehicles:
-        vehicle_id = vehicle.get("id")
-        imei = vehicle.get("imei")
-        
-        if vehicle_id or imei:
-            location_result = get_vehicle_location(token, vehicle_id=vehicle_id, imei=imei)
-            if location_result.get("ok"):
-                locations[vehicle.get("id", imei)] = location_result.get("data", {})
+    def fetch(target, probe_pending):
+        key, vehicle_id, imei = target
+        t0 = time.perf_counter()
+        result = _locate(token, vehicle_id, imei, probe_pending)
+        return key, result, time.perf_counter() - t0
+    
+    def collect(key, result, latency):
+        stats.record(result.get("ok"), latency)
+        if result.get("ok"):
+            locations[key] = result.get("data", {})
+            if on_result:
+                on_result(key, locations[key])
+    
+    pending = {}
+    try:
+        # Sin endpoint descubierto: descubrir con el primer vehículo (sus
+        # candidatos en el pool del lote) antes de repartir el resto
+        if _needs_discovery(targets):
+            collect(*fetch(targets[0], partial(_probe_in_pool, executor=executor)))
+            targets = targets[1:]
+        # Cada vehículo ocupa un solo hilo del pool: sus candidatos van en fila
+        pending = {executor.submit(fetch, target, _probe_in_turn) for target in targets}
+        remaining = deadline - (time.perf_counter() - start)
+        for future in as_completed(pending, timeout=max(0.0, remaining)):
+            pending.discard(future)
+            collect(*future.result())
+    except FuturesTimeoutError:
+        pass
+    finally:
+        stats.timed_out = len(pending)
+        executor.shutdown(wait=False, cancel_futures=True)
+        stats.elapsed = time.perf_counter() - start
     
     return locations
 
+async def iter_vehicles_locations(
+    token: str,
+    vehicles: list,
+    concurrency: int = LOCATIONS_CONCURRENCY,
+    deadline: float = LOCATIONS_BATCH_DEADLINE_SECONDS,
+    stats: BatchStats = None,
+):
+    """
+    Iterador async que entrega (key, data) según llegan las ubicaciones,
+    para que el mapa se vaya llenando progresivamente.
+    Nunca hay más de `concurrency` peticiones en vuelo (el descubrimiento
+    incluido). Los vehículos sin respuesta al cumplirse `deadline` se cancelan.
+    """
+    stats = stats if stats is not None else BatchStats()
+    targets = _location_targets(vehicles)
+    stats.total = len(targets)
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    concurrency = max(1, concurrency)
+    semaphore = asyncio.Semaphore(concurrency)
+    
+    async def fetch(target, max_probes):
+        key, vehicle_id, imei = target
+        async with semaphore:
+            t0 = loop.time()
+            result = await _locate_async(token, vehicle_id, imei, max_probes=max_probes)
+            return key, result, loop.time() - t0
+    
+    pending = set()
+    try:
+        # Sin endpoint descubierto: descubrir con el primer vehículo antes de
+        # repartir, para no lanzar todos los candidatos por cada vehículo
+        if _needs_discovery(targets):
+            key, result, latency = await asyncio.wait_for(fetch(targets[0], concurrency), deadline)
+            stats.record(result.get("ok"), latency)
+            targets = targets[1:]
+            if result.get("ok"):
+                yield key, result.get("data", {})
+        
+        pending = {asyncio.ensure_future(fetch(target, 1)) for target in targets}
+        while pending:
+            remaining = deadline - (loop.time() - start)
+            if remaining <= 0:
+                break
+            done, pending = await asyncio.wait(
+                pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED
+            )
+            for task in done:
+                key, result, latency = task.result()
+                stats.record(result.get("ok"), latency)
+                if result.get("ok"):
+                    yield key, result.get("data", {})
+    except asyncio.TimeoutError:
+        stats.timed_out = len(targets)  # Ni el descubrimiento terminó a tiempo
+    else:
+        stats.timed_out = len(pending)
+    finally:
+        for task in pending:
+            task.cancel()
+        stats.elapsed = loop.time() - start
+
+async def get_all_vehicles_locations_async(
+    token: str,
+    vehicles: list,
+    concurrency: int = LOCATIONS_CONCURRENCY,
+    deadline: float = LOCATIONS_BATCH_DEADLINE_SECONDS,
+    on_result=None,
+):
+    """
+    Versión async de get_all_vehicles_locations().
+    Devuelve:
+      { "ok": True, "data": { key: ubicacion }, "stats": {...} }
+    """
+    stats = BatchStats()
+    locations = {}
+    async for key, data in iter_vehicles_locations(
+        token, vehicles, concurrency=concurrency, deadline=deadline, stats=stats
+    ):
+        locations[key] = data
+        if on_result:
+            on_result(key, data)
+    return {"ok": True, "data": locations, "stats": stats.as_dict()}
+
+def located_vehicle(vehicle: Vehicle, data) -> Vehicle:
+    """
+    Copia del Vehicle con la posición de una respuesta de ubicación; el
+    mismo Vehicle si la respuesta no trae coordenadas válidas.
+    """
+    if isinstance(data, list) and data:
+        data = data[-1]  # Algunos endpoints devuelven el historial: la última
+    if not isinstance(data, dict):
+        return vehicle
+    position = normalize_vehicle(data)
+    if not position.has_position:
+        return vehicle
+    fields = {name: getattr(vehicle, name) for name in Vehicle.__slots__}
+    fields.update(
+        lat=position.lat,
+        lon=position.lon,
+        speed=position.speed if position.speed is not None else vehicle.speed,
+        timestamp=position.timestamp or vehicle.timestamp,
+    )
+    return Vehicle(**fields)
+
+def _needs_discovery(targets: list) -> bool:
+    """Hay vehículos y aún no se conoce ningún endpoint de ubicación."""
+    registry = get_endpoint_registry()
+    return bool(targets) and not any(registry.preferred(kind) for kind in LOCATION_ENDPOINT_TEMPLATES)
+
+def _location_targets(vehicles: list) -> list:
+    """Lista de (key, vehicle_id, imei) de los vehículos consultables (Vehicle o dict crudo)."""
+    targets = []
+    for i, vehicle in enumerate(vehicles):
+        if isinstance(vehicle, dict):
+            vehicle = normalize_vehicle(vehicle, i)
+        if vehicle.id or vehicle.imei:
+            targets.append((vehicle.key, vehicle.id, vehicle.imei))
+    return targets
@@ -0,0 +1,99 @@
+# app/services/metrics.py
+
+import logging
+import re
+import threading
+from urllib.parse import urlparse
+
+from app.config import API_BASE_URL, PAYLOAD_WARN_BYTES, PAYLOAD_DEFAULT_WARN_BYTES
+
+logger = logging.getLogger(__name__)
+
+_BASE_PATH = urlparse(API_BASE_URL).path.rstrip("/")
+_NUMERIC_SEGMENT = re.compile(r"/\d+(?=/|$)")
+
+
+def endpoint_name(url: str) -> str:
+    """
+    Nombre estable del endpoint para agrupar métricas: ruta relativa a la API,
+    sin query y con los ids numéricos reemplazados ("Vehiculos/{id}/Ubicacion").
+    """
+    path = urlparse(url).path
+    if _BASE_PATH and _BASE_PATH in path:
+        path = path.split(_BASE_PATH, 1)[1]
+    elif "/api/" in path:
+        path = path.split("/api/", 1)[1]
+    return _NUMERIC_SEGMENT.sub("/{id}", path).strip("/") or "/"
+
+
+class EndpointStats:
+    __slots__ = (
+        "requests", "not_modified", "wire_bytes", "body_bytes",
+        "max_body_bytes", "oversized", "encodings",
+    )
+
+    def __init__(self):
+        self.requests = 0
+        self.not_modified = 0
+        self.wire_bytes = 0      # Bytes transferidos (comprimidos)
+        self.body_bytes = 0      # Bytes del cuerpo ya descomprimido
+        self.max_body_bytes = 0
+        self.oversized = 0
+        self.encodings = {}      # Content-Encoding -> respuestas
+
+    def as_dict(self) -> dict:
+        return {
+            "requests": self.requests,
+            "not_modified": self.not_modified,
+            "wire_bytes": self.wire_bytes,
+            "body_bytes": self.body_bytes,
+            "compression_ratio": round(self.wire_bytes / self.body_bytes, 3) if self.body_bytes else None,
+            "max_body_bytes": self.max_body_bytes,
+            "oversized": self.oversized,
+            "encodings": dict(self.encodings),
+        }
+
+
+class PayloadMetrics:
+    """Bytes comprimidos / descomprimidos por endpoint y respuestas sobredimensionadas."""
+
+    def __init__(self, warn_bytes: dict = None, default_warn_bytes: int = PAYLOAD_DEFAULT_WARN_BYTES):
+        self.warn_bytes = dict(PAYLOAD_WARN_BYTES if warn_bytes is None else warn_bytes)
+        self.default_warn_bytes = default_warn_bytes
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def record(self, url: str, status_code: int, wire_bytes: int, body_bytes: int, encoding: str = None):
+        name = endpoint_name(url)
+        limit = self.warn_bytes.get(name, self.default_warn_bytes)
+        oversized = body_bytes > limit
+        with self._lock:
+            stats = self._stats.get(name)
+            if stats is None:
+                stats = self._stats[name] = EndpointStats()
+            stats.requests += 1
+            if status_code == 304:
+                stats.not_modified += 1
+            stats.wire_bytes += wire_bytes
+            stats.body_bytes += body_bytes
+            stats.max_body_bytes = max(stats.max_body_bytes, body_bytes)
+            encoding = encoding or "identity"
+            stats.encodings[encoding] = stats.encodings.get(encoding, 0) + 1
+            if oversized:
+                stats.oversized += 1
+        if oversized:
+            logger.warning(
+                "Respuesta sobredimensionada en %s: %d bytes (límite %d, %d en la red)",
+                name, body_bytes, limit, wire_bytes,
+            )
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {name: stats.as_dict() for name, stats in self._stats.items()}
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+
+payload_metrics = PayloadMetrics()
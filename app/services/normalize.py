@@ -0,0 +1,329 @@
+# app/services/normalize.py
+
+import threading
+
+from app.config import SCHEMA_SAMPLE_RECORDS
+
+# Alias de cada campo en los distintos payloads de la API, en orden de prioridad
+ID_KEYS = ("id", "Id", "ID", "idVehiculo", "IdVehiculo")
+IMEI_KEYS = ("imei", "IMEI", "Imei")
+PLACAS_KEYS = ("placas", "Placas", "placa", "Placa", "PlacaVehiculo")
+ECONOMICO_KEYS = ("economico", "Economico")
+MARCA_KEYS = ("marca", "Marca")
+MODELO_KEYS = ("modelo", "Modelo")
+ANIO_KEYS = ("anio", "Anio")
+COLOR_KEYS = ("color", "Color")
+CLIENTE_KEYS = ("cliente", "Cliente")
+KM_KEYS = ("km", "Km")
+IMAGEN_KEYS = ("imagen", "Imagen")
+DESCRIPCION_KEYS = ("descripcion", "Descripcion", "nombre", "Nombre")
+LAT_KEYS = ("latitud", "Latitud", "lat", "latitude", "Latitude", "y")
+LON_KEYS = ("longitud", "Longitud", "lon", "lng", "longitude", "Longitude", "x")
+NESTED_LOCATION_KEYS = ("ubicacion", "Ubicacion", "location", "Location")
+NESTED_LAT_KEYS = ("latitud", "Latitud", "lat", "latitude")
+NESTED_LON_KEYS = ("longitud", "Longitud", "lon", "lng", "longitude")
+SPEED_KEYS = ("velocidad", "Velocidad", "speed", "Speed")
+TIMESTAMP_KEYS = ("fecha", "Fecha", "fechaHora", "FechaHora", "timestamp")
+
+
+class Vehicle:
+    """
+    Registro canónico y compacto de un vehículo.
+    Se construye una sola vez por descarga a partir del dict crudo de la API
+    (normalize_vehicles); los componentes leen atributos en lugar de probar
+    variantes de mayúsculas/minúsculas en cada render.
+    lat/lon son float, o None si el vehículo no tiene posición válida.
+    """
+
+    __slots__ = (
+        "id", "imei", "placas", "economico", "marca", "modelo", "anio", "color",
+        "cliente", "km", "imagen", "name", "lat", "lon", "speed", "timestamp",
+    )
+
+    def __init__(
+        self,
+        id=None,
+        imei="",
+        placas="",
+        economico="",
+        marca="",
+        modelo="",
+        anio="",
+        color="",
+        cliente="",
+        km=0.0,
+        imagen="",
+        name="",
+        lat=None,
+        lon=None,
+        speed=None,
+        timestamp=None,
+    ):
+        self.id = id
+        self.imei = imei
+        self.placas = placas
+        self.economico = economico
+        self.marca = marca
+        self.modelo = modelo
+        self.anio = anio
+        self.color = color
+        self.cliente = cliente
+        self.km = km
+        self.imagen = imagen
+        self.name = name
+        self.lat = lat
+        self.lon = lon
+        self.speed = speed
+        self.timestamp = timestamp
+
+    @property
+    def key(self):
+        """Identificador estable: id, o IMEI si no hay id."""
+        return self.id if self.id is not None else self.imei
+
+    @property
+    def has_position(self) -> bool:
+        return self.lat is not None and self.lon is not None
+
+    def __repr__(self):
+        return f"Vehicle(id={self.id!r}, placas={self.placas!r}, lat={self.lat!r}, lon={self.lon!r})"
+
+
+def _first(raw: dict, keys: tuple, default=""):
+    for key in keys:
+        value = raw.get(key)
+        if value:
+            return value
+    return default
+
+
+_MISSING = object()
+_ABSENT = ""  # Campo que no aparece en la muestra: se busca por alias en cada registro
+
+
+class SchemaPlan:
+    """
+    Plan de acceso campo -> clave, compilado una vez por payload a partir de
+    los primeros registros (SCHEMA_SAMPLE_RECORDS). En lugar de probar todas
+    las variantes de cada campo en cada registro, se lee la clave detectada.
+
+    Por campo el plan guarda:
+      - la clave detectada (str), si la muestra usa una sola variante;
+      - None si la muestra mezcla variantes: se prueba la cadena completa;
+      - _ABSENT si ninguna variante aparece en la muestra: se prueba la
+        cadena completa, por si un registro posterior sí trae el campo.
+    Un registro al que le falta la clave detectada, o que trae más claves que
+    la muestra, se resuelve con la cadena completa de alias (fallback).
+    """
+
+    __slots__ = (
+        "width", "id", "imei", "placas", "economico", "marca", "modelo", "anio",
+        "color", "cliente", "km", "imagen", "descripcion", "lat", "lon",
+        "location", "nested_lat", "nested_lon", "speed", "timestamp",
+    )
+
+    FIELDS = (
+        ("id", ID_KEYS), ("imei", IMEI_KEYS), ("placas", PLACAS_KEYS),
+        ("economico", ECONOMICO_KEYS), ("marca", MARCA_KEYS), ("modelo", MODELO_KEYS),
+        ("anio", ANIO_KEYS), ("color", COLOR_KEYS), ("cliente", CLIENTE_KEYS),
+        ("km", KM_KEYS), ("imagen", IMAGEN_KEYS), ("descripcion", DESCRIPCION_KEYS),
+        ("lat", LAT_KEYS), ("lon", LON_KEYS), ("location", NESTED_LOCATION_KEYS),
+        ("speed", SPEED_KEYS), ("timestamp", TIMESTAMP_KEYS),
+    )
+
+    def __init__(self, width=None):
+        # Sin muestra: todos los campos usan la cadena completa
+        self.width = width
+        for name, _ in self.FIELDS:
+            setattr(self, name, None)
+        self.nested_lat = None
+        self.nested_lon = None
+
+    @classmethod
+    def from_records(cls, records: list) -> "SchemaPlan":
+        sample = [raw for raw in records[:SCHEMA_SAMPLE_RECORDS] if isinstance(raw, dict)]
+        if not sample:
+            return GENERIC_PLAN
+        keys = set()
+        for raw in sample:
+            keys.update(raw)
+        plan = cls(width=max(len(raw) for raw in sample))
+        for name, aliases in cls.FIELDS:
+            setattr(plan, name, _detect(keys, aliases))
+
+        nested_keys = set()
+        for raw in sample:
+            nested = _first(raw, NESTED_LOCATION_KEYS, None)
+            if isinstance(nested, dict):
+                nested_keys.update(nested)
+        if nested_keys:
+            plan.nested_lat = _detect(nested_keys, NESTED_LAT_KEYS)
+            plan.nested_lon = _detect(nested_keys, NESTED_LON_KEYS)
+        return plan
+
+
+def _detect(keys: set, aliases: tuple):
+    found = [alias for alias in aliases if alias in keys]
+    if not found:
+        return _ABSENT
+    return found[0] if len(found) == 1 else None
+
+
+GENERIC_PLAN = SchemaPlan()
+
+
+def _pick(raw: dict, key, aliases: tuple, default=""):
+    """Lee el campo con la clave del plan; cadena completa si no está."""
+    if key:
+        value = raw.get(key, _MISSING)
+        if value is not _MISSING:
+            return value or default
+    # Sin clave detectada (_ABSENT o mezcla): el registro puede traerla igual
+    return _first(raw, aliases, default)
+
+
+def _coordinate(value):
+    """float válido y distinto de 0, o None (0 = sin GPS en la API)."""
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    if number != number or number == 0:  # NaN o 0
+        return None
+    return number
+
+
+def _number(value, default=0.0):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return default
+
+
+def normalize_vehicle(raw: dict, index: int = 0, plan: SchemaPlan = GENERIC_PLAN) -> Vehicle:
+    """Convierte un dict crudo de Vehiculos / ultimaVehiculos en Vehicle."""
+    if plan.width is not None and len(raw) > plan.width:
+        plan = GENERIC_PLAN  # Registro con claves que la muestra no tenía
+
+    lat = _coordinate(_pick(raw, plan.lat, LAT_KEYS, None))
+    lon = _coordinate(_pick(raw, plan.lon, LON_KEYS, None))
+
+    # Si no hay coordenadas directas, buscar en objeto anidado
+    if lat is None or lon is None:
+        nested = _pick(raw, plan.location, NESTED_LOCATION_KEYS, None)
+        if isinstance(nested, dict):
+            if lat is None:
+                lat = _coordinate(_pick(nested, plan.nested_lat, NESTED_LAT_KEYS, None))
+            if lon is None:
+                lon = _coordinate(_pick(nested, plan.nested_lon, NESTED_LON_KEYS, None))
+
+    placas = _pick(raw, plan.placas, PLACAS_KEYS)
+    economico = _pick(raw, plan.economico, ECONOMICO_KEYS)
+    speed = _pick(raw, plan.speed, SPEED_KEYS, None)
+
+    return Vehicle(
+        id=_pick(raw, plan.id, ID_KEYS, None),
+        imei=_pick(raw, plan.imei, IMEI_KEYS),
+        placas=placas,
+        economico=economico,
+        marca=_pick(raw, plan.marca, MARCA_KEYS),
+        modelo=_pick(raw, plan.modelo, MODELO_KEYS),
+        anio=_pick(raw, plan.anio, ANIO_KEYS),
+        color=_pick(raw, plan.color, COLOR_KEYS),
+        cliente=_pick(raw, plan.cliente, CLIENTE_KEYS),
+        km=_number(_pick(raw, plan.km, KM_KEYS, 0)),
+        imagen=_pick(raw, plan.imagen, IMAGEN_KEYS),
+        name=placas or economico or _pick(raw, plan.descripcion, DESCRIPCION_KEYS) or f"Vehículo {index + 1}",
+        lat=lat,
+        lon=lon,
+        speed=_number(speed, None) if speed is not None else None,
+        timestamp=_pick(raw, plan.timestamp, TIMESTAMP_KEYS, None),
+    )
+
+
+def normalize_vehicles(raw_list: list, start: int = 0, plan: SchemaPlan = None) -> list:
+    """
+    Normaliza una lista de dicts crudos; `start` es el índice del primero.
+    Sin `plan`, se compila uno con los primeros registros de la lista.
+    """
+    if not isinstance(raw_list, list):
+        return []
+    if plan is None:
+        plan = SchemaPlan.from_records(raw_list)
+    return [
+        normalize_vehicle(raw, start + i, plan)
+        for i, raw in enumerate(raw_list)
+        if isinstance(raw, dict)
+    ]
+
+
+class StreamNormalizer:
+    """
+    Envuelve un on_batch de streaming: normaliza cada lote al llegar y
+    acumula los Vehicle para no volver a normalizar la lista completa.
+    """
+
+    def __init__(self, on_batch):
+        self.on_batch = on_batch
+        self.vehicles = []
+        self.plan = None  # Se compila con el primer lote y se reutiliza
+
+    def __call__(self, items: list):
+        if self.plan is None:
+            self.plan = SchemaPlan.from_records(items)
+        vehicles = normalize_vehicles(items, start=len(self.vehicles), plan=self.plan)
+        self.vehicles.extend(vehicles)
+        self.on_batch(vehicles)
+
+
+# Memo de la última normalización por payload. La caché de respuestas y el
+# GET condicional devuelven el mismo objeto `data`, así que normalizar por
+# identidad garantiza una sola normalización por descarga.
+_MEMO_SIZE = 4
+_memo = []  # [(data, vehicles)]; se guarda `data` para que su id no se reutilice
+_memo_lock = threading.Lock()
+
+
+def remember(data: list, vehicles: list):
+    with _memo_lock:
+        _memo[:] = [entry for entry in _memo if entry[0] is not data][-(_MEMO_SIZE - 1):]
+        _memo.append((data, vehicles))
+
+
+def vehicles_for(data: list) -> list:
+    """Vehicle de un payload, normalizado una sola vez por objeto `data`."""
+    with _memo_lock:
+        for cached_data, vehicles in _memo:
+            if cached_data is data:
+                return vehicles
+    vehicles = normalize_vehicles(data)
+    remember(data, vehicles)
+    return vehicles
+
+
+def with_vehicles(result: dict, streamed: StreamNormalizer = None) -> dict:
+    """
+    Agrega "vehicles" (lista de Vehicle) a un resultado exitoso de la API.
+    Si la lista llegó en streaming se reutiliza lo ya normalizado.
+    """
+    if not result.get("ok"):
+        return result
+    data = result.get("data")
+    if streamed is not None and isinstance(data, list) and len(streamed.vehicles) == len(data):
+        remember(data, streamed.vehicles)
+    result["vehicles"] = vehicles_for(data)
+    return result
+
+
+def normalizing_callbacks(on_revalidated=None, on_batch=None):
+    """
+    Adapta los callbacks de las vistas para que reciban Vehicle:
+    on_batch(vehicles) por lote y on_revalidated(result) con "vehicles".
+    Devuelve (on_revalidated, streamed) para pasarlos a cached_fetch_json.
+    """
+    streamed = StreamNormalizer(on_batch) if on_batch else None
+    revalidated = None
+    if on_revalidated:
+        def revalidated(result):
+            on_revalidated(with_vehicles(result))
+    return revalidated, streamed
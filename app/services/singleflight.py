@@ -0,0 +1,88 @@
+# app/services/singleflight.py
+
+import asyncio
+import threading
+
+
+class _Call:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Coalescencia de llamadas idénticas en vuelo ("single-flight").
+    Mientras una llamada con la misma clave está en curso, las demás esperan
+    su resultado en lugar de repetir la petición upstream.
+
+    Contadores:
+      calls     -> llamadas upstream realmente ejecutadas
+      coalesced -> llamadas que se ahorraron uniéndose a una en vuelo
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self.coalesced = 0
+        self._tasks = {}  # clave -> asyncio.Task
+        self._sync_calls = {}  # clave -> _Call
+        self._lock = threading.Lock()
+
+    async def do(self, key, factory):
+        """
+        Ejecuta `await factory()` una sola vez por clave en vuelo.
+        La llamada compartida corre en su propia tarea: cancelar a un
+        llamador no cancela la petición de los demás.
+        """
+        task = self._tasks.get(key)
+        if task is None:
+            task = asyncio.ensure_future(factory())
+            self._tasks[key] = task
+            task.add_done_callback(lambda t, k=key: self._forget_task(k, t))
+            with self._lock:
+                self.calls += 1
+        else:
+            with self._lock:
+                self.coalesced += 1
+        return await asyncio.shield(task)
+
+    def do_sync(self, key, fn):
+        """Versión para hilos: ejecuta fn() una sola vez por clave en vuelo."""
+        with self._lock:
+            call = self._sync_calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._sync_calls[key] = _Call()
+                self.calls += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+        except BaseException as ex:
+            # También KeyboardInterrupt / SystemExit: los seguidores no deben
+            # recibir None como si fuera un resultado
+            call.error = ex
+            raise
+        finally:
+            with self._lock:
+                del self._sync_calls[key]
+            call.done.set()
+        return call.result
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"calls": self.calls, "coalesced": self.coalesced}
+
+    def _forget_task(self, key, task):
+        if self._tasks.get(key) is task:
+            del self._tasks[key]
@@ -0,0 +1,128 @@
+# app/services/streaming.py
+
+import codecs
+import json
+
+_WHITESPACE = " \t\n\r"
+_DELIMITERS = _WHITESPACE + ",]"
+
+
+class JsonArrayStream:
+    """
+    Decodificador incremental de un arreglo JSON de nivel superior.
+    Se alimenta con trozos de bytes (feed) y devuelve los elementos completos
+    que ya se pueden decodificar, sin esperar al final de la descarga.
+
+    Si el documento no es un arreglo (p. ej. un objeto de error), se acumula
+    y se decodifica entero en close().
+    """
+
+    def __init__(self):
+        # raw_decode por elemento no comparte las claves entre registros como
+        # lo hace json.loads con el arreglo completo; se comparten a mano para
+        # no duplicar cada nombre de campo en memoria por cada vehículo
+        self._keys = {}
+        self._decoder = json.JSONDecoder(object_pairs_hook=self._shared_keys)
+        self._utf8 = codecs.getincrementaldecoder("utf-8")()
+        self._buffer = ""
+        self._pos = 0
+        self._started = False   # Ya se consumió el "["
+        self._finished = False  # Ya se consumió el "]"
+        self._after_value = False  # Tras un elemento: se espera "," o "]"
+        self._need_value = False   # Tras una ",": se espera otro elemento
+        self._whole = None      # Documento que no es arreglo: se acumula aquí
+
+    def feed(self, chunk: bytes) -> list:
+        """Agrega un trozo y devuelve los elementos que quedaron completos."""
+        text = self._utf8.decode(chunk)
+        if self._whole is not None:
+            self._whole.append(text)
+            return []
+        self._buffer = self._buffer[self._pos:] + text
+        self._pos = 0
+        return self._drain(final=False)
+
+    def close(self):
+        """
+        Termina el flujo. Devuelve la lista de elementos restantes, o el
+        documento completo si no era un arreglo. Lanza ValueError si el JSON
+        quedó incompleto o es inválido.
+        """
+        text = self._utf8.decode(b"", final=True)
+        if self._whole is not None:
+            self._whole.append(text)
+            return json.loads("".join(self._whole))
+        self._buffer = self._buffer[self._pos:] + text
+        self._pos = 0
+        items = self._drain(final=True)
+        if not self._started and not self._buffer.strip():
+            return []  # Cuerpo vacío
+        if not self._finished:
+            raise ValueError("JSON incompleto: falta el cierre del arreglo")
+        return items
+
+    def _shared_keys(self, pairs) -> dict:
+        keys = self._keys
+        return {keys.setdefault(key, key): value for key, value in pairs}
+
+    def _skip(self, chars: str):
+        buffer, pos = self._buffer, self._pos
+        while pos < len(buffer) and buffer[pos] in chars:
+            pos += 1
+        self._pos = pos
+
+    def _drain(self, final: bool) -> list:
+        items = []
+        buffer = self._buffer
+
+        if not self._started:
+            self._skip(_WHITESPACE)
+            if self._pos >= len(buffer):
+                return items
+            if buffer[self._pos] != "[":
+                # No es un arreglo: decodificar el documento completo al cerrar
+                self._whole = [buffer[self._pos:]]
+                self._buffer, self._pos = "", 0
+                return items
+            self._pos += 1
+            self._started = True
+
+        while not self._finished:
+            self._skip(_WHITESPACE)
+            if self._pos >= len(buffer):
+                break
+            char = buffer[self._pos]
+            if self._after_value:
+                # Tras un elemento solo puede venir "," o "]"
+                if char == ",":
+                    self._pos += 1
+                    self._after_value = False
+                    self._need_value = True
+                    continue
+                if char != "]":
+                    raise json.JSONDecodeError("Se esperaba ',' o ']'", buffer, self._pos)
+            if char == "]":
+                if self._need_value:
+                    raise json.JSONDecodeError("Coma sobrante antes de ']'", buffer, self._pos)
+                self._pos += 1
+                self._finished = True
+                break
+            if char == ",":
+                raise json.JSONDecodeError("Coma sobrante", buffer, self._pos)
+            try:
+                item, end = self._decoder.raw_decode(buffer, self._pos)
+            except json.JSONDecodeError:
+                if final:
+                    raise
+                break  # Elemento incompleto: esperar más datos
+            if not final and not isinstance(item, (dict, list)):
+                # Un número o literal solo está completo si le sigue un
+                # delimitador: "1." o "1.5e" decodifican su prefijo entero
+                if end >= len(buffer) or buffer[end] not in _DELIMITERS:
+                    break
+            items.append(item)
+            self._pos = end
+            self._after_value = True
+            self._need_value = False
+
+        return items
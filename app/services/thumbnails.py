@@ -0,0 +1,339 @@
+# app/services/thumbnails.py
+
+import asyncio
+import hashlib
+import io
+import json
+import math
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+import requests
+from requests.adapters import HTTPAdapter
+from app.config import (
+    API_TIMEOUT_SECONDS,
+    ASSETS_DIR,
+    THUMBNAIL_CACHE_MAX_BYTES,
+    THUMBNAIL_CONCURRENCY,
+    THUMBNAIL_DIR,
+    THUMBNAIL_JPEG_QUALITY,
+    THUMBNAIL_RETRY_SECONDS,
+    THUMBNAIL_SCALES,
+    THUMBNAIL_SIZE,
+    THUMBNAIL_TOUCH_INTERVAL_SECONDS,
+)
+from app.services.api import get_client
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Sin Pillow: las tarjetas usan la URL original
+    Image = ImageOps = None
+
+INDEX_FILE = "index.json"
+
+
+def make_thumbnails(content: bytes, size: tuple = THUMBNAIL_SIZE, scales=THUMBNAIL_SCALES,
+                    quality: int = THUMBNAIL_JPEG_QUALITY) -> dict:
+    """
+    {escala: bytes JPEG} de la foto recortada y reducida a size * escala
+    (mismo encuadre que ImageFit.COVER en la tarjeta).
+    """
+    width, height = size
+    largest = max(scales)
+    with Image.open(io.BytesIO(content)) as image:
+        # En JPEG decodifica directo a una resolución cercana (mucho más rápido)
+        image.draft("RGB", (width * largest, height * largest))
+        image = ImageOps.exif_transpose(image).convert("RGB")
+        result = {}
+        for scale in sorted(scales, reverse=True):
+            thumb = ImageOps.fit(image, (width * scale, height * scale), Image.LANCZOS)
+            out = io.BytesIO()
+            thumb.save(out, "JPEG", quality=quality, optimize=True, progressive=True)
+            result[scale] = out.getvalue()
+        return result
+
+
+class ThumbnailCache:
+    """
+    Miniaturas de las fotos de vehículos en disco, dentro de assets/ para
+    que Flet las sirva como archivos estáticos.
+
+    - Por URL se recuerda el hash del contenido descargado; los archivos se
+      nombran por ese hash ("<hash>@1x.jpg", "<hash>@2x.jpg"), así que dos
+      URLs con la misma foto comparten miniaturas y una foto nueva en la
+      misma URL genera otras.
+    - El total en disco no pasa de `max_bytes`: al guardar se borran las
+      fotos usadas hace más tiempo (LRU). El orden vive en memoria; para
+      que sobreviva al proceso se actualiza la fecha de modificación de los
+      archivos, a lo sumo una vez cada `touch_interval` segundos por foto.
+    - El índice URL -> hash se guarda en index.json.
+    - Una foto que no se pudo abrir (no es imagen válida) usa la URL
+      original el resto del proceso; tras un error de red o HTTP se vuelve
+      a intentar pasados `retry_after` segundos.
+    """
+
+    def __init__(
+        self,
+        directory: str = THUMBNAIL_DIR,
+        max_bytes: int = THUMBNAIL_CACHE_MAX_BYTES,
+        touch_interval: float = THUMBNAIL_TOUCH_INTERVAL_SECONDS,
+        retry_after: float = THUMBNAIL_RETRY_SECONDS,
+    ):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.touch_interval = touch_interval
+        self.retry_after = retry_after
+        self.prefix = "/" + os.path.relpath(directory, ASSETS_DIR).replace(os.sep, "/")
+        self.entries = OrderedDict()  # hash -> bytes de sus archivos, del menos al más reciente
+        self.by_url = {}              # url -> hash
+        self.failed = {}              # url -> epoch hasta el que se usa la URL original
+        self.touched = {}             # hash -> epoch de la última fecha escrita en disco
+        self.total = 0
+        self._lock = threading.Lock()
+        self._load()
+
+    def src(self, url: str, scale: int = 1):
+        """Ruta en assets de la miniatura ya generada, o None."""
+        with self._lock:
+            digest = self.by_url.get(url)
+            if digest is None or digest not in self.entries:
+                return None
+            self.entries.move_to_end(digest)
+            now = time.time()
+            stale = now - self.touched.get(digest, 0.0) >= self.touch_interval
+            if stale:
+                self.touched[digest] = now
+        if stale:
+            self._touch(digest)
+        return f"{self.prefix}/{digest}@{scale}x.jpg"
+
+    def mark_failed(self, url: str, permanent: bool = False):
+        """Usa la URL original para `url`: siempre, o hasta pasado retry_after."""
+        self.failed[url] = math.inf if permanent else time.time() + self.retry_after
+
+    def has_failed(self, url: str) -> bool:
+        until = self.failed.get(url)
+        if until is None:
+            return False
+        if until <= time.time():
+            self.failed.pop(url, None)  # Se reintenta la descarga
+            return False
+        return True
+
+    def store(self, url: str, content: bytes, scale: int = 1) -> str:
+        """Genera (si no existen) las miniaturas de `content` y devuelve su ruta."""
+        digest = hashlib.sha256(content).hexdigest()[:32]
+        with self._lock:
+            known = digest in self.entries
+            self.by_url[url] = digest
+        if not known:
+            thumbs = make_thumbnails(content)
+            os.makedirs(self.directory, exist_ok=True)
+            written = 0
+            for thumb_scale, data in thumbs.items():
+                self._write(f"{digest}@{thumb_scale}x.jpg", data)
+                written += len(data)
+            with self._lock:
+                if digest in self.entries:
+                    # Otra URL con la misma foto la guardó mientras tanto:
+                    # los archivos son los mismos y ya están contados
+                    evicted = []
+                else:
+                    self.entries[digest] = written
+                    self.total += written
+                    evicted = self._evict()
+            for old in evicted:
+                self._remove_files(old)
+        self._save_index()
+        return self.src(url, scale)
+
+    def _evict(self) -> list:
+        evicted = []
+        while self.total > self.max_bytes and len(self.entries) > 1:
+            digest, size = self.entries.popitem(last=False)
+            self.touched.pop(digest, None)
+            self.total -= size
+            evicted.append(digest)
+        if evicted:
+            gone = set(evicted)
+            self.by_url = {url: d for url, d in self.by_url.items() if d not in gone}
+        return evicted
+
+    # --- Disco ---
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def _write(self, name: str, data: bytes):
+        tmp_path = self._path(name + ".tmp")
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, self._path(name))
+
+    def _touch(self, digest: str):
+        for scale in THUMBNAIL_SCALES:
+            try:
+                os.utime(self._path(f"{digest}@{scale}x.jpg"))
+            except OSError:
+                pass
+
+    def _remove_files(self, digest: str):
+        for scale in THUMBNAIL_SCALES:
+            try:
+                os.remove(self._path(f"{digest}@{scale}x.jpg"))
+            except OSError:
+                pass
+
+    def _load(self):
+        """Reconstruye el LRU con los archivos existentes (por fecha de uso)."""
+        found = {}
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return
+        for name in names:
+            if not name.endswith(".jpg") or "@" not in name:
+                continue
+            try:
+                stat = os.stat(self._path(name))
+            except OSError:
+                continue
+            digest = name.split("@", 1)[0]
+            size, used = found.get(digest, (0, 0.0))
+            found[digest] = (size + stat.st_size, max(used, stat.st_mtime))
+        for digest, (size, used) in sorted(found.items(), key=lambda item: item[1][1]):
+            self.entries[digest] = size
+            self.touched[digest] = used
+            self.total += size
+        # El presupuesto pudo bajar desde la última ejecución
+        evicted = self._evict()
+        for digest in evicted:
+            self._remove_files(digest)
+        try:
+            with open(self._path(INDEX_FILE), "r", encoding="utf-8") as f:
+                urls = json.load(f)
+        except (OSError, ValueError):
+            urls = {}
+        self.by_url = {url: d for url, d in urls.items() if d in self.entries}
+        if evicted:
+            self._save_index()
+
+    def _save_index(self):
+        with self._lock:
+            data = dict(self.by_url)
+        try:
+            tmp_path = self._path(INDEX_FILE + ".tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self._path(INDEX_FILE))
+        except OSError:
+            pass  # El índice es solo una optimización
+
+
+_cache = None
+_cache_lock = threading.Lock()
+_pending = {}  # url -> tarea de descarga en curso
+_semaphore = None
+_semaphore_loop = None
+_session = None
+
+
+def thumbnails_enabled() -> bool:
+    """Pillow disponible y assets/ escribible (no en Pyodide)."""
+    return Image is not None and sys.platform != "emscripten"
+
+
+def get_thumbnail_cache() -> ThumbnailCache:
+    """Devuelve el ThumbnailCache compartido (se crea en el primer uso)."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ThumbnailCache()
+    return _cache
+
+
+def thumbnail_src(url: str, scale: int = 1):
+    """
+    Fuente para ft.Image: la miniatura si ya existe, la URL original si no
+    se pueden generar miniaturas (o esa foto falló), o None si hay que
+    pedirla con fetch_thumbnail_async().
+    """
+    if not url:
+        return None
+    if not thumbnails_enabled():
+        return url
+    cache = get_thumbnail_cache()
+    if cache.has_failed(url):
+        return url
+    return cache.src(url, scale)
+
+
+async def fetch_thumbnail_async(url: str, scale: int = 1) -> str:
+    """
+    Descarga la foto una sola vez (las llamadas simultáneas para la misma
+    URL esperan la misma descarga), genera sus miniaturas fuera del event
+    loop y devuelve la fuente para ft.Image.
+    """
+    src = thumbnail_src(url, scale)
+    if src is not None:
+        return src
+    task = _pending.get(url)
+    if task is None:
+        task = asyncio.ensure_future(_download(url))
+        _pending[url] = task
+        task.add_done_callback(lambda _: _pending.pop(url, None))
+    await asyncio.shield(task)
+    return thumbnail_src(url, scale)
+
+
+def _download_slots() -> asyncio.Semaphore:
+    # El semáforo queda ligado al loop que lo usa primero (igual que httpx)
+    global _semaphore, _semaphore_loop
+    loop = asyncio.get_running_loop()
+    if _semaphore is None or _semaphore_loop is not loop:
+        _semaphore = asyncio.Semaphore(THUMBNAIL_CONCURRENCY)
+        _semaphore_loop = loop
+    return _semaphore
+
+
+def _image_session() -> requests.Session:
+    """
+    Sesión keep-alive propia para las fotos: sin los headers de la API
+    (Authorization, Accept) y fuera de sus métricas de tamaño. La
+    verificación SSL es la misma del ApiClient (_fetch_and_store).
+    """
+    global _session
+    if _session is None:
+        with _cache_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=THUMBNAIL_CONCURRENCY, pool_maxsize=THUMBNAIL_CONCURRENCY)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _session = session
+    return _session
+
+
+def _fetch_and_store(cache: ThumbnailCache, url: str):
+    # verify por petición, como ApiClient: Session.verify lo pisan las variables de entorno
+    resp = _image_session().get(url, timeout=API_TIMEOUT_SECONDS, verify=get_client().verify)
+    if resp.status_code != 200 or not resp.content:
+        raise requests.HTTPError(f"HTTP {resp.status_code}", response=resp)
+    cache.store(url, resp.content)
+
+
+async def _download(url: str):
+    cache = get_thumbnail_cache()
+    async with _download_slots():
+        try:
+            # Descarga y miniaturas en un hilo: no bloquean el event loop
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, _fetch_and_store, cache, url)
+        except (Image.UnidentifiedImageError, Image.DecompressionBombError, ValueError):
+            cache.mark_failed(url, permanent=True)  # No es una imagen que se pueda reducir
+        except (requests.RequestException, OSError):
+            cache.mark_failed(url)  # Red, HTTP o disco: se reintenta más tarde
@@ -0,0 +1,293 @@
+# app/services/tokens.py
+
+import asyncio
+import base64
+import binascii
+import json
+import threading
+import time
+import weakref
+
+from app.config import TOKEN_REFRESH_MARGIN_SECONDS, TOKEN_REFRESH_RETRY_SECONDS
+from app.services.singleflight import SingleFlight
+
+# Claves en page.client_storage
+STORAGE_TOKEN_KEY = "token"
+STORAGE_USER_KEY = "userName"
+STORAGE_PASSWORD_KEY = "password"
+
+# Clave en page.session del TokenManager de esa sesión
+SESSION_TOKENS_KEY = "token_manager"
+
+# Token vigente -> TokenManager que lo tiene (débil: se libera con la sesión).
+# _retired guarda el último token reemplazado de cada sesión, para que un 401
+# tardío con él tome el token ya renovado de esa misma sesión.
+_managers = weakref.WeakValueDictionary()
+_retired = weakref.WeakValueDictionary()
+_listeners = []
+_registry_lock = threading.Lock()
+
+
+def jwt_expiry(token: str):
+    """Lee el claim "exp" (epoch) del JWT sin validar firma. None si no es un JWT."""
+    try:
+        payload = token.split(".")[1]
+        payload += "=" * (-len(payload) % 4)
+        claims = json.loads(base64.urlsafe_b64decode(payload))
+        exp = claims.get("exp")
+        return float(exp) if exp else None
+    except (AttributeError, IndexError, ValueError, TypeError, binascii.Error):
+        return None
+
+
+class TokenManager:
+    """
+    Dueño del token de una sesión (una página de Flet) en memoria. Cada
+    página tiene el suyo (session_tokens(page)): en modo web varias
+    sesiones comparten el proceso y no deben verse los tokens ni las
+    credenciales entre sí.
+
+    - Decodifica el "exp" del JWT localmente y re-autentica con las
+      credenciales guardadas `refresh_margin` segundos antes de que venza,
+      sin peticiones extra para validar el token.
+    - Ante un 401, los clientes HTTP llaman a refresh_after(token) y
+      reintentan una sola vez con el token nuevo.
+    - Los re-logins concurrentes se coalescen en uno (SingleFlight) y, si
+      fallan, no se reintentan hasta pasados `retry_after` segundos.
+    - Con attach_storage(page.client_storage) la sesión se restaura al
+      reiniciar la app y los tokens nuevos se persisten.
+    - on_token_replaced(callback) avisa con el token viejo cada vez que
+      cualquier sesión lo reemplaza o lo borra, para que las cachés por
+      token lo olviden.
+    """
+
+    def __init__(
+        self,
+        refresh_margin: float = TOKEN_REFRESH_MARGIN_SECONDS,
+        retry_after: float = TOKEN_REFRESH_RETRY_SECONDS,
+    ):
+        self.refresh_margin = refresh_margin
+        self.retry_after = retry_after
+        self.token = None
+        self.expires_at = None
+        self.refreshes = 0
+        self._user_name = None
+        self._password = None
+        self._storage = None
+        self._restored = False
+        self._failed_at = None
+        self._flight = SingleFlight()
+        self._retired_token = None
+        self._lock = threading.Lock()
+
+    # ------------------------------------------------------------------
+    # Sesión
+    # ------------------------------------------------------------------
+    def attach_storage(self, storage):
+        """Usa un almacenamiento con get/set (page.client_storage) para persistir la sesión."""
+        self._storage = storage
+        self._restored = False
+
+    def set_session(self, user_name: str, password: str, token: str):
+        """Guarda en memoria la sesión recién iniciada (sin persistir)."""
+        with self._lock:
+            self._user_name = user_name
+            self._password = password
+            replaced = self._set_token(token)
+            self._restored = True
+        self._notify(replaced)
+
+    async def start_session_async(self, user_name: str, password: str, token: str):
+        """Inicia sesión en memoria y la persiste en el storage sin bloquear la UI."""
+        self.set_session(user_name, password, token)
+        if self._storage is not None:
+            # Guardamos credenciales temporalmente (hasta definir refresh token)
+            await asyncio.to_thread(self._storage.set, STORAGE_USER_KEY, user_name)
+            await asyncio.to_thread(self._storage.set, STORAGE_PASSWORD_KEY, password)
+            if token:
+                await asyncio.to_thread(self._storage.set, STORAGE_TOKEN_KEY, token)
+
+    def clear(self):
+        with self._lock:
+            replaced = self._set_token(None)
+            self._user_name = None
+            self._password = None
+            self._failed_at = None
+        self._notify(replaced)
+
+    # ------------------------------------------------------------------
+    # Consulta
+    # ------------------------------------------------------------------
+    def needs_refresh(self) -> bool:
+        if not self.token:
+            return True
+        if self.expires_at is None:
+            return False  # Token opaco: solo se renueva ante un 401
+        return time.time() >= self.expires_at - self.refresh_margin
+
+    def is_expired(self) -> bool:
+        return self.expires_at is not None and time.time() >= self.expires_at
+
+    def get_token(self):
+        """Token vigente; re-autentica antes si está por vencer."""
+        if not self._restored:
+            self._restore()
+        if self.needs_refresh() and self._can_login():
+            self._flight.do_sync("refresh", self._login)
+        return self._usable_token()
+
+    async def get_token_async(self):
+        """Versión async de get_token()."""
+        if not self._restored:
+            await asyncio.to_thread(self._restore)
+        if self.needs_refresh() and self._can_login():
+            await self._flight.do("refresh", self._login_async)
+        return self._usable_token()
+
+    def refresh_after(self, rejected_token: str):
+        """
+        Tras un 401 con `rejected_token`: si otra petición ya renovó el token
+        se devuelve ese sin volver a autenticar; si no, se re-autentica.
+        Devuelve None si no hay token nuevo con el que reintentar.
+        """
+        if self.token and self.token != rejected_token:
+            return self.token
+        if not self._can_login():
+            return None
+        self._flight.do_sync("refresh", self._login)
+        return self.token if self.token != rejected_token else None
+
+    async def refresh_after_async(self, rejected_token: str):
+        """Versión async de refresh_after()."""
+        if self.token and self.token != rejected_token:
+            return self.token
+        if not self._can_login():
+            return None
+        await self._flight.do("refresh", self._login_async)
+        return self.token if self.token != rejected_token else None
+
+    # ------------------------------------------------------------------
+    # Internos
+    # ------------------------------------------------------------------
+    def _usable_token(self):
+        if self.token and not self.is_expired():
+            return self.token
+        return None
+
+    def _can_login(self) -> bool:
+        if not (self._user_name and self._password):
+            return False
+        if self._failed_at is not None and time.monotonic() - self._failed_at < self.retry_after:
+            return False
+        return True
+
+    def _set_token(self, token: str):
+        """Cambia el token; devuelve el anterior si fue reemplazado (o None)."""
+        previous = self.token
+        self.token = token or None
+        self.expires_at = jwt_expiry(token) if token else None
+        with _registry_lock:
+            if previous and previous != self.token:
+                if _managers.get(previous) is self:
+                    del _managers[previous]
+                if self._retired_token and _retired.get(self._retired_token) is self:
+                    del _retired[self._retired_token]
+                _retired[previous] = self
+                self._retired_token = previous
+            if self.token:
+                _managers[self.token] = self
+        return previous if previous and previous != self.token else None
+
+    def _notify(self, replaced):
+        if not replaced:
+            return
+        for callback in list(_listeners):
+            callback(replaced)
+
+    def _restore(self):
+        """Carga la sesión guardada en el storage (bloqueante)."""
+        self._restored = True
+        if self._storage is None:
+            return
+        try:
+            token = self._storage.get(STORAGE_TOKEN_KEY)
+            user_name = self._storage.get(STORAGE_USER_KEY)
+            password = self._storage.get(STORAGE_PASSWORD_KEY)
+        except Exception:
+            return  # Storage no disponible (página cerrada)
+        with self._lock:
+            if self.token is None:
+                self._set_token(token)
+            self._user_name = self._user_name or user_name
+            self._password = self._password or password
+
+    def _login(self):
+        # Import diferido: auth -> api -> tokens
+        from app.services.auth import login
+        token = self._apply_login(login(self._user_name, self._password))
+        if token:
+            self._persist_token(token)
+
+    async def _login_async(self):
+        from app.services.auth import login_async
+        token = self._apply_login(await login_async(self._user_name, self._password))
+        if token:
+            # client_storage.set bloquea esperando al cliente: fuera del loop
+            await asyncio.to_thread(self._persist_token, token)
+
+    def _apply_login(self, result: dict):
+        token = result.get("token") if result.get("ok") else None
+        if not token:
+            self._failed_at = time.monotonic()
+            return None
+        with self._lock:
+            replaced = self._set_token(token)
+            self._failed_at = None
+            self.refreshes += 1
+        self._notify(replaced)
+        return token
+
+    def _persist_token(self, token: str):
+        if self._storage is None:
+            return
+        try:
+            self._storage.set(STORAGE_TOKEN_KEY, token)
+        except Exception:
+            pass
+
+
+def session_tokens(page) -> TokenManager:
+    """
+    TokenManager de la sesión de `page` (se crea en el primer uso, guardado
+    en page.session y persistido en su client_storage).
+    """
+    manager = page.session.get(SESSION_TOKENS_KEY)
+    if manager is None:
+        manager = TokenManager()
+        manager.attach_storage(page.client_storage)
+        page.session.set(SESSION_TOKENS_KEY, manager)
+    return manager
+
+
+def manager_for(token: str):
+    """TokenManager de la sesión que tiene `token` vigente, o None."""
+    if not token:
+        return None
+    with _registry_lock:
+        return _managers.get(token) or _retired.get(token)
+
+
+def is_current(token: str) -> bool:
+    """
+    False si `token` ya no lo tiene ninguna sesión (se reemplazó o se cerró
+    la sesión). Sin sesiones abiertas, o sin token, todo vale.
+    """
+    if not token:
+        return True
+    with _registry_lock:
+        return not _managers or token in _managers
+
+
+def on_token_replaced(callback):
+    """callback(token_viejo) cada vez que una sesión cambia su token o la cierra."""
+    _listeners.append(callback)
@@ -1,64 +1,33 @@
 # app/services/vehicles.py
 
-import requests
-from app.config import VEHICLES_URL, API_TIMEOUT_SECONDS, USE_HTTPS, DISABLE_SSL_VERIFY
+from app.config import VEHICLES_URL
+from app.services.cache import cached_fetch_json, cached_fetch_json_async
+from app.services.normalize import normalizing_callbacks, with_vehicles
 
-# Desactivar advertencias SSL para Pyodide (web)
-if DISABLE_SSL_VERIFY:
-    try:
-        import urllib3
-        urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
-    except ImportError:
-        pass  # urllib3 no disponible (no es Pyodide)
-
-# Si HTTPS no está disponible, usar HTTP como fallback (solo desarrollo)
-if not USE_HTTPS:
-    VEHICLES_URL = VEHICLES_URL.replace("https://", "http://")
-
-def get_vehicles(token: str):
+def get_vehicles(token: str, on_revalidated=None, on_batch=None):
     """
     GET Vehiculos con Bearer Token.
+    Usa GET condicional (ETag / Last-Modified): si el catálogo no cambió,
+    el servidor responde 304 y se devuelven los datos ya decodificados.
+    El resultado se guarda en caché (TTL "vehicles"); vencido el TTL se
+    devuelve el dato viejo y on_revalidated(result) recibe el nuevo.
+    Con on_batch, si no hay caché la lista se decodifica en streaming y
+    on_batch(vehicles) recibe los registros según van llegando.
+    "vehicles" es la lista normalizada (Vehicle), calculada una vez por descarga.
     Devuelve:
-      { "ok": True, "data": <json> } en éxito
+      { "ok": True, "data": <json>, "vehicles": [Vehicle], "from_cache": bool } en éxito
       { "ok": False, "error": "mensaje" } en error
     """
-    headers = {
-        "Authorization": f"Bearer {token}",
-        "Content-Type": "application/json"
-    }
-
-    try:
-        resp = requests.get(
-            VEHICLES_URL, 
-            headers=headers, 
-            timeout=API_TIMEOUT_SECONDS,
-            verify=not DISABLE_SSL_VERIFY  # Desactivar verificación SSL en Pyodide
-        )
-    except requests.Timeout:
-        return {"ok": False, "error": "Tiempo de espera agotado. El servidor tardó demasiado en responder."}
-    except requests.RequestException as ex:
-        return {"ok": False, "error": f"Sin conexión ({ex})"}
-
-    # Éxito típico .NET: 200/201
-    if resp.status_code in (200, 201):
-        try:
-            data = resp.json() if resp.content else []
-            return {"ok": True, "data": data}
-        except Exception as ex:
-            return {"ok": False, "error": f"Error al procesar respuesta: {ex}"}
-
-    # Error con cuerpo JSON
-    try:
-        err = resp.json()
-        msg = (
-            err.get("message")
-            or err.get("Message")
-            or err.get("error")
-            or err.get("Error")
-            or str(err)
-        )
-    except Exception:
-        msg = f"HTTP {resp.status_code}"
-
-    return {"ok": False, "error": msg}
-
+    revalidated, streamed = normalizing_callbacks(on_revalidated, on_batch)
+    result = cached_fetch_json(
+        "vehicles", VEHICLES_URL, token, empty=[], on_revalidated=revalidated, on_batch=streamed
+    )
+    return with_vehicles(result, streamed)
+
+async def get_vehicles_async(token: str, on_revalidated=None, on_batch=None):
+    """Versión async de get_vehicles() que corre en el event loop de Flet."""
+    revalidated, streamed = normalizing_callbacks(on_revalidated, on_batch)
+    result = await cached_fetch_json_async(
+        "vehicles", VEHICLES_URL, token, empty=[], on_revalidated=revalidated, on_batch=streamed
+    )
+    return with_vehicles(result, streamed)
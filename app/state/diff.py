@@ -0,0 +1,117 @@
+# app/state/diff.py
+
+from operator import attrgetter
+
+from app.config import DIFF_MOVE_THRESHOLD_METERS
+from app.geo.geometry import haversine_many
+from app.state import snapshot as snapshot_module
+from app.state.snapshot import FleetSnapshot
+
+# Campos que se ven en la tarjeta del vehículo; la posición va aparte (moved)
+CARD_FIELDS = (
+    "placas", "economico", "marca", "modelo", "anio", "color",
+    "cliente", "km", "imagen", "imei", "name",
+)
+
+
+class SnapshotDiff:
+    """
+    Diferencias entre dos fotos consecutivas de la flota, por clave de
+    vehículo (id, o IMEI si no hay id):
+      added    claves nuevas
+      removed  claves que ya no están
+      moved    se movieron más de `threshold` metros, o ganaron/perdieron GPS
+      changed  cambió algún campo de la tarjeta (CARD_FIELDS)
+    by_key mapea cada clave de la foto nueva a su Vehicle.
+    """
+
+    __slots__ = ("added", "removed", "moved", "changed", "by_key")
+
+    def __init__(self, added=(), removed=(), moved=(), changed=(), by_key=None):
+        self.added = set(added)
+        self.removed = set(removed)
+        self.moved = set(moved)
+        self.changed = set(changed)
+        self.by_key = by_key or {}
+
+    @property
+    def empty(self) -> bool:
+        return not (self.added or self.removed or self.moved or self.changed)
+
+    @property
+    def positions_changed(self) -> bool:
+        """Cambió algo que se ve en el mapa (altas, bajas o movimientos)."""
+        return bool(self.added or self.removed or self.moved)
+
+    def __repr__(self):
+        return (
+            f"SnapshotDiff(added={len(self.added)}, removed={len(self.removed)}, "
+            f"moved={len(self.moved)}, changed={len(self.changed)})"
+        )
+
+
+def vehicle_keys(snapshot: FleetSnapshot) -> list:
+    """
+    Clave única de cada fila. Las filas sin id ni IMEI, o con una clave
+    repetida, se identifican por su posición en la lista.
+    """
+    keys = []
+    seen = set()
+    for i, key in enumerate(snapshot.ids):
+        if key in (None, "") or key in seen:
+            key = ("#", i)
+        seen.add(key)
+        keys.append(key)
+    return keys
+
+
+def _distances(lat1, lon1, lat2, lon2) -> list:
+    """Distancias haversine en metros entre pares de puntos (listas paralelas)."""
+    return haversine_many(lat1, lon1, lat2, lon2, np=snapshot_module.np)
+
+
+_card_values = attrgetter(*CARD_FIELDS)
+
+
+def diff_snapshots(
+    old: FleetSnapshot,
+    new: FleetSnapshot,
+    threshold: float = DIFF_MOVE_THRESHOLD_METERS,
+) -> SnapshotDiff:
+    """Compara dos fotos de la flota. Sin foto anterior, todo es "added"."""
+    new_keys = vehicle_keys(new)
+    by_key = dict(zip(new_keys, new.vehicles))
+    if old is None:
+        return SnapshotDiff(added=new_keys, by_key=by_key)
+
+    old_index = {key: i for i, key in enumerate(vehicle_keys(old))}
+    added, moved, changed = [], [], []
+    pairs_old, pairs_new, pair_keys = [], [], []
+
+    for j, key in enumerate(new_keys):
+        i = old_index.pop(key, None)
+        if i is None:
+            added.append(key)
+            continue
+        old_vehicle, new_vehicle = old.vehicles[i], new.vehicles[j]
+        if old_vehicle is new_vehicle:
+            continue
+        if _card_values(old_vehicle) != _card_values(new_vehicle):
+            changed.append(key)
+        old_valid, new_valid = old.valid[i], new.valid[j]
+        if old_valid != new_valid:
+            moved.append(key)  # Ganó o perdió GPS
+        elif new_valid and (old.lat[i] != new.lat[j] or old.lon[i] != new.lon[j]):
+            pairs_old.append(i)
+            pairs_new.append(j)
+            pair_keys.append(key)
+
+    # Distancias de todos los que cambiaron de coordenadas, de una vez
+    if pair_keys:
+        distances = _distances(
+            [old.lat[i] for i in pairs_old], [old.lon[i] for i in pairs_old],
+            [new.lat[j] for j in pairs_new], [new.lon[j] for j in pairs_new],
+        )
+        moved.extend(key for key, meters in zip(pair_keys, distances) if meters > threshold)
+
+    return SnapshotDiff(added, old_index.keys(), moved, changed, by_key)
@@ -0,0 +1,237 @@
+# app/state/fleet_index.py
+
+import asyncio
+import threading
+from bisect import bisect_left, bisect_right
+
+from app.config import FLEET_INDEX_CHUNK_SIZE, FLEET_INDEX_REBUILD_RATIO
+from app.state.diff import diff_snapshots, vehicle_keys
+from app.state.snapshot import FleetSnapshot
+
+
+def _text(value) -> str:
+    """Clave de búsqueda: sin espacios a los lados y en mayúsculas."""
+    return str(value).strip().upper() if value not in (None, "") else ""
+
+
+def _plate(value) -> str:
+    """Placas sin guiones ni espacios: "abc-123" y "ABC 123" son la misma."""
+    return _text(value).replace("-", "").replace(" ", "")
+
+
+class PrefixIndex:
+    """Lista ordenada de (texto, clave) para búsquedas por prefijo con bisect."""
+
+    __slots__ = ("texts", "keys")
+
+    def __init__(self, pairs=()):
+        pairs = sorted((p for p in pairs if p[0]), key=lambda p: p[0])
+        self.texts = [text for text, _ in pairs]
+        self.keys = [key for _, key in pairs]
+
+    def add(self, text: str, key):
+        if not text:
+            return
+        pos = bisect_right(self.texts, text)
+        self.texts.insert(pos, text)
+        self.keys.insert(pos, key)
+
+    def remove(self, text: str, key):
+        if not text:
+            return
+        pos = bisect_left(self.texts, text)
+        end = bisect_right(self.texts, text, pos)
+        for i in range(pos, end):
+            if self.keys[i] == key:
+                del self.texts[i]
+                del self.keys[i]
+                return
+
+    def search(self, prefix: str, limit: int = None) -> list:
+        """Claves cuyo texto empieza con prefix, en orden alfabético."""
+        if not prefix:
+            return []
+        start = bisect_left(self.texts, prefix)
+        # Todo texto con ese prefijo es < prefix + el mayor carácter posible
+        end = bisect_left(self.texts, prefix + "\U0010ffff", start)
+        if limit is not None:
+            end = min(end, start + limit)
+        return self.keys[start:end]
+
+
+class FleetIndex:
+    """
+    Índices en memoria sobre el catálogo de la flota:
+      - O(1) por clave de vehículo (la de diff.vehicle_keys), id, IMEI,
+        placas y número económico;
+      - prefijo (ordenado) para placas y cliente.
+    refresh() aplica solo las diferencias con la foto anterior; si cambió
+    más de FLEET_INDEX_REBUILD_RATIO de la flota se reconstruye completo.
+    refresh_async() hace la reconstrucción por partes sin bloquear la
+    interfaz.
+    """
+
+    def __init__(self):
+        self.snapshot = None
+        self.vehicles = {}      # clave -> Vehicle
+        self.by_id = {}
+        self.by_imei = {}
+        self.by_placas = {}
+        self.by_economico = {}
+        self.placas_prefix = PrefixIndex()
+        self.cliente_prefix = PrefixIndex()
+        self.generation = 0     # Cambia con cada refresco (descarta reconstrucciones viejas)
+        self._lock = threading.Lock()
+
+    def refresh(self, snapshot: FleetSnapshot, diff=None):
+        """Pone el índice al día con la foto nueva (diff opcional ya calculado)."""
+        with self._lock:
+            if snapshot is self.snapshot:
+                return
+            self.generation += 1
+            diff = self._incremental(snapshot, diff)
+            if diff is None:
+                self._rebuild(snapshot)
+            else:
+                self._apply(snapshot, diff)
+
+    async def refresh_async(self, snapshot: FleetSnapshot, diff=None,
+                            chunk_size: int = FLEET_INDEX_CHUNK_SIZE) -> bool:
+        """
+        Como refresh(), pero si hay que reconstruir cede el event loop cada
+        `chunk_size` vehículos; mientras tanto las consultas responden con
+        el índice anterior. Si otro refresco llega antes de terminar, esta
+        reconstrucción se descarta. Devuelve True si el índice quedó en la
+        foto pedida.
+        """
+        with self._lock:
+            if snapshot is self.snapshot:
+                return True
+            self.generation += 1
+            generation = self.generation
+            diff = self._incremental(snapshot, diff)
+            if diff is not None:
+                self._apply(snapshot, diff)
+                return True
+        built = FleetIndex()
+        placas, clientes = [], []
+        rows = list(zip(vehicle_keys(snapshot), snapshot.vehicles))
+        for start in range(0, len(rows), chunk_size):
+            await asyncio.sleep(0)
+            built._index_rows(rows[start:start + chunk_size], placas, clientes)
+        # Ordenar cada índice por prefijo es una sola llamada a sorted()
+        await asyncio.sleep(0)
+        placas_prefix = PrefixIndex(placas)
+        await asyncio.sleep(0)
+        cliente_prefix = PrefixIndex(clientes)
+        with self._lock:
+            if generation != self.generation:
+                return False
+            self.vehicles = built.vehicles
+            self.by_id, self.by_imei = built.by_id, built.by_imei
+            self.by_placas, self.by_economico = built.by_placas, built.by_economico
+            self.placas_prefix, self.cliente_prefix = placas_prefix, cliente_prefix
+            self.snapshot = snapshot
+        return True
+
+    def _incremental(self, snapshot: FleetSnapshot, diff):
+        """Diferencias a aplicar, o None si conviene reconstruir."""
+        if self.snapshot is None or not self.vehicles:
+            return None
+        if diff is None:
+            diff = diff_snapshots(self.snapshot, snapshot)
+        touched = len(diff.added) + len(diff.removed) + len(diff.changed)
+        return None if touched > len(snapshot) * FLEET_INDEX_REBUILD_RATIO else diff
+
+    def _apply(self, snapshot: FleetSnapshot, diff):
+        for key in diff.removed | diff.changed:
+            self._remove(key)
+        # Los movidos y sin cambios solo apuntan al Vehicle nuevo
+        self.vehicles.update(diff.by_key)
+        for key in diff.added | diff.changed:
+            self._add(key, diff.by_key[key])
+        self.snapshot = snapshot
+
+    def _rebuild(self, snapshot: FleetSnapshot):
+        self.vehicles = {}
+        self.by_id, self.by_imei, self.by_placas, self.by_economico = {}, {}, {}, {}
+        placas, clientes = [], []
+        self._index_rows(zip(vehicle_keys(snapshot), snapshot.vehicles), placas, clientes)
+        self.placas_prefix = PrefixIndex(placas)
+        self.cliente_prefix = PrefixIndex(clientes)
+        self.snapshot = snapshot
+
+    def _index_rows(self, rows, placas: list, clientes: list):
+        # Índices exactos; los pares (texto, clave) de los prefijos se juntan
+        # en placas/clientes para ordenarlos una sola vez al final
+        for key, vehicle in rows:
+            self.vehicles[key] = vehicle
+            self._add_exact(key, vehicle)
+            placas.append((_plate(vehicle.placas), key))
+            clientes.append((_text(vehicle.cliente), key))
+
+    def _add_exact(self, key, vehicle):
+        if vehicle.id is not None:
+            self.by_id.setdefault(vehicle.id, key)
+        for index, value in (
+            (self.by_imei, _text(vehicle.imei)),
+            (self.by_placas, _plate(vehicle.placas)),
+            (self.by_economico, _text(vehicle.economico)),
+        ):
+            if value:
+                index.setdefault(value, key)
+
+    def _add(self, key, vehicle):
+        self.vehicles[key] = vehicle
+        self._add_exact(key, vehicle)
+        self.placas_prefix.add(_plate(vehicle.placas), key)
+        self.cliente_prefix.add(_text(vehicle.cliente), key)
+
+    def _remove(self, key):
+        vehicle = self.vehicles.pop(key, None)
+        if vehicle is None:
+            return
+        if self.by_id.get(vehicle.id) == key:
+            del self.by_id[vehicle.id]
+        for index, value in (
+            (self.by_imei, _text(vehicle.imei)),
+            (self.by_placas, _plate(vehicle.placas)),
+            (self.by_economico, _text(vehicle.economico)),
+        ):
+            if index.get(value) == key:
+                del index[value]
+        self.placas_prefix.remove(_plate(vehicle.placas), key)
+        self.cliente_prefix.remove(_text(vehicle.cliente), key)
+
+    # --- Consultas ---
+
+    def get(self, key):
+        """Vehicle por clave de vehículo, o None."""
+        return self.vehicles.get(key)
+
+    def find_by_id(self, vehicle_id):
+        return self.vehicles.get(self.by_id.get(vehicle_id))
+
+    def find_by_imei(self, imei):
+        return self.vehicles.get(self.by_imei.get(_text(imei)))
+
+    def find_by_placas(self, placas):
+        return self.vehicles.get(self.by_placas.get(_plate(placas)))
+
+    def find_by_economico(self, economico):
+        return self.vehicles.get(self.by_economico.get(_text(economico)))
+
+    def search(self, query: str, limit: int = None) -> list:
+        """
+        Claves de los vehículos cuyas placas o cliente empiezan con query,
+        primero las coincidencias por placas y sin repetidos.
+        """
+        by_placas = self.placas_prefix.search(_plate(query), limit)
+        by_cliente = self.cliente_prefix.search(_text(query), limit)
+        seen = set(by_placas)
+        keys = by_placas + [key for key in by_cliente if key not in seen]
+        return keys[:limit] if limit is not None else keys
+
+
+# Índice del catálogo de vehículos, compartido por las vistas
+fleet_index = FleetIndex()
@@ -0,0 +1,228 @@
+# app/state/history.py
+
+import math
+import re
+import sys
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+
+from app.config import API_UTC_OFFSET_HOURS, HISTORY_CAPACITY, HISTORY_IDLE_SECONDS, HISTORY_MAX_BYTES
+from app.state.diff import vehicle_keys
+from app.state.snapshot import FleetSnapshot
+
+
+_API_TZ = timezone(timedelta(hours=API_UTC_OFFSET_HOURS))
+_FRACTION = re.compile(r"\.(\d+)")
+_COMPACT_OFFSET = re.compile(r"([+-]\d{2})(\d{2})$")
+
+
+def _iso(text: str) -> str:
+    """
+    Ajusta un texto ISO 8601 a lo que acepta datetime.fromisoformat en
+    Python 3.10: "Z" -> "+00:00", fracción de segundo a 6 dígitos (.NET
+    manda 7) y offset "+hhmm" -> "+hh:mm".
+    """
+    if text[-1:] in ("Z", "z"):
+        text = text[:-1] + "+00:00"
+    text = _FRACTION.sub(lambda m: "." + (m.group(1) + "000000")[:6], text, count=1)
+    if "T" in text or " " in text:
+        text = _COMPACT_OFFSET.sub(r"\1:\2", text)
+    return text
+
+
+def _epoch(value):
+    """
+    Segundos desde epoch de la fecha del reporte: número (segundos o
+    milisegundos) o texto ISO 8601. Un texto sin zona está en la hora de la
+    API (API_UTC_OFFSET_HOURS), no en la del equipo. None si no se puede leer.
+    """
+    if value is None or value == "":
+        return None
+    if isinstance(value, (int, float)):
+        return value / 1000 if value > 1e11 else float(value)
+    try:
+        parsed = datetime.fromisoformat(_iso(str(value).strip()))
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=_API_TZ)
+    return parsed.timestamp()
+
+
+class TrackBuffer:
+    """
+    Historial de un vehículo: buffer circular de capacidad fija sobre
+    arreglos de tiempo, lat, lon y velocidad (NaN si no hay). Agregar una
+    muestra es O(1); lleno, la nueva reemplaza a la más antigua.
+    """
+
+    __slots__ = ("capacity", "t", "lat", "lon", "speed", "start", "size", "updated_at")
+
+    def __init__(self, capacity: int = HISTORY_CAPACITY):
+        self.capacity = capacity
+        self.t = array("d", bytes(8 * capacity))
+        self.lat = array("d", bytes(8 * capacity))
+        self.lon = array("d", bytes(8 * capacity))
+        self.speed = array("d", bytes(8 * capacity))
+        self.start = 0
+        self.size = 0
+        self.updated_at = 0.0  # Hora local de la última muestra nueva
+
+    def __len__(self):
+        return self.size
+
+    def clear(self):
+        """Vacía el buffer sin liberar los arreglos (para reutilizarlo)."""
+        self.start = 0
+        self.size = 0
+        self.updated_at = 0.0
+
+    def append(self, t: float, lat: float, lon: float, speed: float = None):
+        if self.size < self.capacity:
+            i = (self.start + self.size) % self.capacity
+            self.size += 1
+        else:
+            i = self.start
+            self.start = (self.start + 1) % self.capacity
+        self.t[i] = t
+        self.lat[i] = lat
+        self.lon[i] = lon
+        self.speed[i] = math.nan if speed is None else speed
+
+    def last(self):
+        """(t, lat, lon, speed) más reciente, o None."""
+        if not self.size:
+            return None
+        i = (self.start + self.size - 1) % self.capacity
+        return self.t[i], self.lat[i], self.lon[i], self.speed[i]
+
+    def samples(self, since: float = None) -> list:
+        """[(t, lat, lon, speed)] de la más antigua a la más reciente."""
+        rows = []
+        for n in range(self.size):
+            i = (self.start + n) % self.capacity
+            if since is None or self.t[i] >= since:
+                rows.append((self.t[i], self.lat[i], self.lon[i], self.speed[i]))
+        return rows
+
+
+class PositionHistory:
+    """
+    Historial de posiciones de la flota, alimentado con cada foto de
+    get_last_vehicles_positions. Un TrackBuffer por vehículo (por la clave
+    de diff.vehicle_keys); una muestra solo se agrega si cambió la fecha del
+    reporte o la posición, así que un dato repetido (caché, 304) no ocupa
+    lugar.
+
+    La memoria total no pasa de `budget_bytes`: los buffers son de tamaño
+    fijo, así que eso equivale a un número máximo de vehículos. Se descartan
+    primero los que llevan más de `idle_seconds` sin una muestra nueva y,
+    si aún falta lugar, los que se actualizaron hace más tiempo (LRU).
+    """
+
+    def __init__(
+        self,
+        capacity: int = HISTORY_CAPACITY,
+        budget_bytes: int = HISTORY_MAX_BYTES,
+        idle_seconds: float = HISTORY_IDLE_SECONDS,
+    ):
+        self.capacity = capacity
+        self.budget_bytes = budget_bytes
+        self.idle_seconds = idle_seconds
+        self.tracks = OrderedDict()  # clave -> TrackBuffer, del menos al más reciente
+        self.snapshot = None
+        self.track_bytes = _track_bytes(capacity)
+        self.max_tracks = max(1, budget_bytes // self.track_bytes)
+        self.evicted = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.tracks)
+
+    @property
+    def memory_bytes(self) -> int:
+        return len(self.tracks) * self.track_bytes
+
+    def record(self, snapshot: FleetSnapshot, now: float = None) -> int:
+        """Agrega las posiciones de una foto. Devuelve cuántas muestras nuevas hubo."""
+        now = time.time() if now is None else now
+        added = 0
+        with self._lock:
+            if snapshot is self.snapshot:
+                return 0
+            self.snapshot = snapshot
+            self._evict_idle(now)
+            for key, vehicle in zip(vehicle_keys(snapshot), snapshot.vehicles):
+                if not vehicle.has_position:
+                    continue
+                t = _epoch(vehicle.timestamp)
+                track = self.tracks.get(key)
+                if track is None:
+                    track = self._new_track(key)
+                else:
+                    last = track.last()
+                    if last is not None and last[1] == vehicle.lat and last[2] == vehicle.lon:
+                        if t is None or last[0] == t:
+                            # Mismo reporte (o sin fecha legible y sin moverse)
+                            continue
+                    self.tracks.move_to_end(key)
+                if t is None:
+                    t = now  # Sin fecha legible: la hora en que llegó
+                track.append(t, vehicle.lat, vehicle.lon, vehicle.speed)
+                track.updated_at = now
+                added += 1
+        return added
+
+    def _new_track(self, key) -> TrackBuffer:
+        if len(self.tracks) >= self.max_tracks:
+            # Sin presupuesto: reutilizar el buffer del menos reciente
+            _, track = self.tracks.popitem(last=False)
+            track.clear()
+            self.evicted += 1
+        else:
+            track = TrackBuffer(self.capacity)
+        self.tracks[key] = track
+        return track
+
+    def _evict_idle(self, now: float):
+        limit = now - self.idle_seconds
+        while self.tracks:
+            key, track = next(iter(self.tracks.items()))
+            if track.updated_at >= limit:
+                break
+            del self.tracks[key]
+            self.evicted += 1
+
+    # --- Consultas ---
+
+    def track(self, key):
+        """TrackBuffer del vehículo, o None."""
+        return self.tracks.get(key)
+
+    def trail(self, key, since: float = None) -> list:
+        """[(lat, lon)] del recorrido, del punto más antiguo al más reciente."""
+        track = self.tracks.get(key)
+        if track is None:
+            return []
+        return [(lat, lon) for _, lat, lon, _ in track.samples(since)]
+
+    def last_report(self, key):
+        """Fecha (epoch) del último reporte del vehículo, o None."""
+        track = self.tracks.get(key)
+        last = track.last() if track is not None else None
+        return last[0] if last is not None else None
+
+
+def _track_bytes(capacity: int) -> int:
+    """Memoria de un TrackBuffer lleno: el objeto más sus cuatro arreglos."""
+    track = TrackBuffer(capacity)
+    return sys.getsizeof(track) + sum(
+        sys.getsizeof(values) for values in (track.t, track.lat, track.lon, track.speed)
+    )
+
+
+# Historial de posiciones de la flota, compartido por servicios y vistas
+position_history = PositionHistory()
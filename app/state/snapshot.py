@@ -0,0 +1,182 @@
+# app/state/snapshot.py
+
+import threading
+import time
+from array import array
+from itertools import compress
+
+try:
+    import numpy as np
+except ImportError:  # Pyodide sin numpy: se usa array("d")
+    np = None
+
+_NAN = float("nan")
+
+
+class FleetSnapshot:
+    """
+    Foto columnar de la flota para los cálculos del mapa y el tablero.
+    lat/lon son arreglos contiguos de float (NaN = sin posición), paralelos a
+    ids/names/vehicles. Con NumPy las operaciones son vectorizadas; sin NumPy
+    (Pyodide) se usan array("d") y recorridos en C (sum, min, max, compress).
+    """
+
+    __slots__ = ("vehicles", "ids", "names", "lat", "lon", "valid", "taken_at", "_positioned")
+
+    def __init__(self, vehicles: list, ids: list, names: list, lat, lon, valid, taken_at: float = None):
+        self.vehicles = vehicles
+        self.ids = ids
+        self.names = names
+        self.lat = lat
+        self.lon = lon
+        self.valid = valid  # Máscara: el vehículo tiene lat/lon válidas
+        self.taken_at = taken_at if taken_at is not None else time.time()
+        self._positioned = None
+
+    @classmethod
+    def from_vehicles(cls, vehicles: list) -> "FleetSnapshot":
+        """Construye la foto a partir de una lista de Vehicle."""
+        # Vehicle ya garantiza lat/lon float o None: basta con un solo recorrido
+        lats, lons, ids, names, flags = [], [], [], [], []
+        for v in vehicles:
+            ok = v.lat is not None and v.lon is not None
+            lats.append(v.lat if ok else _NAN)
+            lons.append(v.lon if ok else _NAN)
+            ids.append(v.key)
+            names.append(v.name)
+            flags.append(ok)
+        if np is not None:
+            lat = np.array(lats, dtype=np.float64)
+            lon = np.array(lons, dtype=np.float64)
+            valid = np.array(flags, dtype=bool)
+        else:
+            lat = array("d", lats)
+            lon = array("d", lons)
+            valid = bytes(flags)
+        return cls(list(vehicles), ids, names, lat, lon, valid)
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def valid_count(self) -> int:
+        if np is not None:
+            return int(self.valid.sum())
+        return sum(self.valid)
+
+    def positioned(self) -> "FleetSnapshot":
+        """Solo los vehículos con posición válida (se calcula una vez)."""
+        if self._positioned is None:
+            if self.valid_count == len(self):
+                self._positioned = self
+            else:
+                self._positioned = self.filter(self.valid)
+        return self._positioned
+
+    def filter(self, mask) -> "FleetSnapshot":
+        """Nueva foto con los elementos donde mask es verdadero."""
+        if np is not None:
+            mask = np.asarray(mask, dtype=bool)
+            keep = np.flatnonzero(mask).tolist()
+            return FleetSnapshot(
+                [self.vehicles[i] for i in keep],
+                [self.ids[i] for i in keep],
+                [self.names[i] for i in keep],
+                self.lat[mask],
+                self.lon[mask],
+                self.valid[mask],
+                self.taken_at,
+            )
+        return FleetSnapshot(
+            list(compress(self.vehicles, mask)),
+            list(compress(self.ids, mask)),
+            list(compress(self.names, mask)),
+            array("d", compress(self.lat, mask)),
+            array("d", compress(self.lon, mask)),
+            bytes(compress(self.valid, mask)),
+            self.taken_at,
+        )
+
+    def within(self, bbox: tuple):
+        """Máscara de los vehículos dentro de (min_lat, min_lon, max_lat, max_lon)."""
+        min_lat, min_lon, max_lat, max_lon = bbox
+        if np is not None:
+            return (
+                self.valid
+                & (self.lat >= min_lat) & (self.lat <= max_lat)
+                & (self.lon >= min_lon) & (self.lon <= max_lon)
+            )
+        return bytes(
+            ok and min_lat <= la <= max_lat and min_lon <= lo <= max_lon
+            for ok, la, lo in zip(self.valid, self.lat, self.lon)
+        )
+
+    def center(self):
+        """(lat, lon) promedio de los vehículos con posición, o None."""
+        snap = self.positioned()
+        count = len(snap)
+        if not count:
+            return None
+        if np is not None:
+            return float(snap.lat.mean()), float(snap.lon.mean())
+        return sum(snap.lat) / count, sum(snap.lon) / count
+
+    def bbox(self):
+        """(min_lat, min_lon, max_lat, max_lon) de los vehículos con posición, o None."""
+        snap = self.positioned()
+        if not len(snap):
+            return None
+        if np is not None:
+            return (
+                float(snap.lat.min()), float(snap.lon.min()),
+                float(snap.lat.max()), float(snap.lon.max()),
+            )
+        return min(snap.lat), min(snap.lon), max(snap.lat), max(snap.lon)
+
+    def points(self, limit: int = None) -> list:
+        """[(lat, lon, name)] de los vehículos con posición (los primeros `limit`)."""
+        snap = self.positioned()
+        lat, lon = snap.lat[:limit], snap.lon[:limit]
+        if np is not None:
+            lat, lon = lat.tolist(), lon.tolist()
+        return list(zip(lat, lon, snap.names[:limit]))
+
+
+EMPTY_SNAPSHOT = FleetSnapshot.from_vehicles([])
+
+# Fotos ya construidas, por identidad de la lista de Vehicle (que ya es única
+# por descarga): mapa, lista y tablero comparten la misma foto.
+_MEMO_SIZE = 4
+_memo = []  # [(vehicles, snapshot)]
+_lock = threading.Lock()
+
+# Última foto por origen: las posiciones (ultimaVehiculos) y el catálogo
+# (Vehiculos) no se pisan entre sí
+POSITIONS = "positions"
+CATALOG = "catalog"
+_latest = {}  # origen -> FleetSnapshot
+
+
+def snapshot_for(vehicles: list, slot: str = None) -> FleetSnapshot:
+    """
+    FleetSnapshot de una lista de Vehicle, construida una vez por lista.
+    Con `slot` (POSITIONS / CATALOG) queda además como la última de ese origen.
+    """
+    with _lock:
+        for source, snapshot in _memo:
+            if source is vehicles:
+                if slot:
+                    _latest[slot] = snapshot
+                return snapshot
+    snapshot = FleetSnapshot.from_vehicles(vehicles)
+    with _lock:
+        _memo[:] = _memo[-(_MEMO_SIZE - 1):]
+        _memo.append((vehicles, snapshot))
+        if slot:
+            _latest[slot] = snapshot
+    return snapshot
+
+
+def latest_snapshot(slot: str = POSITIONS) -> FleetSnapshot:
+    """Última foto construida de ese origen (vacía si aún no se descargó nada)."""
+    return _latest.get(slot, EMPTY_SNAPSHOT)
@@ -1,11 +1,74 @@
 import flet as ft
+from app.state.snapshot import POSITIONS, latest_snapshot
+
+
+def _metric(label: str, value: str, icon: str) -> ft.Control:
+    return ft.Container(
+        content=ft.Row(
+            [
+                ft.Icon(icon, size=24, color="#0D2571"),
+                ft.Column(
+                    [
+                        ft.Text(value, size=20, weight=ft.FontWeight.BOLD, color="#212121"),
+                        ft.Text(label, size=12, color="#757575"),
+                    ],
+                    spacing=2,
+                    tight=True,
+                ),
+            ],
+            spacing=12,
+        ),
+        padding=16,
+        bgcolor="#FFFFFF",
+        border_radius=12,
+        border=ft.border.all(1, "#E0E0E0"),
+        width=220,
+    )
+
+
+def _metrics(snapshot) -> ft.Control:
+    total = len(snapshot)
+    if not total:
+        return ft.Text("Gráficas y métricas clave.")
+    with_gps = snapshot.valid_count
+    items = [
+        _metric("Vehículos", f"{total:,}", "directions_car"),
+        _metric("Con GPS", f"{with_gps:,}", "gps_fixed"),
+        _metric("Sin GPS", f"{total - with_gps:,}", "gps_off"),
+    ]
+    center = snapshot.center()
+    if center:
+        min_lat, min_lon, max_lat, max_lon = snapshot.bbox()
+        items.append(_metric("Centro de la flota", f"{center[0]:.4f}, {center[1]:.4f}", "my_location"))
+        items.append(_metric(
+            "Extensión (lat × lon)",
+            f"{max_lat - min_lat:.3f}° × {max_lon - min_lon:.3f}°",
+            "crop_free",
+        ))
+    return ft.Row(items, wrap=True, spacing=12, run_spacing=12)
+
 
 def DashboardView() -> ft.Control:
+    # Métricas (GPS, centro, extensión) sobre la última foto de posiciones
+    # (ultimaVehiculos); la del catálogo de la lista no cuenta aquí
+    shown = latest_snapshot(POSITIONS)
+    metrics = ft.Container(content=_metrics(shown))
+
+    # Al volver a la pestaña (TabCache): recalcular solo si hay otra foto
+    def refresh():
+        nonlocal shown
+        snapshot = latest_snapshot(POSITIONS)
+        if snapshot is shown:
+            return
+        shown = snapshot
+        metrics.content = _metrics(snapshot)
+
     return ft.Column(
         [
             ft.Text("Dashboard", theme_style=ft.TextThemeStyle.HEADLINE_MEDIUM),
             ft.Divider(),
-            ft.Text("Gráficas y métricas clave."),
+            metrics,
         ],
+        data=refresh,
         expand=True,
     )
@@ -1,14 +1,28 @@
+import time
+
 import flet as ft
-import asyncio
-from app.services.vehicles import get_vehicles
-from app.services.locations import get_last_vehicles_positions
+from app.config import LOCATIONS_MAP_REFRESH_SECONDS
+from app.services.tokens import session_tokens
+from app.services.vehicles import get_vehicles_async
+from app.services.locations import (
+    get_last_vehicles_positions_async,
+    iter_vehicles_locations,
+    located_vehicle,
+)
+from app.services.cache import is_fresh
 from app.components.map import create_map_with_markers
+from app.state.snapshot import CATALOG, POSITIONS, FleetSnapshot, snapshot_for
+from app.state.diff import diff_snapshots
+from app.geo.spatial import position_index
 
 def HomeView(page: ft.Page) -> ft.Control:
     """
     Vista principal con mapa de vehículos.
-    Requiere acceso a page para obtener el token del client_storage.
+    Requiere acceso a page para actualizar los controles y abrir el mapa.
     """
+    # Token de la sesión de esta página
+    token_manager = session_tokens(page)
+
     # Contenedor para el mapa
     map_container = ft.Container(
         content=ft.ProgressRing(),
@@ -19,11 +33,100 @@ def HomeView(page: ft.Page) -> ft.Control:
     # Título
     title = ft.Text("Vehículos en el Mapa", theme_style=ft.TextThemeStyle.HEADLINE_MEDIUM)
     
+    def build_map(snapshot: FleetSnapshot):
+        return create_map_with_markers(
+            snapshot,
+            width=int(page.width) if page.width else None,
+            height=int(page.height * 0.7) if page.height else 600,
+            page=page
+        )
+    
+    partial_map_shown = False
+    shown_snapshot = None  # Foto que está dibujada en el mapa
+    loading = False
+    
+    def show_map(snapshot: FleetSnapshot):
+        nonlocal shown_snapshot
+        shown_snapshot = snapshot
+        map_container.content = build_map(snapshot)
+    
+    def show_catalog(token: str, vehicles: list):
+        # Catálogo sin ultimaVehiculos: mapa con lo que haya y ubicaciones
+        # individuales en segundo plano para los que no tienen posición
+        snapshot = snapshot_for(vehicles, CATALOG)
+        show_map(snapshot)
+        if snapshot.valid_count < len(snapshot):
+            page.run_task(locate_fleet, token, vehicles)
+    
+    async def locate_fleet(token: str, vehicles: list):
+        # El mapa se redibuja cada LOCATIONS_MAP_REFRESH_SECONDS con las
+        # ubicaciones que ya llegaron (cada mapa es una imagen estática nueva)
+        located = list(vehicles)
+        index = {vehicle.key: i for i, vehicle in enumerate(vehicles)}
+        missing = [vehicle for vehicle in vehicles if not vehicle.has_position]
+        drawn = shown_snapshot
+        last_draw = time.monotonic()
+        pending = False
+        
+        def redraw() -> bool:
+            nonlocal drawn, last_draw, pending
+            if shown_snapshot is not drawn:
+                return False  # Otra carga (p. ej. ultimaVehiculos) ya dibujó el mapa
+            show_map(FleetSnapshot.from_vehicles(located))
+            drawn, last_draw, pending = shown_snapshot, time.monotonic(), False
+            try:
+                map_container.update()
+            except AssertionError:
+                return False  # La vista ya no está en la página
+            return True
+        
+        async for key, data in iter_vehicles_locations(token, missing):
+            i = index.get(key)
+            if i is None:
+                continue
+            located[i] = located_vehicle(located[i], data)
+            pending = pending or located[i] is not vehicles[i]
+            if pending and time.monotonic() - last_draw >= LOCATIONS_MAP_REFRESH_SECONDS:
+                if not redraw():
+                    return
+        if pending:
+            redraw()
+    
+    def on_positions_batch(batch):
+        # Mostrar el mapa con los primeros vehículos mientras termina la descarga
+        # (solo una vez: cada mapa es una imagen estática nueva)
+        nonlocal partial_map_shown
+        if partial_map_shown:
+            return
+        partial_map_shown = True
+        map_container.content = build_map(FleetSnapshot.from_vehicles(batch))
+        try:
+            map_container.update()
+        except AssertionError:
+            pass  # La vista aún no (o ya no) está en la página
+    
+    def on_positions_revalidated(result):
+        # Llegaron datos frescos tras mostrar la caché: redibujar solo si algún
+        # vehículo apareció, desapareció o se movió más del umbral
+        if not result.get("ok") or result.get("from_cache") or not result.get("vehicles"):
+            return
+        snapshot = snapshot_for(result["vehicles"], POSITIONS)
+        position_index.refresh(snapshot)
+        if shown_snapshot is not None and not diff_snapshots(shown_snapshot, snapshot).positions_changed:
+            return
+        show_map(snapshot)
+        try:
+            map_container.update()
+        except AssertionError:
+            pass  # La vista ya no está en la página
+    
     # Función para cargar los vehículos
     async def load_vehicles():
+        nonlocal loading
+        loading = True
         try:
-            # Obtener token del client_storage
-            token = await asyncio.to_thread(page.client_storage.get, "token")
+            # Token en memoria (se renueva solo si el JWT está por vencer)
+            token = await token_manager.get_token_async()
             
             if not token:
                 map_container.content = ft.Text(
@@ -35,35 +138,33 @@ def HomeView(page: ft.Page) -> ft.Control:
                 return
             
             # Obtener últimas posiciones de vehículos directamente desde el endpoint
-            positions_result = await asyncio.to_thread(get_last_vehicles_positions, token)
+            # (desde caché si está vigente; si venció, se revalida en segundo plano;
+            # sin caché, los primeros registros llegan a on_positions_batch)
+            positions_result = await get_last_vehicles_positions_async(
+                token,
+                on_revalidated=on_positions_revalidated,
+                on_batch=on_positions_batch,
+            )
             
             if positions_result.get("ok"):
-                vehicles_with_positions = positions_result.get("data", [])
+                vehicles_with_positions = positions_result.get("vehicles", [])
                 
                 if vehicles_with_positions:
                     # El endpoint devuelve vehículos con sus últimas posiciones
                     # Crear mapa con markers directamente
-                    map_widget = create_map_with_markers(
-                        vehicles_with_positions,
-                        width=int(page.width) if page.width else None,
-                        height=int(page.height * 0.7) if page.height else 600,
-                        page=page
-                    )
-                    map_container.content = map_widget
+                    snapshot = snapshot_for(vehicles_with_positions, POSITIONS)
+                    # Índice espacial de las últimas posiciones (solo mueve lo que cambió)
+                    position_index.refresh(snapshot)
+                    show_map(snapshot)
                 else:
                     # Si no hay vehículos con posiciones, intentar obtener lista de vehículos
-                    vehicles_result = await asyncio.to_thread(get_vehicles, token)
+                    vehicles_result = await get_vehicles_async(token)
                     if vehicles_result.get("ok"):
-                        vehicles = vehicles_result.get("data", [])
+                        vehicles = vehicles_result.get("vehicles", [])
                         if vehicles:
-                            # Crear mapa aunque no tenga coordenadas (mostrará mensaje)
-                            map_widget = create_map_with_markers(
-                                vehicles,
-                                width=int(page.width) if page.width else None,
-                                height=int(page.height * 0.7) if page.height else 600,
-                                page=page
-                            )
-                            map_container.content = map_widget
+                            # Sin coordenadas se muestra un mensaje hasta que
+                            # lleguen las ubicaciones individuales
+                            show_catalog(token, vehicles)
                         else:
                             map_container.content = ft.Text(
                                 "No hay vehículos disponibles",
@@ -76,17 +177,13 @@ def HomeView(page: ft.Page) -> ft.Control:
                         )
             else:
                 # Si falla el endpoint de posiciones, intentar con vehículos sin posiciones
-                vehicles_result = await asyncio.to_thread(get_vehicles, token)
+                vehicles_result = await get_vehicles_async(token)
                 if vehicles_result.get("ok"):
-                    vehicles = vehicles_result.get("data", [])
+                    vehicles = vehicles_result.get("vehicles", [])
                     if vehicles:
-                        # Crear mapa aunque no tenga coordenadas (mostrará mensaje)
-                        map_widget = create_map_with_markers(
-                            vehicles,
-                            width=int(page.width) if page.width else None,
-                            height=int(page.height * 0.7) if page.height else 600
-                        )
-                        map_container.content = map_widget
+                        # Sin coordenadas se muestra un mensaje hasta que
+                        # lleguen las ubicaciones individuales
+                        show_catalog(token, vehicles)
                     else:
                         error_msg = positions_result.get("error", "Error desconocido")
                         map_container.content = ft.Text(
@@ -107,8 +204,30 @@ def HomeView(page: ft.Page) -> ft.Control:
                 size=16,
                 color="#F44336"
             )
+        finally:
+            loading = False
         
-        map_container.update()
+        try:
+            map_container.update()
+        except AssertionError:
+            pass  # La vista ya no está en la página
+    
+    # Al volver a la pestaña (TabCache): sin mapa, reintentar la carga; con
+    # mapa, consultar solo si las posiciones en caché vencieron (la
+    # revalidación llega a on_positions_revalidated y aplica el diff). Sin
+    # entrada en caché (p. ej. tras renovar el token) la petición es directa
+    # y su resultado se aplica aquí mismo
+    async def refresh():
+        if loading:
+            return
+        if shown_snapshot is None:
+            await load_vehicles()
+            return
+        token = await token_manager.get_token_async()
+        if token and not is_fresh("positions", token):
+            result = await get_last_vehicles_positions_async(token, on_revalidated=on_positions_revalidated)
+            if not result.get("from_cache"):
+                on_positions_revalidated(result)
     
     # Cargar vehículos al inicializar
     page.run_task(load_vehicles)
@@ -119,5 +238,6 @@ def HomeView(page: ft.Page) -> ft.Control:
             ft.Divider(),
             map_container,
         ],
+        data=refresh,
         expand=True,
     )
@@ -0,0 +1,34 @@
+# app/views/tabs.py
+
+import asyncio
+
+import flet as ft
+
+
+class TabCache:
+    """
+    Vistas de las pestañas de /home. Cada una se crea en su primera visita
+    y se reutiliza el resto de la sesión, así que al ocultarla conserva su
+    estado (mapa, lista, búsqueda) y volver a ella no hace peticiones.
+
+    Si la vista guarda una función de refresco en Control.data, se llama al
+    volver a la pestaña; la función decide si sus datos vencieron (p. ej.
+    con cache.is_fresh) y solo entonces consulta la API.
+    """
+
+    def __init__(self, page: ft.Page, builders: list):
+        self.page = page
+        self.builders = builders  # Funciones sin argumentos que crean cada vista
+        self._views = {}
+
+    def view(self, index: int) -> ft.Control:
+        view = self._views.get(index)
+        if view is None:
+            view = self._views[index] = self.builders[index]()
+            return view
+        refresh = view.data
+        if asyncio.iscoroutinefunction(refresh):
+            self.page.run_task(refresh)
+        elif callable(refresh):
+            refresh()
+        return view
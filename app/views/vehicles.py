@@ -1,13 +1,21 @@
 import flet as ft
-import asyncio
-from app.services.vehicles import get_vehicles
+from app.services.tokens import session_tokens
+from app.services.vehicles import get_vehicles_async
+from app.services.cache import is_fresh
 from app.components.vehicle_card import create_vehicle_card
+from app.components.virtual_list import VirtualList
+from app.state.snapshot import CATALOG, snapshot_for
+from app.state.diff import diff_snapshots, vehicle_keys
+from app.state.fleet_index import fleet_index
 
 def VehiclesView(page: ft.Page) -> ft.Control:
     """
     Vista de lista de vehículos con tarjetas personalizadas.
-    Requiere acceso a page para obtener el token del client_storage.
+    Requiere acceso a page para actualizar los controles y abrir el mapa.
     """
+    # Token de la sesión de esta página
+    token_manager = session_tokens(page)
+
     # Contenedor para la lista de vehículos
     vehicles_container = ft.Container(
         content=ft.ProgressRing(),
@@ -21,11 +29,164 @@ def VehiclesView(page: ft.Page) -> ft.Control:
     # Contador de vehículos
     counter_text = ft.Text("Cargando...", size=14, color="#757575")
     
+    # Foto pintada y su Vehicle por clave de vehículo (para aplicar diferencias)
+    shown_snapshot = None
+    vehicles_by_key = {}
+    search_query = ""
+    loading = False
+    
+    # Vehículos recibidos durante la descarga (streaming); mientras no hay
+    # foto su clave provisional es ("~", índice)
+    streamed = []
+    
+    def visible_keys(snapshot):
+        # Con búsqueda activa, solo las coincidencias del índice de la flota
+        if search_query:
+            return [key for key in fleet_index.search(search_query) if key in vehicles_by_key]
+        return vehicle_keys(snapshot)
+    
+    def make_card(key):
+        # La tarjeta pasa a on_click su Vehicle actual (card.data)
+        return create_vehicle_card(
+            vehicles_by_key[key],
+            on_click=on_vehicle_click,
+            page=page
+        )
+    
+    def bind_card(card, key):
+        card.bind(vehicles_by_key[key])
+    
+    # Lista virtualizada: solo existen las tarjetas cercanas a lo visible, y
+    # al hacer scroll o refrescar se reasignan en su lugar (VehicleCard.bind)
+    vehicle_list = VirtualList(
+        make_card,
+        bind_card,
+        viewport_height=page.height or 800,
+    )
+    
+    def on_vehicles_batch(batch):
+        # Pintar las primeras tarjetas sin esperar a que termine la descarga
+        if not streamed:
+            vehicles_container.content = vehicle_list.control
+        for vehicle in batch:
+            vehicles_by_key[("~", len(streamed))] = vehicle
+            streamed.append(vehicle)
+        vehicle_list.set_keys([("~", i) for i in range(len(streamed))])
+        counter_text.value = f"{len(streamed)} vehículo(s) cargando..."
+        try:
+            vehicles_container.update()
+            counter_text.update()
+        except AssertionError:
+            pass  # La vista aún no (o ya no) está en la página
+    
+    def update_counter(snapshot):
+        counter_text.value = (
+            f"{len(snapshot)} vehículo(s) encontrado(s), {snapshot.valid_count} con GPS"
+        )
+    
+    def render_vehicles(vehicles):
+        nonlocal shown_snapshot
+        # La foto columnar del catálogo se comparte con el mapa
+        snapshot = snapshot_for(vehicles, CATALOG)
+        update_counter(snapshot)
+        shown_snapshot = snapshot
+        streamed.clear()
+        vehicles_by_key.clear()
+        vehicles_by_key.update(zip(vehicle_keys(snapshot), snapshot.vehicles))
+        # El índice de búsqueda se arma después de enviar la primera pantalla
+        page.run_task(index_fleet, snapshot)
+        
+        if snapshot.vehicles:
+            # Las claves provisionales del streaming se reemplazan por las
+            # reales; las tarjetas ya creadas se reutilizan
+            vehicle_list.set_keys(visible_keys(snapshot), reset=True)
+            vehicles_container.content = vehicle_list.control
+        else:
+            vehicles_container.content = ft.Container(
+                content=ft.Column(
+                    [
+                        ft.Icon("directions_car", size=64, color="#9E9E9E"),
+                        ft.Text(
+                            "No hay vehículos disponibles",
+                            size=16,
+                            color="#757575",
+                        ),
+                    ],
+                    alignment=ft.MainAxisAlignment.CENTER,
+                    horizontal_alignment=ft.CrossAxisAlignment.CENTER,
+                    spacing=16,
+                ),
+                alignment=ft.alignment.center,
+                expand=True,
+            )
+    
+    async def index_fleet(snapshot):
+        # Índice de búsqueda por partes, sin bloquear la interfaz; mientras
+        # se arma, la búsqueda usa el índice anterior
+        if not await fleet_index.refresh_async(snapshot):
+            return  # Llegó otra foto antes de terminar
+        if search_query and snapshot is shown_snapshot:
+            vehicle_list.set_keys(visible_keys(snapshot))
+            try:
+                vehicles_container.update()
+            except AssertionError:
+                pass  # La vista ya no está en la página
+    
+    def apply_diff(snapshot) -> bool:
+        """
+        Actualiza solo las tarjetas afectadas. Devuelve False si no hubo que
+        tocar la interfaz (nada cambió o solo hubo movimientos).
+        """
+        nonlocal shown_snapshot
+        diff = diff_snapshots(shown_snapshot, snapshot)
+        # El diff solo le sirve al índice si ya estaba en la foto mostrada
+        fleet_index.refresh(snapshot, diff if fleet_index.snapshot is shown_snapshot else None)
+        gps_changed = snapshot.valid_count != shown_snapshot.valid_count
+        shown_snapshot = snapshot
+        vehicles_by_key.clear()
+        vehicles_by_key.update(diff.by_key)
+        
+        # La posición no se ve en la tarjeta: basta con apuntar al Vehicle nuevo
+        for key, card in vehicle_list.items():
+            vehicle = diff.by_key.get(key)
+            if vehicle is not None:
+                card.data = vehicle
+        
+        if not (diff.added or diff.removed or diff.changed):
+            if gps_changed:
+                update_counter(snapshot)  # Solo cambia el contador "con GPS"
+            return gps_changed
+        
+        # Las tarjetas cambiadas que están en pantalla se reasignan en su
+        # lugar: Flet solo envía los textos que cambiaron
+        vehicle_list.invalidate(diff.changed)
+        vehicle_list.set_keys(visible_keys(snapshot))
+        update_counter(snapshot)
+        return True
+    
+    def on_vehicles_revalidated(result):
+        # Llegaron datos frescos tras mostrar la caché: aplicar solo las diferencias
+        if not result.get("ok") or result.get("from_cache"):
+            return
+        snapshot = snapshot_for(result.get("vehicles", []), CATALOG)
+        if shown_snapshot is not None and vehicles_by_key and len(snapshot):
+            if not apply_diff(snapshot):
+                return
+        else:
+            render_vehicles(snapshot.vehicles)
+        try:
+            vehicles_container.update()
+            counter_text.update()
+        except AssertionError:
+            pass  # La vista ya no está en la página
+    
     # Función para cargar los vehículos
     async def load_vehicles():
+        nonlocal loading
+        loading = True
         try:
-            # Obtener token del client_storage
-            token = await asyncio.to_thread(page.client_storage.get, "token")
+            # Token en memoria (se renueva solo si el JWT está por vencer)
+            token = await token_manager.get_token_async()
             
             if not token:
                 vehicles_container.content = ft.Text(
@@ -39,55 +200,16 @@ def VehiclesView(page: ft.Page) -> ft.Control:
                 return
             
             # Obtener vehículos de la API
-            result = await asyncio.to_thread(get_vehicles, token)
+            # (desde caché si está vigente; si venció, se revalida en segundo plano;
+            # sin caché, la lista llega por lotes a on_vehicles_batch)
+            result = await get_vehicles_async(
+                token,
+                on_revalidated=on_vehicles_revalidated,
+                on_batch=on_vehicles_batch,
+            )
             
             if result.get("ok"):
-                vehicles = result.get("data", [])
-                
-                counter_text.value = f"{len(vehicles)} vehículo(s) encontrado(s)"
-                
-                if vehicles:
-                    # Crear tarjetas para cada vehículo
-                    cards = []
-                    for vehicle in vehicles:
-                        # Crear una función específica para cada vehículo
-                        def make_click_handler(v):
-                            return lambda e: on_vehicle_click(v)
-                        
-                        card = create_vehicle_card(
-                            vehicle,
-                            on_click=make_click_handler(vehicle),
-                            page=page
-                        )
-                        cards.append(card)
-                    
-                    # Crear lista scrollable
-                    vehicles_list = ft.Column(
-                        cards,
-                        spacing=16,
-                        scroll=ft.ScrollMode.AUTO,
-                        expand=True,
-                    )
-                    
-                    vehicles_container.content = vehicles_list
-                else:
-                    vehicles_container.content = ft.Container(
-                        content=ft.Column(
-                            [
-                                ft.Icon("directions_car", size=64, color="#9E9E9E"),
-                                ft.Text(
-                                    "No hay vehículos disponibles",
-                                    size=16,
-                                    color="#757575",
-                                ),
-                            ],
-                            alignment=ft.MainAxisAlignment.CENTER,
-                            horizontal_alignment=ft.CrossAxisAlignment.CENTER,
-                            spacing=16,
-                        ),
-                        alignment=ft.alignment.center,
-                        expand=True,
-                    )
+                render_vehicles(result.get("vehicles", []))
             else:
                 error_msg = result.get("error", "Error desconocido")
                 vehicles_container.content = ft.Text(
@@ -103,9 +225,31 @@ def VehiclesView(page: ft.Page) -> ft.Control:
                 color="#F44336"
             )
             counter_text.value = "Error"
+        finally:
+            loading = False
         
-        vehicles_container.update()
-        counter_text.update()
+        try:
+            vehicles_container.update()
+            counter_text.update()
+        except AssertionError:
+            pass  # La vista ya no está en la página
+    
+    # Al volver a la pestaña (TabCache): sin lista, reintentar la carga; con
+    # lista, consultar solo si el catálogo en caché venció (la revalidación
+    # llega a on_vehicles_revalidated y aplica el diff). Sin entrada en caché
+    # (p. ej. tras renovar el token) la petición es directa y su resultado
+    # se aplica aquí mismo
+    async def refresh():
+        if loading:
+            return
+        if shown_snapshot is None:
+            await load_vehicles()
+            return
+        token = await token_manager.get_token_async()
+        if token and not is_fresh("vehicles", token):
+            result = await get_vehicles_async(token, on_revalidated=on_vehicles_revalidated)
+            if not result.get("from_cache"):
+                on_vehicles_revalidated(result)
     
     # Función callback cuando se hace clic en un vehículo
     def on_vehicle_click(vehicle):
@@ -115,6 +259,25 @@ def VehiclesView(page: ft.Page) -> ft.Control:
         # En su lugar, puedes usar un diálogo o navegación
         pass
     
+    # Búsqueda por prefijo de placas o cliente (índice de la flota)
+    def on_search(e: ft.ControlEvent):
+        nonlocal search_query
+        search_query = (e.control.value or "").strip()
+        if shown_snapshot is None or not vehicles_by_key:
+            return  # La lista aún se está cargando
+        vehicle_list.set_keys(visible_keys(shown_snapshot))
+        try:
+            vehicles_container.update()
+        except AssertionError:
+            pass  # La vista ya no está en la página
+    
+    search_field = ft.TextField(
+        hint_text="Buscar por placas o cliente",
+        prefix_icon="search",
+        dense=True,
+        on_change=on_search,
+    )
+    
     # Cargar vehículos al inicializar
     page.run_task(load_vehicles)
     
@@ -130,8 +293,11 @@ def VehiclesView(page: ft.Page) -> ft.Control:
                 vertical_alignment=ft.CrossAxisAlignment.CENTER,
             ),
             ft.Divider(),
+            search_field,
+            ft.Container(height=12),
             vehicles_container,
         ],
+        data=refresh,
         expand=True,
         spacing=0,
     )
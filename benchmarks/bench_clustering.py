@@ -0,0 +1,48 @@
+# benchmarks/bench_clustering.py
+# Precálculo de grupos para todos los zooms (una vez por foto) y costo de
+# cambiar de zoom en la vista previa estática (leer un nivel + armar la URL).
+#
+#   python -m benchmarks.bench_clustering [--fleet 10000]
+
+import argparse
+import time
+
+from app.components.map import _add_cluster_markers
+from app.geo.clustering import ClusterLevels
+from app.geo.static_maps import StaticMapBuilder
+from app.services.normalize import normalize_vehicles
+from app.state.snapshot import FleetSnapshot
+from benchmarks.stand_in_server import make_fleet
+
+MAP_SIZE = (640, 416)  # static_map_size(800, 520): lo que sirve la API, con scale=2
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--fleet", type=int, default=10000)
+    args = parser.parse_args()
+
+    snapshot = FleetSnapshot.from_vehicles(normalize_vehicles(make_fleet(args.fleet)))
+    center_lat, center_lon = snapshot.center()
+
+    start = time.perf_counter()
+    levels = ClusterLevels(snapshot)
+    build = (time.perf_counter() - start) * 1000
+
+    print(f"vehículos={args.fleet}  precálculo {levels.min_zoom}-{levels.max_zoom}: {build:.1f} ms")
+    for zoom in range(levels.min_zoom, levels.max_zoom + 1, 3):
+        start = time.perf_counter()
+        visible = levels.visible(zoom, center_lat, center_lon, *MAP_SIZE)
+        builder = StaticMapBuilder((center_lat, center_lon), zoom, MAP_SIZE, "KEY", scale=2)
+        _add_cluster_markers(builder, visible)
+        url = builder.build().url
+        elapsed = (time.perf_counter() - start) * 1000
+        in_view = sum(c.count for c in visible)
+        print(
+            f"  zoom {zoom:>2}: grupos={levels.count(zoom):>6}  en vista={len(visible):>4} "
+            f"({in_view} vehículos)  cambio de zoom={elapsed:5.2f} ms  URL={len(url)} caracteres"
+        )
+
+
+if __name__ == "__main__":
+    main()
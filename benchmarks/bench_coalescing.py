@@ -0,0 +1,113 @@
+# benchmarks/bench_coalescing.py
+# Peticiones idénticas en vuelo (mismo url y token) mezclando fetch_json y
+# stream_json, como el respaldo get_vehicles de HomeView junto con la lista
+# en streaming de VehiclesView. Cuenta las peticiones que llegan al
+# servidor: cada caso debe hacer una sola, y quien pasó on_batch debe
+# recibir la lista completa aunque se haya unido a un fetch_json.
+#
+#   python -m benchmarks.bench_coalescing [--fleet 3000] [--callers 4]
+
+import argparse
+import asyncio
+import threading
+import time
+
+import app.services.api as api
+from benchmarks.stand_in_server import StandInHandler, start_server
+
+
+class CountingHandler(StandInHandler):
+    """Cuenta los GET recibidos; entrega el cuerpo por trozos con demora."""
+
+    chunk_size = 16 * 1024
+    chunk_delay = 0.01
+    hits = 0
+    _lock = threading.Lock()
+
+    def do_GET(self):
+        with type(self)._lock:
+            type(self).hits += 1
+        super().do_GET()
+
+
+def run(label: str, fn, total: int, token: str):
+    CountingHandler.hits = 0
+    received = []
+    start = time.perf_counter()
+    results = fn(token, received)
+    elapsed = (time.perf_counter() - start) * 1000
+    complete = all(r.get("ok") and len(r["data"]) == total for r in results)
+    batches_ok = all(n == total for n in received)
+    print(
+        f"{label:<38} peticiones al servidor={CountingHandler.hits}  llamadas={len(results)}  "
+        f"completas={'sí' if complete else 'NO'}  lotes={'sí' if batches_ok else 'NO'}  {elapsed:6.0f} ms"
+    )
+    assert CountingHandler.hits == 1, f"{label}: {CountingHandler.hits} peticiones upstream"
+    assert complete and batches_ok, label
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--fleet", type=int, default=3000)
+    parser.add_argument("--callers", type=int, default=4)
+    args = parser.parse_args()
+
+    server, base_url = start_server(args.fleet, handler=CountingHandler)
+    api._client = api.ApiClient(base_url=base_url)
+    api._async_client = api.AsyncApiClient(base_url=base_url)
+    url = f"{base_url}/Vehiculos"
+    n = args.callers
+
+    def counter(received):
+        count = [0]
+        received.append(count)
+
+        def on_batch(items):
+            count[0] += len(items)
+        return on_batch
+
+    def mixed_async(stream_first: bool):
+        def fn(token, received):
+            async def consume():
+                calls = []
+                for i in range(n):
+                    if (i % 2 == 0) == stream_first:
+                        calls.append(api.stream_json_async(url, token, on_batch=counter(received)))
+                    else:
+                        calls.append(api.fetch_json_async(url, token))
+                return await asyncio.gather(*calls)
+            results = asyncio.run(consume())
+            received[:] = [count[0] for count in received]
+            return results
+        return fn
+
+    def mixed_threads(token, received):
+        results = []
+
+        def call(i):
+            if i % 2:
+                results.append(api.fetch_json(url, token))
+            else:
+                results.append(api.stream_json(url, token, on_batch=counter(received)))
+
+        threads = [threading.Thread(target=call, args=(i,)) for i in range(n)]
+        for thread in threads:
+            thread.start()
+            time.sleep(0.02)  # Llegan mientras la primera sigue en vuelo
+        for thread in threads:
+            thread.join()
+        received[:] = [count[0] for count in received]
+        return results
+
+    try:
+        # Un token distinto por caso: sin validadores (ETag) de la corrida anterior
+        run("async: stream primero, luego fetch", mixed_async(True), args.fleet, "t1")
+        run("async: fetch primero, luego stream", mixed_async(False), args.fleet, "t2")
+        run("hilos: stream y fetch alternados", mixed_threads, args.fleet, "t3")
+        print(f"inflight: {api.inflight.stats()}")
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
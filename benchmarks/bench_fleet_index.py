@@ -0,0 +1,77 @@
+# benchmarks/bench_fleet_index.py
+# Construcción y consultas del índice de la flota (FleetIndex) contra una
+# búsqueda lineal sobre la lista, y refresco incremental contra reconstrucción.
+#
+#   python -m benchmarks.bench_fleet_index [--fleet 50000] [--lookups 1000]
+
+import argparse
+import random
+import time
+
+from app.services.normalize import normalize_vehicles
+from app.state.diff import diff_snapshots
+from app.state.fleet_index import FleetIndex
+from app.state.snapshot import FleetSnapshot
+from benchmarks.stand_in_server import make_fleet
+
+
+def timed(fn, repeat: int = 3) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--fleet", type=int, default=50000)
+    parser.add_argument("--lookups", type=int, default=1000)
+    args = parser.parse_args()
+
+    fleet = make_fleet(args.fleet)
+    vehicles = normalize_vehicles(fleet)
+    snapshot = FleetSnapshot.from_vehicles(vehicles)
+    rnd = random.Random(3)
+    sample = [rnd.choice(vehicles) for _ in range(args.lookups)]
+
+    build = timed(lambda: FleetIndex().refresh(snapshot))
+    index = FleetIndex()
+    index.refresh(snapshot)
+
+    linear = timed(lambda: [next(v for v in vehicles if v.imei == s.imei) for s in sample[:50]], 1)
+    linear = linear / 50 * args.lookups
+    by_imei = timed(lambda: [index.find_by_imei(s.imei) for s in sample])
+    by_placas = timed(lambda: [index.find_by_placas(s.placas) for s in sample])
+    prefix = timed(lambda: [index.search(s.placas[:6], limit=20) for s in sample])
+
+    # Refresco con 1% de la flota cambiada (placas nuevas)
+    changed = [dict(v) for v in fleet]
+    for record in changed[::100]:
+        record["placas"] = "N" + record["placas"]
+    new_snapshot = FleetSnapshot.from_vehicles(normalize_vehicles(changed))
+
+    def incremental(diff=None):
+        ix = FleetIndex()
+        ix.refresh(snapshot)
+        start = time.perf_counter()
+        ix.refresh(new_snapshot, diff)
+        return time.perf_counter() - start
+
+    refresh = min(incremental() for _ in range(3)) * 1000
+    diff = diff_snapshots(snapshot, new_snapshot)
+    refresh_with_diff = min(incremental(diff) for _ in range(3)) * 1000
+
+    print(f"vehículos={args.fleet}  consultas={args.lookups}")
+    print(f"construcción del índice:        {build:8.1f} ms")
+    print(f"IMEI búsqueda lineal:           {linear:8.1f} ms  (estimado)")
+    print(f"IMEI índice O(1):               {by_imei:8.2f} ms")
+    print(f"placas índice O(1):             {by_placas:8.2f} ms")
+    print(f"prefijo de placas (20 máx):     {prefix:8.2f} ms")
+    print(f"refresco incremental (1%):      {refresh:8.1f} ms  (incluye el diff)")
+    print(f"refresco con diff de la vista:  {refresh_with_diff:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
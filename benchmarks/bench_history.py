@@ -0,0 +1,72 @@
+# benchmarks/bench_history.py
+# Historial de posiciones (PositionHistory): costo de agregar una foto de
+# la flota por refresco, efecto de una foto repetida (caché) y memoria
+# contra el presupuesto, incluido el descarte cuando la flota no cabe.
+#
+#   python -m benchmarks.bench_history [--fleet 10000] [--refreshes 100]
+
+import argparse
+import random
+import time
+
+from app.services.normalize import normalize_vehicles
+from app.state.history import PositionHistory
+from app.state.snapshot import FleetSnapshot
+from benchmarks.stand_in_server import make_fleet
+
+
+def refreshes(fleet: list, count: int, seed: int = 11) -> list:
+    """Fotos consecutivas: cada vehículo avanza un poco y reporta 30 s después."""
+    rnd = random.Random(seed)
+    snapshots = []
+    for n in range(count):
+        records = [dict(v) for v in fleet]
+        for record in records:
+            record["latitud"] += rnd.uniform(-0.001, 0.001)
+            record["longitud"] += rnd.uniform(-0.001, 0.001)
+            record["fecha"] = 1735732800 + 30 * n
+        fleet = records
+        snapshots.append(FleetSnapshot.from_vehicles(normalize_vehicles(records)))
+    return snapshots
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--fleet", type=int, default=10000)
+    parser.add_argument("--refreshes", type=int, default=100)
+    args = parser.parse_args()
+
+    snapshots = refreshes(make_fleet(args.fleet), args.refreshes)
+
+    history = PositionHistory()
+    times = []
+    for n, snapshot in enumerate(snapshots):
+        start = time.perf_counter()
+        history.record(snapshot, now=n * 30.0)
+        times.append(time.perf_counter() - start)
+    times.sort()
+
+    repeat = FleetSnapshot.from_vehicles(list(snapshots[-1].vehicles))
+    start = time.perf_counter()
+    history.record(repeat, now=len(snapshots) * 30.0)
+    repeat_ms = (time.perf_counter() - start) * 1000
+
+    # Presupuesto para la mitad de la flota: se reciclan los buffers más viejos
+    small = PositionHistory(budget_bytes=history.track_bytes * (args.fleet // 2))
+    start = time.perf_counter()
+    for n, snapshot in enumerate(snapshots[:10]):
+        small.record(snapshot, now=n * 30.0)
+    small_ms = (time.perf_counter() - start) * 1000 / 10
+
+    sample = history.track(next(iter(history.tracks)))
+    print(f"vehículos={args.fleet}  refrescos={args.refreshes}  capacidad={history.capacity}")
+    print(f"agregar foto:       mediana {times[len(times) // 2] * 1000:7.1f} ms   p95 {times[int(len(times) * 0.95)] * 1000:7.1f} ms")
+    print(f"por vehículo:               {times[len(times) // 2] / args.fleet * 1e6:7.2f} µs")
+    print(f"foto repetida:              {repeat_ms:7.1f} ms (0 muestras nuevas)")
+    print(f"memoria:            {history.memory_bytes / 1024 / 1024:7.1f} MiB de {history.budget_bytes / 1024 / 1024:.0f} MiB ({history.track_bytes} B por vehículo)")
+    print(f"muestras del primero:       {len(sample)} (las más viejas se sobrescriben)")
+    print(f"media flota en presupuesto: {small_ms:7.1f} ms por foto, {small.evicted} descartes, {len(small)} historiales")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+# benchmarks/bench_http_pool.py
+# Compara requests.get sin sesión (una conexión nueva por llamada) contra
+# el ApiClient compartido con pool keep-alive.
+#
+#   python -m benchmarks.bench_http_pool [--requests 300] [--tls]
+
+import argparse
+import time
+
+import requests
+
+from app.services.api import ApiClient
+from benchmarks.stand_in_server import start_server
+
+
+def bench_bare(url: str, n: int) -> float:
+    start = time.perf_counter()
+    for _ in range(n):
+        requests.get(url, timeout=15, verify=False).json()
+    return time.perf_counter() - start
+
+
+def bench_pooled(client: ApiClient, path: str, n: int) -> float:
+    start = time.perf_counter()
+    for _ in range(n):
+        client.get(path).json()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--fleet", type=int, default=50)
+    parser.add_argument("--tls", action="store_true", help="HTTPS con certificado autofirmado")
+    args = parser.parse_args()
+
+    server, base_url = start_server(args.fleet, tls=args.tls)
+    client = ApiClient(base_url=base_url, verify=False)
+    try:
+        bare = bench_bare(f"{base_url}/Vehiculos", args.requests)
+        pooled = bench_pooled(client, "Vehiculos", args.requests)
+    finally:
+        client.close()
+        server.shutdown()
+
+    n = args.requests
+    print(f"requests.get sin sesión : {bare:.3f} s ({bare / n * 1000:.2f} ms/petición)")
+    print(f"ApiClient (keep-alive)  : {pooled:.3f} s ({pooled / n * 1000:.2f} ms/petición)")
+    print(f"Mejora                  : x{bare / pooled:.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+# benchmarks/bench_locations.py
+# Consulta masiva de ubicaciones individuales (get_all_vehicles_locations e
+# iter_vehicles_locations) contra un servidor con latencia por petición:
+# una por una contra el lote con límite de concurrencia. Cada corrida parte
+# sin endpoint descubierto. Se mide el tiempo total, el tiempo a la primera
+# ubicación y el máximo de peticiones simultáneas que vio el servidor (el
+# límite debe cumplirse también durante el descubrimiento).
+#
+#   python -m benchmarks.bench_locations [--fleet 200] [--latency 0.05] [--concurrency 8]
+
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import threading
+import time
+
+import app.services.api as api
+import app.services.endpoints as endpoints
+from app.services.locations import (
+    get_all_vehicles_locations,
+    get_vehicle_location,
+    iter_vehicles_locations,
+)
+from app.services.normalize import normalize_vehicles
+from benchmarks.stand_in_server import StandInHandler, make_fleet, start_server
+
+
+class LocationHandler(StandInHandler):
+    """Responde Vehiculos/{id}/Ubicacion con `latency` segundos de demora."""
+
+    latency = 0.05
+    in_flight = 0
+    peak = 0
+    _lock = threading.Lock()
+
+    def do_GET(self):
+        cls = type(self)
+        with cls._lock:
+            cls.in_flight += 1
+            cls.peak = max(cls.peak, cls.in_flight)
+        try:
+            time.sleep(self.latency)
+            super().do_GET()
+        finally:
+            with cls._lock:
+                cls.in_flight -= 1
+
+    @classmethod
+    def reset(cls):
+        with cls._lock:
+            cls.peak = 0
+
+
+def fresh_registry():
+    # Sin endpoint descubierto, como en el primer uso de la app
+    endpoints._registry = endpoints.EndpointRegistry(
+        path=os.path.join(tempfile.mkdtemp(prefix="nextapp-bench-"), "endpoints.json")
+    )
+
+
+def run(label: str, fn, total: int):
+    fresh_registry()
+    LocationHandler.reset()
+    first = []
+    start = time.perf_counter()
+
+    def on_result(key, data):
+        if not first:
+            first.append(time.perf_counter() - start)
+
+    found = fn(on_result)
+    elapsed = time.perf_counter() - start
+    ttfl = first[0] if first else elapsed
+    print(
+        f"{label:<34} ubicaciones={found:>4}/{total:<4} total={elapsed * 1000:8.0f} ms  "
+        f"primera={ttfl * 1000:7.0f} ms  simultáneas máx={LocationHandler.peak:>3}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--fleet", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.05, help="segundos por petición")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--sequential-limit", type=int, default=100, help="vehículos para la versión una por una")
+    args = parser.parse_args()
+
+    fleet = make_fleet(args.fleet)
+    vehicles = normalize_vehicles(fleet)
+    LocationHandler.latency = args.latency
+    server, base_url = start_server(0, handler=LocationHandler)
+    # Uno de cada diez vehículos no tiene ubicación (404)
+    for raw in fleet:
+        if raw["id"] % 10:
+            body = {"latitud": raw["latitud"], "longitud": raw["longitud"], "fecha": raw["fecha"]}
+            LocationHandler.routes[f"/api/Vehiculos/{raw['id']}/Ubicacion"] = json.dumps(body).encode("utf-8")
+    api._client = api.ApiClient(base_url=base_url)
+    api._async_client = api.AsyncApiClient(base_url=base_url)
+    try:
+        subset = vehicles[:args.sequential_limit]
+
+        def sequential(on_result):
+            found = 0
+            for vehicle in subset:
+                result = get_vehicle_location("bench", vehicle_id=vehicle.id, imei=vehicle.imei)
+                if result.get("ok"):
+                    found += 1
+                    on_result(vehicle.key, result["data"])
+            return found
+
+        def batch(on_result):
+            return len(get_all_vehicles_locations(
+                "bench", vehicles, concurrency=args.concurrency, on_result=on_result
+            ))
+
+        def streamed(on_result):
+            async def consume():
+                found = 0
+                async for key, data in iter_vehicles_locations(
+                    "bench", vehicles, concurrency=args.concurrency
+                ):
+                    found += 1
+                    on_result(key, data)
+                return found
+            return asyncio.run(consume())
+
+        run("una por una (síncrona)", sequential, len(subset))
+        run(f"lote síncrono (concurrencia {args.concurrency})", batch, len(vehicles))
+        run(f"lote async (concurrencia {args.concurrency})", streamed, len(vehicles))
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+# benchmarks/bench_normalize.py
+# Costo de normalizar la flota a Vehicle y memoria por registro contra los
+# dicts crudos, más el costo por render de las cadenas .get() que usaban
+# los componentes frente a leer atributos del registro ya normalizado.
+# También compara la normalización con plan de esquema (SchemaPlan) contra
+# la cadena completa de alias, con la forma de ultimaVehiculos (minúsculas)
+# y una forma tipo Vehiculos (PascalCase, coordenadas en "Ubicacion").
+#
+#   python -m benchmarks.bench_normalize [--fleet 10000] [--renders 20]
+
+import argparse
+import json
+import time
+import tracemalloc
+
+from app.services.normalize import GENERIC_PLAN, normalize_vehicles
+from benchmarks.stand_in_server import make_fleet
+
+
+def legacy_marker(vehicle: dict, idx: int):
+    """Resolución de campos como la hacía create_map_with_markers antes."""
+    lat = (
+        vehicle.get("latitud") or vehicle.get("Latitud") or
+        vehicle.get("lat") or vehicle.get("latitude") or
+        vehicle.get("Latitude") or vehicle.get("y") or 0
+    )
+    lon = (
+        vehicle.get("longitud") or vehicle.get("Longitud") or
+        vehicle.get("lon") or vehicle.get("lng") or vehicle.get("longitude") or
+        vehicle.get("Longitude") or vehicle.get("x") or 0
+    )
+    if not lat or not lon:
+        ubicacion = vehicle.get("ubicacion") or vehicle.get("Ubicacion") or vehicle.get("location") or vehicle.get("Location") or {}
+        lat = lat or ubicacion.get("latitud") or ubicacion.get("lat") or 0
+        lon = lon or ubicacion.get("longitud") or ubicacion.get("lon") or 0
+    if lat and lon and float(lat) != 0 and float(lon) != 0:
+        nombre = (
+            vehicle.get("placas") or vehicle.get("Placas") or
+            vehicle.get("economico") or vehicle.get("Economico") or
+            f"Vehículo {idx + 1}"
+        )
+        return float(lat), float(lon), nombre
+    return None
+
+
+def normalized_marker(vehicle):
+    if vehicle.has_position:
+        return vehicle.lat, vehicle.lon, vehicle.name
+    return None
+
+
+def pascal_shape(fleet: list) -> list:
+    """Misma flota con claves en PascalCase y ubicación anidada."""
+    shaped = []
+    for v in fleet:
+        record = {key[0].upper() + key[1:]: value for key, value in v.items()
+                  if key not in ("latitud", "longitud")}
+        record["Ubicacion"] = {"Latitud": v["latitud"], "Longitud": v["longitud"]}
+        shaped.append(record)
+    return shaped
+
+
+def timed(fn, repeat: int = 5) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def traced(fn):
+    tracemalloc.start()
+    value = fn()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return value, current
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--fleet", type=int, default=10000)
+    parser.add_argument("--renders", type=int, default=20)
+    args = parser.parse_args()
+
+    body = json.dumps(make_fleet(args.fleet))
+
+    raw, raw_bytes = traced(lambda: json.loads(body))
+    start = time.perf_counter()
+    vehicles = normalize_vehicles(raw)
+    normalize_time = time.perf_counter() - start
+    _, vehicle_bytes = traced(lambda: normalize_vehicles(raw))
+
+    n = len(raw)
+    print(f"vehículos={n}")
+    print(f"normalización (una vez por descarga): {normalize_time * 1000:8.1f} ms  "
+          f"({normalize_time / n * 1e6:.2f} µs/registro)")
+    print(f"memoria dict crudo:  {raw_bytes / n:7.0f} B/registro")
+    print(f"memoria Vehicle:     {vehicle_bytes / n:7.0f} B/registro")
+
+    start = time.perf_counter()
+    for _ in range(args.renders):
+        [legacy_marker(v, i) for i, v in enumerate(raw)]
+    legacy = (time.perf_counter() - start) / args.renders
+
+    start = time.perf_counter()
+    for _ in range(args.renders):
+        [normalized_marker(v) for v in vehicles]
+    normalized = (time.perf_counter() - start) / args.renders
+
+    print(f"render con cadenas .get():  {legacy * 1000:8.2f} ms")
+    print(f"render con Vehicle:         {normalized * 1000:8.2f} ms")
+
+    for label, records in (("ultimaVehiculos", raw), ("Vehiculos (PascalCase)", pascal_shape(raw))):
+        generic = timed(lambda: normalize_vehicles(records, plan=GENERIC_PLAN))
+        planned = timed(lambda: normalize_vehicles(records))
+        print(f"{label:<24} cadena completa={generic * 1000:7.1f} ms  "
+              f"con plan={planned * 1000:7.1f} ms  ({n / planned / 1e6:.2f} M registros/s)")
+
+
+if __name__ == "__main__":
+    main()
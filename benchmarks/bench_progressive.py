@@ -0,0 +1,103 @@
+# benchmarks/bench_progressive.py
+# Tiempo hasta la primera pantalla según crece la flota, con el trabajo
+# pesado antes de pintar (índice de búsqueda completo, grupos de todos los
+# zooms) contra después de pintar y por partes (FleetIndex.refresh_async,
+# ClusterLevels.fill_async). Para la parte en segundo plano se mide el
+# tramo más largo sin ceder el event loop (lo que tardaría en atenderse un
+# clic o un scroll).
+#
+#   python -m benchmarks.bench_progressive [--fleets 2000,10000,50000]
+
+import argparse
+import time
+
+from app.components.vehicle_card import create_vehicle_card
+from app.components.virtual_list import VirtualList
+from app.geo.clustering import ClusterLevels
+from app.geo.viewport import fit_bounds
+from app.services.normalize import normalize_vehicles
+from app.state.diff import vehicle_keys
+from app.state.fleet_index import FleetIndex
+from app.state.snapshot import FleetSnapshot
+from benchmarks.stand_in_page import make_page
+from benchmarks.stand_in_server import make_fleet
+
+MAP_SIZE = (640, 416)  # static_map_size(800, 520): lo que sirve la API, con scale=2
+
+
+def run_slices(coro) -> tuple:
+    """Ejecuta la corrutina tramo por tramo: (total ms, tramo más largo ms)."""
+    total = longest = 0.0
+    while True:
+        start = time.perf_counter()
+        try:
+            coro.send(None)
+        except StopIteration:
+            done = True
+        else:
+            done = False
+        elapsed = time.perf_counter() - start
+        total += elapsed
+        longest = max(longest, elapsed)
+        if done:
+            return total * 1000, longest * 1000
+
+
+def first_screen(vehicles: list, index_first: bool) -> float:
+    """ms desde que llegan los datos hasta enviar la primera pantalla de la lista."""
+    page, _ = make_page()
+    start = time.perf_counter()
+    snapshot = FleetSnapshot.from_vehicles(vehicles)
+    if index_first:
+        FleetIndex().refresh(snapshot)
+    by_key = dict(zip(vehicle_keys(snapshot), snapshot.vehicles))
+    vlist = VirtualList(
+        lambda key: create_vehicle_card(by_key[key], on_click=lambda v: None, page=page),
+        lambda card, key: card.bind(by_key[key]),
+        viewport_height=900,
+    )
+    vlist.set_keys(by_key)
+    page.add(vlist.control)
+    return (time.perf_counter() - start) * 1000
+
+
+def first_map(snapshot: FleetSnapshot, eager: bool) -> tuple:
+    """(ms hasta tener los grupos del zoom del primer mapa, niveles)."""
+    start = time.perf_counter()
+    center_lat, center_lon, zoom = fit_bounds(snapshot.bbox(), *MAP_SIZE)
+    levels = ClusterLevels(snapshot, eager=eager)
+    levels.visible(zoom, center_lat, center_lon, *MAP_SIZE)
+    return (time.perf_counter() - start) * 1000, levels
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--fleets", default="2000,10000,50000")
+    args = parser.parse_args()
+
+    print(
+        f"{'vehículos':>9} | {'lista: antes':>12} {'ahora':>8} | {'índice por partes':>26} | "
+        f"{'mapa: antes':>11} {'ahora':>8} | {'zooms por partes':>26}"
+    )
+    for n in (int(x) for x in args.fleets.split(",")):
+        vehicles = normalize_vehicles(make_fleet(n))
+        snapshot = FleetSnapshot.from_vehicles(vehicles)
+
+        list_before = first_screen(vehicles, index_first=True)
+        list_now = first_screen(vehicles, index_first=False)
+        index_total, index_slice = run_slices(FleetIndex().refresh_async(snapshot))
+
+        map_before, _ = first_map(snapshot, eager=True)
+        map_now, levels = first_map(snapshot, eager=False)
+        fill_total, fill_slice = run_slices(levels.fill_async())
+
+        print(
+            f"{n:>9} | {list_before:9.1f} ms {list_now:5.1f} ms | "
+            f"{index_total:7.1f} ms, tramo máx {index_slice:5.1f} ms | "
+            f"{map_before:8.1f} ms {map_now:5.1f} ms | "
+            f"{fill_total:7.1f} ms, tramo máx {fill_slice:5.1f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+# benchmarks/bench_snapshot.py
+# Costo de la matemática del mapa en un refresco de la flota: listas de
+# Python (como lo hacía create_map_with_markers) contra FleetSnapshot
+# (NumPy si está instalado, array("d") si no). Presupuesto: un frame (16.7 ms).
+#
+#   python -m benchmarks.bench_snapshot [--fleet 10000]
+
+import argparse
+import time
+
+import app.state.snapshot as snapshot_module
+from app.services.normalize import normalize_vehicles
+from app.state.snapshot import FleetSnapshot
+from benchmarks.stand_in_server import make_fleet
+
+FRAME_MS = 1000 / 60
+
+
+def list_math(vehicles: list):
+    """Centro, rango y marcadores con listas, como antes."""
+    lats, lons, markers = [], [], []
+    for v in vehicles:
+        if v.has_position:
+            lats.append(v.lat)
+            lons.append(v.lon)
+            markers.append({"lat": v.lat, "lon": v.lon, "info": v.name})
+    center = (sum(lats) / len(lats), sum(lons) / len(lons))
+    span = max(max(lats) - min(lats), max(lons) - min(lons))
+    return center, span, markers[:10]
+
+
+def snapshot_math(vehicles: list):
+    snap = FleetSnapshot.from_vehicles(vehicles)
+    min_lat, min_lon, max_lat, max_lon = snap.bbox()
+    return snap.center(), max(max_lat - min_lat, max_lon - min_lon), snap.points(limit=10)
+
+
+def timed(fn, repeat: int = 10) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--fleet", type=int, default=10000)
+    args = parser.parse_args()
+
+    fleet = make_fleet(args.fleet)
+    for i in range(0, len(fleet), 7):  # Algunos vehículos sin GPS
+        fleet[i]["latitud"] = 0
+    vehicles = normalize_vehicles(fleet)
+
+    backend = "numpy" if snapshot_module.np is not None else "array"
+    legacy = timed(lambda: list_math(vehicles))
+    columnar = timed(lambda: snapshot_math(vehicles))
+    snap = FleetSnapshot.from_vehicles(vehicles)
+    queries = timed(lambda: (snap.center(), snap.bbox(), snap.within(snap.bbox())))
+
+    print(f"vehículos={len(vehicles)}  backend={backend}  frame={FRAME_MS:.1f} ms")
+    print(f"listas de Python:               {legacy:7.2f} ms")
+    print(f"FleetSnapshot (construir+math): {columnar:7.2f} ms")
+    print(f"FleetSnapshot (ya construida):  {queries:7.2f} ms  (centro, bbox, máscara)")
+
+
+if __name__ == "__main__":
+    main()
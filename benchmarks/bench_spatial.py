@@ -0,0 +1,83 @@
+# benchmarks/bench_spatial.py
+# Índice espacial de malla (GridIndex) contra recorrer toda la flota:
+# consultas de rectángulo (viewport), radio y k vecinos, y refresco
+# incremental con 1% de vehículos movidos contra reconstruir el índice.
+#
+#   python -m benchmarks.bench_spatial [--fleet 50000] [--queries 200]
+
+import argparse
+import random
+import time
+
+from app.geo.geometry import haversine_meters
+from app.geo.spatial import GridIndex
+from app.services.normalize import normalize_vehicles
+from app.state.snapshot import FleetSnapshot
+from benchmarks.stand_in_server import make_fleet
+
+
+def timed(fn, repeat: int = 3) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--fleet", type=int, default=50000)
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    fleet = make_fleet(args.fleet)
+    snapshot = FleetSnapshot.from_vehicles(normalize_vehicles(fleet))
+    points = [(v.lat, v.lon) for v in snapshot.vehicles if v.has_position]
+    rnd = random.Random(5)
+    centers = [(19.4326 + rnd.uniform(-0.4, 0.4), -99.1332 + rnd.uniform(-0.4, 0.4)) for _ in range(args.queries)]
+
+    def build():
+        index = GridIndex()
+        index.refresh(snapshot)
+        return index
+
+    build_ms = timed(build)
+    index = build()
+
+    def scan_bbox(c):
+        return [p for p in points if c[0] - 0.05 <= p[0] <= c[0] + 0.05 and c[1] - 0.05 <= p[1] <= c[1] + 0.05]
+
+    def scan_radius(c):
+        return [p for p in points if haversine_meters(c[0], c[1], p[0], p[1]) <= 2000]
+
+    per = 1 / args.queries
+    bbox_scan = timed(lambda: [scan_bbox(c) for c in centers[:20]], 1) / 20
+    bbox_grid = timed(lambda: [index.within_bbox(c[0] - 0.05, c[1] - 0.05, c[0] + 0.05, c[1] + 0.05) for c in centers]) * per
+    radius_scan = timed(lambda: [scan_radius(c) for c in centers[:5]], 1) / 5
+    radius_grid = timed(lambda: [index.within_radius(c[0], c[1], 2000) for c in centers]) * per
+    knn_grid = timed(lambda: [index.nearest(c[0], c[1], 10) for c in centers]) * per
+
+    moved = [dict(v) for v in fleet]
+    for record in moved[::100]:
+        record["latitud"] += 0.003
+    moved_snapshot = FleetSnapshot.from_vehicles(normalize_vehicles(moved))
+
+    def incremental():
+        ix = build()
+        start = time.perf_counter()
+        ix.refresh(moved_snapshot)
+        return time.perf_counter() - start
+
+    refresh_ms = min(incremental() for _ in range(3)) * 1000
+
+    print(f"vehículos={args.fleet}  consultas={args.queries}")
+    print(f"construcción:                  {build_ms:8.1f} ms")
+    print(f"viewport 0.1°:   recorrido {bbox_scan:7.2f} ms   malla {bbox_grid:6.3f} ms por consulta")
+    print(f"radio 2 km:      recorrido {radius_scan:7.2f} ms   malla {radius_grid:6.3f} ms por consulta")
+    print(f"10 vecinos:                              malla {knn_grid:6.3f} ms por consulta")
+    print(f"refresco 1% movidos:           {refresh_ms:8.1f} ms  (reconstruir: {build_ms:.1f} ms)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+# benchmarks/bench_static_maps.py
+# Largo de la URL de la vista previa estática: un markers= por vehículo con
+# coordenadas completas (formato anterior) contra StaticMapBuilder (un
+# markers= por estilo, decimales según zoom y polilínea codificada), y
+# cuántos marcadores caben en el presupuesto de la URL.
+#
+#   python -m benchmarks.bench_static_maps [--markers 1000] [--zoom 12]
+
+import argparse
+import random
+
+from app.config import STATIC_MAPS_MAX_URL_LENGTH
+from app.geo.static_maps import StaticMapBuilder
+
+BASE = "https://maps.googleapis.com/maps/api/staticmap?center=19.4326,-99.1332&zoom=12&size=800x520"
+KEY = "&key=" + "K" * 39
+
+
+def legacy_url(points: list) -> str:
+    markers = "&".join(f"markers=color:red|label:{(i + 1) % 10}|{lat},{lon}" for i, (lat, lon) in enumerate(points))
+    return f"{BASE}&{markers}{KEY}"
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--markers", type=int, default=1000)
+    parser.add_argument("--zoom", type=int, default=12)
+    args = parser.parse_args()
+
+    rnd = random.Random(11)
+    points = [(19.4326 + rnd.uniform(-0.1, 0.1), -99.1332 + rnd.uniform(-0.15, 0.15)) for _ in range(args.markers)]
+
+    legacy = legacy_url(points)
+    per_marker = (len(legacy) - len(BASE) - len(KEY)) / len(points)
+    legacy_fit = int((STATIC_MAPS_MAX_URL_LENGTH - len(BASE) - len(KEY)) // per_marker)
+    print(f"marcadores={len(points)}  zoom={args.zoom}  presupuesto={STATIC_MAPS_MAX_URL_LENGTH}")
+    print(f"formato anterior:         {per_marker:5.1f} car./marcador  caben {legacy_fit:>5}")
+
+    for label, encoded in (("agrupado (lat,lon)", False), ("agrupado (enc:)", True)):
+        builder = StaticMapBuilder(
+            (19.4326, -99.1332), args.zoom, (640, 416), "K" * 39, encoded=encoded, scale=2
+        )
+        builder.add_markers("size:small|color:red", points)
+        result = builder.build()
+        per = (result.length - len(BASE) - len(KEY)) / max(result.markers, 1)
+        print(f"{label:<24}  {per:5.1f} car./marcador  caben {result.markers:>5}  "
+              f"(omitidos {result.omitted}, URL {result.length} car.)")
+
+
+if __name__ == "__main__":
+    main()
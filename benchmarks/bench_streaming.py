@@ -0,0 +1,69 @@
+# benchmarks/bench_streaming.py
+# Compara la decodificación completa (resp.json()) contra stream_json()
+# para ultimaVehiculos: tiempo al primer registro, tiempo total y memoria pico.
+#
+#   python -m benchmarks.bench_streaming [--fleet 20000] [--delay 0.02]
+
+import argparse
+import time
+import tracemalloc
+
+import app.services.api as api
+from benchmarks.stand_in_server import StandInHandler, start_server
+
+
+def measure(label: str, fn):
+    # Pasada de tiempo (sin tracemalloc, que distorsiona los tiempos)
+    first = []
+    start = time.perf_counter()
+
+    def on_batch(items):
+        if not first:
+            first.append(time.perf_counter() - start)
+
+    result = fn(on_batch)
+    total = time.perf_counter() - start
+    assert result["ok"], result
+    ttfr = first[0] if first else total
+
+    # Pasada de memoria pico
+    tracemalloc.start()
+    fn(lambda items: None)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print(
+        f"{label:<22} registros={len(result['data']):>6}  "
+        f"primer registro={ttfr * 1000:8.1f} ms  total={total * 1000:8.1f} ms  "
+        f"pico={peak / 1024 / 1024:6.1f} MiB"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--fleet", type=int, default=20000)
+    parser.add_argument("--delay", type=float, default=0.02, help="segundos entre trozos de 64 KiB")
+    args = parser.parse_args()
+
+    StandInHandler.chunk_delay = args.delay
+    server, base_url = start_server(args.fleet)
+    api._client = api.ApiClient(base_url=base_url)
+    url = f"{base_url}/Vehiculo/ultimaVehiculos"
+    try:
+        # Sin validadores guardados para que no intervenga el GET condicional
+        def full(on_batch):
+            api.validators.clear()
+            return api.fetch_json(url, "bench", empty=[])
+
+        def streamed(on_batch):
+            api.validators.clear()
+            return api.stream_json(url, "bench", on_batch=on_batch)
+
+        measure("resp.json() completo", full)
+        measure("stream_json", streamed)
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+# benchmarks/bench_thumbnails.py
+# Miniaturas de fotos de vehículos: bytes que descarga el cliente por cada
+# pantalla de tarjetas con la foto original contra la miniatura 1x/2x,
+# costo de la primera generación (descarga + reducción) y de las visitas
+# siguientes (caché en disco), y descarte LRU con un presupuesto chico.
+# Requiere Pillow.
+#
+#   python -m benchmarks.bench_thumbnails [--photos 13] [--width 2400]
+
+import argparse
+import asyncio
+import io
+import os
+import random
+import shutil
+import tempfile
+import time
+
+from PIL import Image, ImageDraw
+
+from app.services import thumbnails
+from app.services.thumbnails import ThumbnailCache, fetch_thumbnail_async, thumbnail_src
+from benchmarks.stand_in_server import StandInHandler, start_server
+
+
+def make_photo(width: int, height: int, seed: int) -> bytes:
+    """Foto sintética: figuras de varios tamaños y algo de ruido, como una foto real."""
+    rnd = random.Random(seed)
+    photo = Image.new("RGB", (width, height), (rnd.randint(0, 255), rnd.randint(0, 255), rnd.randint(0, 255)))
+    draw = ImageDraw.Draw(photo)
+    for _ in range(400):
+        x, y = rnd.randrange(width), rnd.randrange(height)
+        size = int(width * rnd.uniform(0.005, 0.15))
+        color = (rnd.randint(0, 255), rnd.randint(0, 255), rnd.randint(0, 255))
+        shape = draw.ellipse if rnd.random() < 0.5 else draw.rectangle
+        shape((x, y, x + size, y + size * rnd.uniform(0.3, 1.5)), fill=color)
+    noise = Image.effect_noise((width, height), 40).convert("RGB")
+    photo = Image.blend(photo, noise, 0.1)
+    out = io.BytesIO()
+    photo.save(out, "JPEG", quality=90)
+    return out.getvalue()
+
+
+def folder_bytes(directory: str, suffix: str) -> int:
+    return sum(os.path.getsize(os.path.join(directory, n)) for n in os.listdir(directory) if n.endswith(suffix))
+
+
+async def render(urls: list) -> list:
+    return await asyncio.gather(*(fetch_thumbnail_async(url) for url in urls))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--photos", type=int, default=13, help="tarjetas en pantalla")
+    parser.add_argument("--width", type=int, default=2400)
+    args = parser.parse_args()
+
+    server, base_url = start_server(fleet_size=1)
+    photos = {f"/api/fotos/{i}.jpg": make_photo(args.width, args.width * 3 // 4, i) for i in range(args.photos)}
+    StandInHandler.routes.update(photos)
+    urls = [base_url.rsplit("/api", 1)[0] + path for path in photos]
+
+    directory = tempfile.mkdtemp(prefix="nextapp-thumbs-")
+    try:
+        thumbnails._cache = ThumbnailCache(directory=directory)
+        start = time.perf_counter()
+        asyncio.run(render(urls))
+        first_ms = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        srcs = [thumbnail_src(url) for url in urls]
+        hit_ms = (time.perf_counter() - start) * 1000
+        assert all(srcs)
+
+        original = sum(len(body) for body in photos.values())
+        small = folder_bytes(directory, "@1x.jpg")
+        large = folder_bytes(directory, "@2x.jpg")
+
+        # Presupuesto para la mitad de las fotos: las menos usadas se borran
+        budget_cache = ThumbnailCache(directory=directory, max_bytes=(small + large) // 2)
+        kept = sum(1 for url in urls if budget_cache.src(url))
+        thumbnails._cache = budget_cache
+        asyncio.run(render(urls))
+        on_disk = budget_cache.total
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+        server.shutdown()
+
+    n = args.photos
+    print(f"fotos={n}  original={args.width}x{args.width * 3 // 4}")
+    print(f"por pantalla, original: {original / 1024:9.0f} KB ({original / n / 1024:.0f} KB por foto)")
+    print(f"por pantalla, 1x:       {small / 1024:9.1f} KB  ({original / small:.0f}x menos)")
+    print(f"por pantalla, 2x:       {large / 1024:9.1f} KB  ({original / large:.0f}x menos)")
+    print(f"primera visita:         {first_ms:9.0f} ms (descarga + miniaturas, {first_ms / n:.0f} ms por foto)")
+    print(f"visitas siguientes:     {hit_ms:9.2f} ms (sin descargas)")
+    print(f"presupuesto a la mitad: {kept} de {n} fotos conservadas al recargar, {on_disk / 1024:.0f} KB en disco tras re-generar")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+# benchmarks/bench_vehicle_list.py
+# Costo de mostrar la lista de vehículos según crece la flota: una columna
+# con todas las tarjetas contra la lista virtualizada (VirtualList). Mide el
+# tiempo de Python por cuadro (crear controles + armar comandos de Flet) y
+# los bytes que se envían al cliente web, al abrir la lista, al bajar una
+# pantalla y al refrescar datos de las tarjetas visibles.
+#
+#   python -m benchmarks.bench_vehicle_list [--fleets 100,500,2000,10000]
+
+import argparse
+import time
+
+import flet as ft
+from app.components.vehicle_card import create_vehicle_card
+from app.components.virtual_list import VirtualList
+from app.services.normalize import normalize_vehicles
+from app.state.diff import vehicle_keys
+from app.state.snapshot import FleetSnapshot
+from benchmarks.stand_in_page import make_page
+from benchmarks.stand_in_server import make_fleet
+
+VIEWPORT = 900
+
+
+class Scroll:
+    """Evento de scroll como lo manda el cliente."""
+
+    def __init__(self, pixels: float):
+        self.pixels = pixels
+        self.viewport_dimension = VIEWPORT
+
+
+def full_column(vehicles: list) -> dict:
+    page, conn = make_page()
+    start = time.perf_counter()
+    column = ft.Column(
+        [create_vehicle_card(v, on_click=lambda v: None, page=page) for v in vehicles],
+        spacing=16,
+        scroll=ft.ScrollMode.AUTO,
+        expand=True,
+    )
+    page.add(column)
+    return {"open_ms": (time.perf_counter() - start) * 1000, "open_bytes": conn.take()}
+
+
+def virtual_list(vehicles: list, snapshot: FleetSnapshot) -> dict:
+    page, conn = make_page()
+    by_key = dict(zip(vehicle_keys(snapshot), vehicles))
+    start = time.perf_counter()
+    vlist = VirtualList(
+        lambda key: create_vehicle_card(by_key[key], on_click=lambda v: None, page=page),
+        lambda card, key: card.bind(by_key[key]),
+        viewport_height=VIEWPORT,
+    )
+    vlist.set_keys(by_key)
+    page.add(vlist.control)
+    stats = {"open_ms": (time.perf_counter() - start) * 1000, "open_bytes": conn.take()}
+
+    # Bajar de a una pantalla y promediar lo que cuesta cada cuadro con cambios
+    frames, frame_time = 0, 0.0
+    for step in range(1, 21):
+        start = time.perf_counter()
+        vlist._on_scroll(Scroll(step * VIEWPORT))
+        frame_time += time.perf_counter() - start
+        frames += 1
+    stats["scroll_ms"] = frame_time * 1000 / frames
+    stats["scroll_bytes"] = conn.take() / frames
+    stats["rows"] = len(vlist.rows)
+
+    # Refresco en el que cambia el kilometraje de todas las tarjetas en pantalla
+    shown = list(vlist.rows)
+    for key in shown:
+        vehicle = by_key[key]
+        by_key[key] = type(vehicle)(**{**{f: getattr(vehicle, f) for f in vehicle.__slots__}, "km": (vehicle.km or 0) + 1})
+    start = time.perf_counter()
+    vlist.invalidate(shown)
+    vlist.set_keys(list(by_key))
+    vlist.control.update()
+    stats["refresh_ms"] = (time.perf_counter() - start) * 1000
+    stats["refresh_bytes"] = conn.take()
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--fleets", default="100,500,2000,10000")
+    parser.add_argument("--full-limit", type=int, default=2000, help="no medir la columna completa arriba de esto")
+    args = parser.parse_args()
+
+    print(
+        f"{'vehículos':>9} | {'columna: abrir':>22} | {'virtual: abrir':>22} | "
+        f"{'virtual: 1 pantalla de scroll':>30} | {'refresco (km en pantalla)':>25} | filas"
+    )
+    for n in (int(x) for x in args.fleets.split(",")):
+        vehicles = normalize_vehicles(make_fleet(n))
+        snapshot = FleetSnapshot.from_vehicles(vehicles)
+        if n <= args.full_limit:
+            full = full_column(vehicles)
+            full_text = f"{full['open_ms']:7.0f} ms {full['open_bytes'] / 1024:8.0f} KB"
+        else:
+            full_text = f"{'(omitido)':>22}"
+        virtual = virtual_list(vehicles, snapshot)
+        print(
+            f"{n:>9} | {full_text} | "
+            f"{virtual['open_ms']:7.1f} ms {virtual['open_bytes'] / 1024:8.1f} KB | "
+            f"{virtual['scroll_ms']:12.1f} ms {virtual['scroll_bytes'] / 1024:9.1f} KB | "
+            f"{virtual['refresh_ms']:9.1f} ms {virtual['refresh_bytes'] / 1024:9.1f} KB | {virtual['rows']:5}"
+        )
+
+
+if __name__ == "__main__":
+    main()
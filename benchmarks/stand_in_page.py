@@ -0,0 +1,55 @@
+# benchmarks/stand_in_page.py
+# ft.Page sin cliente para los benchmarks de interfaz: procesa los comandos
+# como la conexión de Pyodide (web) y cuenta los bytes JSON que se enviarían
+# al navegador. No forma parte de la app; solo se usa desde benchmarks/.
+
+import asyncio
+import json
+
+import flet as ft
+from flet.core.local_connection import LocalConnection
+from flet.core.protocol import (
+    ClientActions,
+    ClientMessage,
+    CommandEncoder,
+    PageCommandsBatchResponsePayload,
+)
+
+
+class WireCounter(LocalConnection):
+    """Conexión que no envía nada: solo mide los mensajes al cliente."""
+
+    def __init__(self):
+        super().__init__()
+        self.bytes = 0
+        self.messages = 0
+
+    def send_commands(self, session_id: str, commands: list):
+        results = []
+        messages = []
+        for command in commands:
+            result, message = self._process_command(command)
+            if command.name in ("add", "get"):
+                results.append(result)
+            if message:
+                messages.append(message)
+        if messages:
+            batch = ClientMessage(ClientActions.PAGE_CONTROLS_BATCH, messages)
+            self.bytes += len(json.dumps(batch, cls=CommandEncoder, separators=(",", ":")))
+            self.messages += 1
+        return PageCommandsBatchResponsePayload(results=results, error="")
+
+    def send_command(self, session_id: str, command):
+        return self.send_commands(session_id, [command])
+
+    def take(self) -> int:
+        """Bytes enviados desde la última llamada."""
+        sent, self.bytes = self.bytes, 0
+        return sent
+
+
+def make_page():
+    """(page, conn) listos para page.add() y control.update()."""
+    conn = WireCounter()
+    page = ft.Page(conn, "bench", loop=asyncio.new_event_loop())
+    return page, conn
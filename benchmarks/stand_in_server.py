@@ -0,0 +1,132 @@
+# benchmarks/stand_in_server.py
+# Servidor local que imita los endpoints de devsionapi para los benchmarks.
+# No forma parte de la app; solo se usa desde los scripts de benchmarks/.
+
+import gzip
+import hashlib
+import json
+import os
+import random
+import ssl
+import subprocess
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def make_fleet(n: int, seed: int = 7) -> list:
+    """Genera n vehículos con la forma de ultimaVehiculos (claves en minúscula)."""
+    rnd = random.Random(seed)
+    fleet = []
+    for i in range(n):
+        fleet.append({
+            "id": i + 1,
+            "placas": f"ABC-{i:05d}",
+            "economico": f"ECO-{i}",
+            "marca": rnd.choice(["Nissan", "Ford", "Chevrolet", "Toyota"]),
+            "modelo": rnd.choice(["NP300", "Ranger", "Aveo", "Hilux"]),
+            "anio": rnd.randint(2010, 2025),
+            "color": rnd.choice(["Blanco", "Rojo", "Gris"]),
+            "cliente": f"Cliente {i % 50}",
+            "imei": 860000000000000 + i,
+            "km": rnd.randint(0, 300000),
+            "latitud": 19.4326 + rnd.uniform(-0.5, 0.5),
+            "longitud": -99.1332 + rnd.uniform(-0.5, 0.5),
+            "velocidad": rnd.uniform(0, 110),
+            "fecha": "2025-01-01T12:00:00",
+        })
+    return fleet
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    # HTTP/1.1 para permitir keep-alive (igual que el servidor real)
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    routes = {}
+    chunk_size = 64 * 1024
+    chunk_delay = 0.0  # Segundos entre trozos (0 = sin límite de ancho de banda)
+    compress = True    # Responder gzip si el cliente lo acepta
+    _gzip_cache = {}
+
+    def _send(self, status: int, body: bytes, headers: dict = None):
+        self.send_response(status)
+        if status != 304:
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        if body and self.chunk_delay:
+            # Simula un enlace lento: el cuerpo sale por trozos
+            for i in range(0, len(body), self.chunk_size):
+                self.wfile.write(body[i:i + self.chunk_size])
+                time.sleep(self.chunk_delay)
+        elif body:
+            self.wfile.write(body)
+
+    def do_HEAD(self):
+        self._send(200, b"")
+
+    def do_GET(self):
+        path = self.path.split("?", 1)[0].rstrip("/")
+        body = self.routes.get(path)
+        if body is None:
+            self._send(404, b'{"message": "Not Found"}')
+            return
+        etag = '"%s"' % hashlib.md5(body).hexdigest()
+        if self.headers.get("If-None-Match") == etag:
+            self._send(304, b"", {"ETag": etag})
+            return
+        headers = {"ETag": etag}
+        if self.compress and "gzip" in (self.headers.get("Accept-Encoding") or ""):
+            body = self._gzip(path, body)
+            headers["Content-Encoding"] = "gzip"
+        self._send(200, body, headers)
+
+    def _gzip(self, path: str, body: bytes) -> bytes:
+        cached = self._gzip_cache.get(path)
+        if cached is None or cached[0] is not body:
+            cached = self._gzip_cache[path] = (body, gzip.compress(body, compresslevel=6))
+        return cached[1]
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        self.rfile.read(length)
+        self._send(200, b'{"token": "stand-in-token"}')
+
+    def log_message(self, format, *args):
+        pass  # Sin ruido en la salida del benchmark
+
+
+def _self_signed_context() -> ssl.SSLContext:
+    """Certificado autofirmado temporal (requiere el binario openssl)."""
+    tmp = tempfile.mkdtemp(prefix="nextapp-bench-")
+    cert = os.path.join(tmp, "cert.pem")
+    key = os.path.join(tmp, "key.pem")
+    subprocess.run(
+        ["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1",
+         "-subj", "/CN=127.0.0.1", "-keyout", key, "-out", cert],
+        check=True, capture_output=True,
+    )
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    context.load_cert_chain(cert, key)
+    return context
+
+
+def start_server(fleet_size: int = 200, handler=StandInHandler, tls: bool = False):
+    """Arranca el servidor en un hilo y devuelve (server, base_url)."""
+    fleet_body = json.dumps(make_fleet(fleet_size)).encode("utf-8")
+    handler.routes = {
+        "/api/Vehiculos": fleet_body,
+        "/api/Vehiculo/ultimaVehiculos": fleet_body,
+    }
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    server.daemon_threads = True
+    scheme = "http"
+    if tls:
+        server.socket = _self_signed_context().wrap_socket(server.socket, server_side=True)
+        scheme = "https"
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    host, port = server.server_address
+    return server, f"{scheme}://{host}:{port}/api"
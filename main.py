@@ -14,7 +14,9 @@ from app.views import (
     DashboardView,
     SettingsView,
 )
-from app.services.auth import login as auth_login
+from app.views.tabs import TabCache
+from app.services.auth import login_async as auth_login_async
+from app.services.tokens import session_tokens
 from app.components.alerts import show_success_alert, show_error_alert
 
 
@@ -31,6 +33,10 @@ def main(page: ft.Page):
     # NOTA: No configurar vertical_alignment ni horizontal_alignment a nivel de página
     # porque pueden ocultar el AppBar y otros componentes del shell
 
+    # Sesión: el token vive en memoria (uno por página, en page.session) y
+    # se restaura/persiste en client_storage
+    token_manager = session_tokens(page)
+
     # ---------------------------------------------------------
     # Navegación por ruta
     # ---------------------------------------------------------
@@ -100,18 +106,14 @@ def main(page: ft.Page):
                 # Ejecutar el login de forma asíncrona para no bloquear la UI
                 async def do_login_async():
                     try:
-                        # Llamada al backend (ejecutar en thread separado para no bloquear UI)
-                        res = await asyncio.to_thread(auth_login, user_name, password)
+                        # Llamada al backend (async, corre en el event loop sin bloquear UI)
+                        res = await auth_login_async(user_name, password)
                         
                         if res.get("ok"):
-                            # Guardamos credenciales temporalmente (hasta definir refresh token)
-                            # Ejecutar en thread para no bloquear
-                            await asyncio.to_thread(page.client_storage.set, "userName", user_name)
-                            await asyncio.to_thread(page.client_storage.set, "password", password)
-
+                            # El token queda en memoria (token_manager) y se persiste en
+                            # client_storage junto con las credenciales para re-autenticar
                             token = res.get("token") or ""
-                            if token:
-                                await asyncio.to_thread(page.client_storage.set, "token", token)
+                            await token_manager.start_session_async(user_name, password, token)
 
                             # Restaurar UI del botón ANTES de mostrar la alerta
                             restore_login_ui(preserve_values=False)
@@ -178,9 +180,15 @@ def main(page: ft.Page):
                         item.open = False
                         page.overlay.remove(item)
             
-            # Inicializar contenido - pasar page a HomeView
+            # Vistas de las pestañas: se crean en la primera visita y se
+            # reutilizan durante la sesión (sin volver a cargar datos vigentes)
+            tabs = TabCache(page, [
+                lambda: HomeView(page),
+                lambda: VehiclesView(page),
+                DashboardView,
+            ])
             content = ft.Container(
-                content=HomeView(page),
+                content=tabs.view(0),
                 padding=20,
                 expand=True
             )
@@ -190,9 +198,7 @@ def main(page: ft.Page):
                 nonlocal selected_index
                 selected_index = i
                 navbar.selected_index = i
-                # Pasar page a HomeView y VehiclesView cuando se selecciona
-                views = [HomeView(page), VehiclesView(page), DashboardView()]
-                content.content = views[i]
+                content.content = tabs.view(i)
                 # Asegurar que el NavigationBar siga visible
                 adapt_layout()
                 page.update()